@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Time ``ObstacleAnalyzer.analyze_single`` per obstacle as the survey grows.
+
+    python bench/bench_footprint.py [--sizes 1000 10000 100000] [--without-max 10000]
+
+Obstacles are spread uniformly over the extent of one TOFPA surface (grown
+by 2 km) and run through ``analyze_single`` as ``process_survey_obstacles``
+does: with one ``SurfaceContext`` and one ``FeatureAccumulator`` per run.
+Prints microseconds per obstacle, which should stay flat across sizes, and
+the same without the context (the surface fetched and prepared for every
+obstacle) up to ``--without-max`` obstacles.  Needs the QGIS Python
+bindings; without them the benchmark is skipped.
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PLUGIN = os.path.basename(ROOT)
+try:
+    from qgis.core import (QgsApplication, QgsCoordinateReferenceSystem, QgsFeature,
+                           QgsField, QgsFields, QgsGeometry, QgsPoint, QgsPointXY,
+                           QgsVectorLayer)
+    obstacles = importlib.import_module(f"{PLUGIN}.core.obstacles")
+except ImportError as exc:
+    print(f"bench_footprint skipped: QGIS is not available ({exc})")
+    sys.exit(0)
+TofpaParams = importlib.import_module(f"{PLUGIN}.core.models").TofpaParams
+surface_geometry = importlib.import_module(f"{PLUGIN}.core.surface").surface_geometry
+FIELD_DOUBLE = importlib.import_module(f"{PLUGIN}.utils.compat").FIELD_DOUBLE
+ObstacleAnalyzer = obstacles.ObstacleAnalyzer
+SurfaceContext, FeatureAccumulator = obstacles.SurfaceContext, obstacles.FeatureAccumulator
+
+AZIMUTH = 63.0
+
+
+def surface_layer(geometry) -> QgsVectorLayer:
+    layer = QgsVectorLayer("Polygon?crs=EPSG:32614", "TOFPA", "memory")
+    feature = QgsFeature()
+    feature.setGeometry(QgsGeometry.fromPolygonXY(
+        [[QgsPointXY(x, y) for x, y, _z in geometry.outline]]
+    ))
+    layer.dataProvider().addFeatures([feature])
+    return layer
+
+
+def survey(n: int, geometry, rng) -> list:
+    fields = QgsFields()
+    fields.append(QgsField("height", FIELD_DOUBLE))
+    xmin, ymin, xmax, ymax = geometry.extent(2000.0)
+    features = []
+    for fid, (x, y, height) in enumerate(zip(rng.uniform(xmin, xmax, n),
+                                             rng.uniform(ymin, ymax, n),
+                                             rng.uniform(0, 150, n))):
+        feature = QgsFeature(fields, fid)
+        feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+        feature.setAttribute("height", float(height))
+        features.append(feature)
+    return features
+
+
+def run(features, layer, geometry, with_context: bool) -> float:
+    """Seconds per obstacle of one analysis run over *features*."""
+    analyzer = ObstacleAnalyzer()
+    layers_info = analyzer.create_layers(QgsCoordinateReferenceSystem("EPSG:32614"))
+    der_point = QgsPoint(*geometry.der)
+    start = time.perf_counter()
+    context = SurfaceContext(layer) if with_context else None
+    accumulator = FeatureAccumulator()
+    for feature in features:
+        analyzer.analyze_single(feature, "height", 10.0, 5.0, layer, layers_info,
+                                der_point=der_point, der_elevation=geometry.der_elevation,
+                                takeoff_azimuth=AZIMUTH, surface_context=context,
+                                accumulator=accumulator)
+    accumulator.flush()
+    return (time.perf_counter() - start) / len(features)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    parser.add_argument("--without-max", type=int, default=10_000)
+    args = parser.parse_args()
+
+    app = QgsApplication([], False)
+    app.initQgis()
+    params = TofpaParams(180.0, 1800.0, 300.0, 10.0, 21.7, 0, None, None, False, False, False)
+    geometry = surface_geometry(params, 1000.0, 2000.0, AZIMUTH)
+    layer = surface_layer(geometry)
+    rng = np.random.default_rng(0)
+    print(f"{'obstacles':>10} {'context us':>11} {'no context us':>14}")
+    for n in args.sizes:
+        features = survey(n, geometry, rng)
+        with_s = run(features, layer, geometry, True)
+        without = (f"{run(features, layer, geometry, False) * 1e6:>14.1f}"
+                   if n <= args.without_max else f"{'-':>14}")
+        print(f"{n:>10} {with_s * 1e6:>11.1f} {without}")
+    app.exitQgis()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Time ``core.shadow.shadow_sweep`` against the pairwise scan it replaced.
+
+    python bench/bench_shadow.py [--sizes 1000 4000 16000 64000 256000] [--pairwise-max 4000]
+
+Critical obstacles are spread uniformly over a TOFPA-sized area ahead of
+the reference point.  Besides the run time, prints the sweep cost per
+obstacle, which grows with log² n only, and the growth of the run time
+from the previous size.  The pairwise scan
+(``tests.reference.pairwise_shadows``, O(n²)) only runs up to
+``--pairwise-max`` obstacles, where both must agree.
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PLUGIN = os.path.basename(ROOT)
+shadow_sweep = importlib.import_module(f"{PLUGIN}.core.shadow").shadow_sweep
+pairwise_shadows = importlib.import_module(f"{PLUGIN}.tests.reference").pairwise_shadows
+
+
+def survey(n: int, rng):
+    along = rng.uniform(0, 10_000, n)
+    cross = rng.uniform(-900, 900, n)
+    heights = 20.0 + along * 0.012 + rng.uniform(0, 60, n)
+    return cross.tolist(), along.tolist(), heights.tolist(), list(range(n))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 4000, 16_000, 64_000, 256_000])
+    parser.add_argument("--pairwise-max", type=int, default=4000)
+    parser.add_argument("--tolerance", type=float, default=5.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'obstacles':>10} {'sweep s':>10} {'us/obst.':>9} {'growth':>7} "
+          f"{'pairwise s':>11} {'speed-up':>9}")
+    previous = None
+    for n in args.sizes:
+        obstacles = survey(n, rng)
+        start = time.perf_counter()
+        swept = shadow_sweep(*obstacles, 0.0, 0.0, 21.7, args.tolerance)
+        sweep_s = time.perf_counter() - start
+        growth = f"{sweep_s / previous:>6.1f}x" if previous else f"{'-':>7}"
+        previous = sweep_s
+        sweep = f"{n:>10} {sweep_s:>10.3f} {sweep_s / n * 1e6:>9.1f} {growth}"
+        if n > args.pairwise_max:
+            print(f"{sweep} {'-':>11} {'-':>9}")
+            continue
+        start = time.perf_counter()
+        expected = pairwise_shadows(*obstacles, 0.0, 0.0, 21.7, args.tolerance)
+        pairwise_s = time.perf_counter() - start
+        assert swept == expected, "shadow_sweep disagrees with the pairwise scan"
+        print(f"{sweep} {pairwise_s:>11.3f} {pairwise_s / sweep_s:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Time ``core.surface.surface_geometry``, the per-run surface construction.
+
+    python bench/bench_surface.py [--repeat 20000]
+
+Prints microseconds per call without contours and with 1 m contours (the
+densest interval the panel offers), and per point for
+``surface_elevation_at`` on a million points.
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import os
+import sys
+import timeit
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PLUGIN = os.path.basename(ROOT)
+TofpaParams = importlib.import_module(f"{PLUGIN}.core.models").TofpaParams
+surface = importlib.import_module(f"{PLUGIN}.core.surface")
+surface_elevation_at, surface_geometry = surface.surface_elevation_at, surface.surface_geometry
+
+
+def params(contour_interval_m: int = 0) -> TofpaParams:
+    return TofpaParams(180.0, 1800.0, 300.0, 10.0, 21.7, 0, None, None, False, False, False,
+                       contour_interval_m)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=20_000)
+    args = parser.parse_args()
+
+    for label, p in (("surface_geometry", params()),
+                     ("surface_geometry, 1 m contours", params(1))):
+        seconds = min(timeit.repeat(lambda: surface_geometry(p, 1000.0, 2000.0, 63.0),
+                                    number=args.repeat, repeat=3))
+        print(f"{label:<34} {seconds / args.repeat * 1e6:8.2f} us/call")
+
+    rng = np.random.default_rng(0)
+    xs, ys = rng.uniform(-12_000, 12_000, (2, 1_000_000))
+    p = params()
+    seconds = min(timeit.repeat(lambda: surface_elevation_at(xs, ys, p, 0.0, 0.0, 63.0),
+                                number=5, repeat=3)) / 5
+    print(f"{'surface_elevation_at, 1e6 points':<34} {seconds / len(xs) * 1e9:8.2f} ns/point")
+
+
+if __name__ == "__main__":
+    main()
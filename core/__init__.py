@@ -1,5 +1,5 @@
 """TOFPA core calculation modules."""
 
-from .models import ObstacleParams, TofpaParams
+from .models import ObstacleParams, TerrainParams, TofpaParams
 
-__all__ = ["TofpaParams", "ObstacleParams"]
+__all__ = ["TofpaParams", "ObstacleParams", "TerrainParams"]
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Aerodrome batch runs: every runway end in one pass.
+
+No QGIS dependency.
+
+``runway_ends`` pairs each runway centreline with the threshold point at
+its departure end, in both ``RunwayDirection`` values, and builds the
+surface of each with ``core.surface.surface_geometry``.  A runway with a
+threshold point at both ends gives two surfaces.
+
+``evaluate_runway_ends`` runs the obstacle kernel for all of them over a
+single traversal of the survey arrays: obstacles are taken in chunks, and
+each chunk is tested against every surface whose extent it reaches.  The
+survey is read (and projected, sampled, hashed) once however many runway
+ends there are.
+
+    ends = runway_ends(params, runways, thresholds)
+    for end, found in zip(ends, evaluate_runway_ends(ends, xs, ys, heights, 10.0, 5.0)):
+        records = ObstacleRecords.from_results(ids[found.index], ...)
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from math import atan2, degrees, hypot
+from typing import TYPE_CHECKING, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .models import RunwayDirection
+from .obstacle_kernel import evaluate_obstacles
+from .surface import TOFPA_CLIMB_GRADIENT, SurfaceGeometry, surface_geometry
+
+if TYPE_CHECKING:
+    from .models import TofpaParams
+
+
+@dataclass(frozen=True)
+class RunwayEnd:
+    """One takeoff direction of one runway and its surface.
+
+    Attributes:
+        runway_id:    Feature id of the runway centreline.
+        threshold_id: Feature id of the threshold point at the departure end.
+        direction:    Takeoff direction along the centreline.
+        geometry:     The surface (DER, frame, footprint and vertices).
+    """
+
+    runway_id: int
+    threshold_id: int
+    direction: RunwayDirection
+    geometry: SurfaceGeometry
+
+    @property
+    def name(self) -> str:
+        """Label used in the output layers, e.g. ``RWY 3 end→start``."""
+        arrow = "start→end" if self.direction == RunwayDirection.START_TO_END else "end→start"
+        return f"RWY {self.runway_id} {arrow}"
+
+
+@dataclass
+class EndObstacles:
+    """Obstacles near one runway end's surface.
+
+    Attributes:
+        index:   Rows of the survey arrays whose base lies in the surface
+                 extent grown by the obstacle buffer, in survey order.
+        results: ``core.obstacle_kernel.evaluate_obstacles`` arrays for
+                 those rows, plus their ``along`` / ``cross``.
+    """
+
+    index: np.ndarray
+    results: dict
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
+def runway_ends(
+    params: "TofpaParams",
+    runways: Sequence[Tuple[int, Sequence[Tuple[float, float]]]],
+    thresholds: Sequence[Tuple[int, float, float]],
+    elevations: Optional[Mapping[int, float]] = None,
+    climb_gradient: float = TOFPA_CLIMB_GRADIENT,
+) -> List[RunwayEnd]:
+    """Surfaces of every runway end of an aerodrome.
+
+    Args:
+        params:     Surface parameters shared by every end; ``s`` is ignored.
+        runways:    ``(feature id, centreline vertices)`` per runway.
+        thresholds: ``(feature id, x, y)`` per threshold point.
+        elevations: DER elevation per threshold id; ends without one use
+                    ``params.ze``.
+
+    Each direction takes the threshold nearest to its departure end (the
+    last vertex for ``START_TO_END``); the direction is skipped when that
+    threshold lies nearer the other end of the runway, i.e. when the end
+    has no threshold of its own.  Raises ``ValueError`` on a runway with
+    fewer than two vertices or when no runway end has a threshold.
+    """
+    if not thresholds:
+        raise ValueError("No threshold points found")
+    ids = np.array([t[0] for t in thresholds], dtype=np.int64)
+    tx = np.array([t[1] for t in thresholds], dtype=np.float64)
+    ty = np.array([t[2] for t in thresholds], dtype=np.float64)
+    elevations = elevations or {}
+
+    ends = []
+    for runway_id, vertices in runways:
+        if len(vertices) < 2:
+            raise ValueError(f"Runway {runway_id} geometry must have at least 2 points!")
+        first, last = vertices[0], vertices[-1]
+        for direction in RunwayDirection:
+            start, end = (first, last) if direction == RunwayDirection.START_TO_END else (last, first)
+            nearest = int(np.argmin(np.hypot(tx - end[0], ty - end[1])))
+            x, y = float(tx[nearest]), float(ty[nearest])
+            if hypot(x - end[0], y - end[1]) > hypot(x - start[0], y - start[1]):
+                continue
+            threshold_id = int(ids[nearest])
+            end_params = replace(params, s=int(direction),
+                                 ze=float(elevations.get(threshold_id, params.ze)))
+            azimuth = degrees(atan2(end[0] - start[0], end[1] - start[1]))
+            ends.append(RunwayEnd(
+                runway_id=int(runway_id),
+                threshold_id=threshold_id,
+                direction=direction,
+                geometry=surface_geometry(end_params, x, y, azimuth, climb_gradient),
+            ))
+    if not ends:
+        raise ValueError("No runway end has a threshold point")
+    return ends
+
+
+def evaluate_runway_ends(
+    ends: Sequence[RunwayEnd],
+    xs,
+    ys,
+    heights,
+    buffer_distance: float,
+    min_height: float,
+    ground_elevations=None,
+    chunk_size: int = 262_144,
+) -> List[EndObstacles]:
+    """Penetration test of a survey against every runway end's surface.
+
+    *xs*, *ys*, *heights* (and *ground_elevations*) are the survey columns
+    as for ``evaluate_obstacles``.  Returns one ``EndObstacles`` per end,
+    in the order of *ends*; obstacles outside a surface's extent grown by
+    the buffer are not part of its result.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    heights = np.asarray(heights, dtype=np.float64)
+    if ground_elevations is not None:
+        ground_elevations = np.asarray(ground_elevations, dtype=np.float64)
+    extents = [end.geometry.extent(buffer_distance) for end in ends]
+    parts: List[list] = [[] for _ in ends]
+
+    for start in range(0, len(xs), max(1, int(chunk_size))):
+        chunk = slice(start, start + chunk_size)
+        x, y = xs[chunk], ys[chunk]
+        for k, (end, (xmin, ymin, xmax, ymax)) in enumerate(zip(ends, extents)):
+            near = np.flatnonzero((x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax))
+            if not len(near):
+                continue
+            geometry = end.geometry
+            along, cross = geometry.frame.to_local(x[near], y[near])
+            results = evaluate_obstacles(
+                along, cross, heights[chunk][near], geometry.footprint, buffer_distance,
+                min_height, geometry.der_elevation, geometry.climb_gradient,
+                None if ground_elevations is None else ground_elevations[chunk][near],
+            )
+            results["along"], results["cross"] = along, cross
+            parts[k].append((near + start, results))
+
+    found = []
+    for chunks in parts:
+        if not chunks:
+            found.append(EndObstacles(np.empty(0, dtype=np.int64), _empty_results()))
+            continue
+        index = np.concatenate([c[0] for c in chunks])
+        results = {name: np.concatenate([c[1][name] for c in chunks]) for name in chunks[0][1]}
+        found.append(EndObstacles(index, results))
+    return found
+
+
+def _empty_results() -> dict:
+    empty = np.empty(0)
+    return {
+        "height": empty, "in_footprint": empty.astype(bool), "ocs_elevation": empty,
+        "penetration_m": empty, "is_critical": empty.astype(bool),
+        "required_gradient": empty, "along": empty, "cross": empty,
+    }
@@ -0,0 +1,647 @@
+# -*- coding: utf-8 -*-
+"""
+DTM raster access for the terrain engine.
+
+Thin GDAL helpers that read only the raster window under the TOFPA surface.
+GDAL's Python bindings ship with every QGIS install; this module does not
+import QGIS itself.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from math import ceil, floor
+from typing import Optional
+from xml.sax.saxutils import escape
+
+import numpy as np
+from osgeo import gdal
+
+from .pyramid import MaxPyramid
+from .terrain import RasterWindow
+
+gdal.UseExceptions()
+
+# Level-0 block edge of the max pyramid, in cells.
+PYRAMID_BASE_BLOCK = 32
+
+# Clearance GeoTIFF: NODATA for cells outside the clip, creation options.
+CLEARANCE_NODATA = -9999.0
+_CLEARANCE_GTIFF_OPTIONS = [
+    "TILED=YES", "BLOCKXSIZE=256", "BLOCKYSIZE=256",
+    "COMPRESS=DEFLATE", "PREDICTOR=3", "BIGTIFF=IF_SAFER",
+]
+# Overviews are built down to about this size (cells on the long side).
+_MIN_OVERVIEW_SIZE = 256
+
+# Clipped DTM windows cached on disk: tiled, compressed, NaN outside the clip.
+_CLIPPED_GTIFF_OPTIONS = [
+    "TILED=YES", "BLOCKXSIZE=256", "BLOCKYSIZE=256",
+    "COMPRESS=DEFLATE", "PREDICTOR=3", "BIGTIFF=IF_SAFER",
+]
+
+# Pyramids kept in memory, keyed by raster fingerprint and window.
+_PYRAMID_CACHE_SIZE = 8
+_pyramid_cache: "OrderedDict[tuple, MaxPyramid]" = OrderedDict()
+
+
+def open_dtm(path: str):
+    """Open *path* read-only; raise ``ValueError`` when GDAL cannot."""
+    try:
+        dataset = gdal.Open(path, gdal.GA_ReadOnly)
+    except RuntimeError as exc:
+        raise ValueError(f"Cannot open DTM '{path}': {exc}") from exc
+    if dataset is None:
+        raise ValueError(f"Cannot open DTM '{path}'")
+    _check_north_up(dataset.GetGeoTransform(), path)
+    return dataset
+
+
+def open_dtm_mosaic(paths):
+    """Open the DTMs at *paths* as one virtual mosaic, highest priority first.
+
+    Where sources overlap, each cell comes from the first source holding
+    data there, so NODATA holes in a high-resolution source fall through
+    to the next one.  The mosaic is a VRT in GDAL's in-memory file system
+    on the grid of the first source, extended to cover all of them; the
+    others are resampled to it (nearest neighbour) on read.  Reads fetch
+    only the source windows they overlap and no merged copy of the terrain
+    is ever written to disk.  A single path opens that raster directly.
+
+    All sources must share one CRS; raises ``ValueError`` otherwise.
+    """
+    paths = list(paths)
+    if not paths:
+        raise ValueError("No DTM given")
+    sources = [open_dtm(path) for path in paths]
+    if len(sources) == 1:
+        return sources[0]
+    crs = sources[0].GetSpatialRef()
+    for path, source in zip(paths[1:], sources[1:]):
+        if not _same_crs(crs, source.GetSpatialRef()):
+            raise ValueError(f"DTM '{path}' is not in the CRS of '{paths[0]}'")
+    # Stable name per source list, so repeat runs reuse the cached derivatives
+    digest = hashlib.sha1("\n".join(paths).encode("utf-8")).hexdigest()
+    vrt_path = f"/vsimem/tofpa_dtm_mosaic_{digest}.vrt"
+    gdal.FileFromMemBuffer(vrt_path, _mosaic_vrt(sources).encode("utf-8"))
+    return open_dtm(vrt_path)
+
+
+def _same_crs(a, b) -> bool:
+    """True when the ``osr.SpatialReference`` *a* and *b* are one CRS.
+
+    Not compared by WKT: sources in the same EPSG often differ in authority
+    nodes or TOWGS84 parameters.  The same authority code is the same CRS;
+    otherwise ``IsSame`` decides.  Two rasters without a CRS match.
+    """
+    if a is None or b is None:
+        return a is None and b is None
+    code = (a.GetAuthorityName(None), a.GetAuthorityCode(None))
+    if None not in code and code == (b.GetAuthorityName(None), b.GetAuthorityCode(None)):
+        return True
+    return bool(a.IsSame(b))
+
+
+def _mosaic_vrt(sources) -> str:
+    """VRT XML stacking *sources* (highest priority first) on the first one's grid."""
+    x0, dx, _rx, y0, _ry, dy = sources[0].GetGeoTransform()
+    xmin = min(_bounds(s)[0] for s in sources)
+    ymin = min(_bounds(s)[1] for s in sources)
+    xmax = max(_bounds(s)[2] for s in sources)
+    ymax = max(_bounds(s)[3] for s in sources)
+    # Snap the mosaic origin to the first source's grid
+    col_a = floor((xmin - x0) / dx + 1e-9)
+    row_a = floor((ymax - y0) / dy + 1e-9)
+    origin_x, origin_y = x0 + col_a * dx, y0 + row_a * dy
+    width = int(ceil((xmax - origin_x) / dx - 1e-9))
+    height = int(ceil((ymin - origin_y) / dy - 1e-9))
+    data_type = "Float32"
+    if any(s.GetRasterBand(1).DataType == gdal.GDT_Float64 for s in sources):
+        data_type = "Float64"
+
+    # VRT sources paint in document order: lowest priority first
+    items = []
+    for source in reversed(sources):
+        sx0, sdx, _srx, sy0, _sry, sdy = source.GetGeoTransform()
+        band = source.GetRasterBand(1)
+        nodata = band.GetNoDataValue()
+        if nodata is None and band.DataType in (gdal.GDT_Float32, gdal.GDT_Float64):
+            nodata = float("nan")
+        items.append(
+            "    <ComplexSource>\n"
+            f'      <SourceFilename relativeToVRT="0">{escape(source.GetDescription())}</SourceFilename>\n'
+            "      <SourceBand>1</SourceBand>\n"
+            f'      <SrcRect xOff="0" yOff="0" xSize="{source.RasterXSize}" ySize="{source.RasterYSize}"/>\n'
+            f'      <DstRect xOff="{(sx0 - origin_x) / dx!r}" yOff="{(sy0 - origin_y) / dy!r}" '
+            f'xSize="{source.RasterXSize * sdx / dx!r}" ySize="{source.RasterYSize * sdy / dy!r}"/>\n'
+            + (f"      <NODATA>{nodata!r}</NODATA>\n" if nodata is not None else "")
+            + "    </ComplexSource>\n"
+        )
+    return (
+        f'<VRTDataset rasterXSize="{width}" rasterYSize="{height}">\n'
+        f"  <SRS>{escape(sources[0].GetProjection())}</SRS>\n"
+        f"  <GeoTransform>{origin_x!r}, {dx!r}, 0, {origin_y!r}, 0, {dy!r}</GeoTransform>\n"
+        f'  <VRTRasterBand dataType="{data_type}" band="1">\n'
+        "    <NoDataValue>nan</NoDataValue>\n"
+        + "".join(items)
+        + "  </VRTRasterBand>\n"
+        "</VRTDataset>\n"
+    )
+
+
+def _bounds(dataset) -> tuple:
+    """``(xmin, ymin, xmax, ymax)`` of a north-up *dataset*."""
+    x0, dx, _rx, y0, _ry, dy = dataset.GetGeoTransform()
+    xs = (x0, x0 + dataset.RasterXSize * dx)
+    ys = (y0, y0 + dataset.RasterYSize * dy)
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def window_offsets(geotransform, raster_size, extent) -> tuple[int, int, int, int]:
+    """Return ``(col_off, row_off, cols, rows)`` of the cells covering *extent*.
+
+    *extent* is ``(xmin, ymin, xmax, ymax)`` in raster CRS units.  The window
+    is clamped to the raster; ``cols``/``rows`` are 0 when they do not overlap.
+    """
+    x0, dx, _rx, y0, _ry, dy = geotransform
+    width, height = raster_size
+    xmin, ymin, xmax, ymax = extent
+
+    col_a, col_b = (xmin - x0) / dx, (xmax - x0) / dx
+    row_a, row_b = (ymax - y0) / dy, (ymin - y0) / dy
+    col_off = max(0, int(floor(min(col_a, col_b))))
+    col_end = min(width, int(ceil(max(col_a, col_b))))
+    row_off = max(0, int(floor(min(row_a, row_b))))
+    row_end = min(height, int(ceil(max(row_a, row_b))))
+    return col_off, row_off, max(0, col_end - col_off), max(0, row_end - row_off)
+
+
+def read_window(dataset, extent, band_index: int = 1) -> RasterWindow:
+    """Read the cells of *dataset* covering *extent* into a ``RasterWindow``."""
+    geotransform = dataset.GetGeoTransform()
+    col_off, row_off, cols, rows = window_offsets(
+        geotransform, (dataset.RasterXSize, dataset.RasterYSize), extent
+    )
+    band = dataset.GetRasterBand(band_index)
+    if cols and rows:
+        values = band.ReadAsArray(col_off, row_off, cols, rows)
+    else:
+        values = np.empty((0, 0), dtype=np.float64)
+    return RasterWindow(
+        values=values,
+        geotransform=_sub_geotransform(geotransform, col_off, row_off),
+        nodata=band.GetNoDataValue(),
+    )
+
+
+def tile_offsets(dataset, extent, band_index: int = 1, max_tile_cells: int = 1 << 20,
+                 overlap: int = 0):
+    """Yield ``(col_off, row_off, cols, rows)`` of the tiles covering *extent*.
+
+    Tiles are whole multiples of the band's native block size (so every
+    block is decoded exactly once) and hold at most about *max_tile_cells*
+    cells, or one native block if that is larger.  With *overlap*, each tile
+    extends that many cells right and down into its neighbours (clamped to
+    the window), for kernels that look at neighbouring cells.
+    """
+    col_off, row_off, cols, rows = window_offsets(
+        dataset.GetGeoTransform(), (dataset.RasterXSize, dataset.RasterYSize), extent
+    )
+    if not cols or not rows:
+        return
+    tile_w, tile_h = _tile_shape(dataset.GetRasterBand(band_index).GetBlockSize(), max_tile_cells)
+
+    # Snap the first tile to the block grid so reads never straddle blocks
+    col_start = col_off - col_off % tile_w
+    row_start = row_off - row_off % tile_h
+    for r0 in range(row_start, row_off + rows, tile_h):
+        r_a = max(r0, row_off)
+        r_b = min(r0 + tile_h + overlap, row_off + rows)
+        for c0 in range(col_start, col_off + cols, tile_w):
+            c_a = max(c0, col_off)
+            c_b = min(c0 + tile_w + overlap, col_off + cols)
+            yield c_a, r_a, c_b - c_a, r_b - r_a
+
+
+def read_tile(dataset, offsets, band_index: int = 1,
+              pyramid: Optional[MaxPyramid] = None, candidates=None) -> Optional[RasterWindow]:
+    """Read the tile at *offsets* (as yielded by :func:`tile_offsets`).
+
+    With a *pyramid* and its *candidates* mask, returns ``None`` without
+    reading when the tile holds no candidate block, and sets the cells of
+    non-candidate blocks to NaN so the engine drops them.
+    """
+    col_off, row_off, cols, rows = offsets
+    keep = None
+    if pyramid is not None:
+        keep = pyramid.cell_mask(candidates, col_off, row_off, cols, rows)
+        if not keep.any():
+            return None
+    band = dataset.GetRasterBand(band_index)
+    values = band.ReadAsArray(col_off, row_off, cols, rows)
+    if keep is not None and not keep.all():
+        values = np.where(keep, values, np.nan)
+    return RasterWindow(
+        values=values,
+        geotransform=_sub_geotransform(dataset.GetGeoTransform(), col_off, row_off),
+        nodata=band.GetNoDataValue(),
+    )
+
+
+def iter_tiles(dataset, extent, band_index: int = 1, max_tile_cells: int = 1 << 20):
+    """Yield ``RasterWindow`` tiles covering *extent*, aligned to GDAL blocks.
+
+    See :func:`tile_offsets` for the tiling.  Peak memory depends on the
+    tile size only, not on the DTM resolution or extent.
+    """
+    for offsets in tile_offsets(dataset, extent, band_index, max_tile_cells):
+        yield read_tile(dataset, offsets, band_index)
+
+
+def iter_candidate_tiles(dataset, extent, pyramid: MaxPyramid, candidates,
+                         band_index: int = 1, max_tile_cells: int = 1 << 20):
+    """Like :func:`iter_tiles`, restricted to the pyramid's *candidates*.
+
+    Tiles without a candidate block are not read at all.
+    """
+    for offsets in tile_offsets(dataset, extent, band_index, max_tile_cells):
+        window = read_tile(dataset, offsets, band_index, pyramid, candidates)
+        if window is not None:
+            yield window
+
+
+def sample_dtm(dataset, xs, ys, band_index: int = 1,
+               max_tile_cells: int = 1 << 20) -> np.ndarray:
+    """Elevation of the DTM cell under each point (*xs*, *ys*), vectorised.
+
+    Points are grouped by the tile (native GDAL blocks grown as in
+    :func:`tile_offsets`) they fall in, and each tile is read once, only
+    over the bounding window of its points — so a million scattered
+    obstacles cost one small read per occupied tile, not one per point.
+    Points outside the raster or on NODATA give NaN.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    out = np.full(xs.shape, np.nan)
+    if not xs.size:
+        return out
+    x0, dx, _rx, y0, _ry, dy = dataset.GetGeoTransform()
+    cols = np.floor((xs.ravel() - x0) / dx)
+    rows = np.floor((ys.ravel() - y0) / dy)
+    inside = ((cols >= 0) & (cols < dataset.RasterXSize)
+              & (rows >= 0) & (rows < dataset.RasterYSize))
+    idx = np.nonzero(inside)[0]
+    if not len(idx):
+        return out
+    cols = cols[idx].astype(np.int64)
+    rows = rows[idx].astype(np.int64)
+
+    band = dataset.GetRasterBand(band_index)
+    nodata = band.GetNoDataValue()
+    tile_w, tile_h = _tile_shape(band.GetBlockSize(), max_tile_cells)
+    tile_key = (rows // tile_h) * ((dataset.RasterXSize + tile_w - 1) // tile_w) + cols // tile_w
+    order = np.argsort(tile_key, kind="stable")
+    bounds = np.flatnonzero(np.r_[True, np.diff(tile_key[order]) != 0, True])
+
+    flat = out.ravel()
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        group = order[a:b]
+        r, c = rows[group], cols[group]
+        r_a, c_a = int(r.min()), int(c.min())
+        values = band.ReadAsArray(c_a, r_a, int(c.max()) - c_a + 1, int(r.max()) - r_a + 1)
+        z = values[r - r_a, c - c_a].astype(np.float64)
+        if nodata is not None:
+            z[z == nodata] = np.nan
+        flat[idx[group]] = z
+    return out
+
+
+class TileReader:
+    """Thread-safe :func:`read_tile` over the raster at *path*.
+
+    GDAL dataset handles must not be shared between threads, so each
+    calling thread lazily opens its own handle.
+    """
+
+    def __init__(self, path: str, band_index: int = 1,
+                 pyramid: Optional[MaxPyramid] = None, candidates=None):
+        self.path = path
+        self.band_index = band_index
+        self.pyramid = pyramid
+        self.candidates = candidates
+        self._local = threading.local()
+
+    def dataset(self):
+        """This thread's handle on the raster."""
+        dataset = getattr(self._local, "dataset", None)
+        if dataset is None:
+            dataset = self._local.dataset = open_dtm(self.path)
+        return dataset
+
+    def __call__(self, offsets) -> Optional[RasterWindow]:
+        return read_tile(self.dataset(), offsets, self.band_index, self.pyramid, self.candidates)
+
+
+def raster_fingerprint(dataset) -> tuple:
+    """Identify the raster behind *dataset*: path plus file size and mtime.
+
+    The size/mtime pair invalidates cached derivatives when the file is
+    rewritten in place.  Datasets backed by several files (mosaics, VRTs)
+    fingerprint every file they list; non-file sources (``/vsi*``,
+    services) are identified by their description only.
+    """
+    files = [dataset.GetDescription()]
+    files += [f for f in (dataset.GetFileList() or ()) if f not in files]
+    parts = []
+    for path in files:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            parts.append((path, None, None))
+            continue
+        parts.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+    return parts[0] if len(parts) == 1 else tuple(parts)
+
+
+def max_pyramid(dataset, extent, band_index: int = 1, base: int = PYRAMID_BASE_BLOCK,
+                max_tile_cells: int = 1 << 20, workers: int = 1) -> MaxPyramid:
+    """Return the max-elevation pyramid of the cells covering *extent*.
+
+    Built with one tiled pass over the window — reading and reducing tiles
+    on *workers* threads — and cached in memory, so repeated analyses of
+    the same runway end and DTM (other tolerances, output options, ...)
+    reuse it.
+    """
+    geotransform = dataset.GetGeoTransform()
+    col_off, row_off, cols, rows = window_offsets(
+        geotransform, (dataset.RasterXSize, dataset.RasterYSize), extent
+    )
+    key = (raster_fingerprint(dataset), band_index, base, col_off, row_off, cols, rows)
+    pyramid = _pyramid_cache.get(key)
+    if pyramid is not None:
+        _pyramid_cache.move_to_end(key)
+        return pyramid
+
+    pyramid = MaxPyramid.empty(base, col_off, row_off, cols, rows, geotransform)
+    offsets = tile_offsets(dataset, extent, band_index, max_tile_cells)
+    if workers > 1:
+        reader = TileReader(dataset.GetDescription(), band_index)
+
+        def _reduce(tile):
+            window = reader(tile)
+            return pyramid.block_maxima(tile[0], tile[1], window.values, window.nodata)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for partial in pool.map(_reduce, offsets):
+                pyramid.merge(*partial)
+    else:
+        for tile in offsets:
+            window = read_tile(dataset, tile, band_index)
+            pyramid.add_cells(tile[0], tile[1], window.values, window.nodata)
+    pyramid.build_levels()
+
+    _pyramid_cache[key] = pyramid
+    while len(_pyramid_cache) > _PYRAMID_CACHE_SIZE:
+        _pyramid_cache.popitem(last=False)
+    return pyramid
+
+
+def surfaces_tile_reader(dataset, extent, surfaces, vertical_tolerance: float = 0.0,
+                         clip_buffer: float = 0.0, workers: int = 1) -> tuple[TileReader, int]:
+    """``TileReader`` over *extent* that skips blocks no surface can reach.
+
+    A block is read when its maximum elevation may penetrate any of the
+    ``core.surface.SurfaceGeometry`` *surfaces* (the union of the
+    :func:`max_pyramid` candidates of each).  Returns the reader and the
+    number of window cells it will never read.
+    """
+    pyramid = max_pyramid(dataset, extent, workers=workers)
+    candidates = np.logical_or.reduce([
+        pyramid.candidates(
+            surface.frame, surface.footprint, surface.der_elevation,
+            vertical_tolerance=vertical_tolerance,
+            clip_buffer=clip_buffer,
+            climb_gradient=surface.climb_gradient,
+        )
+        for surface in surfaces
+    ])
+    col_off, row_off, cols, rows = window_offsets(
+        dataset.GetGeoTransform(), (dataset.RasterXSize, dataset.RasterYSize), extent
+    )
+    skipped_cells = pyramid.skipped_cells(candidates, col_off, row_off, cols, rows)
+    reader = TileReader(dataset.GetDescription(), pyramid=pyramid, candidates=candidates)
+    return reader, skipped_cells
+
+
+class DtmWindowCache:
+    """Persistent LRU cache of clipped DTM windows.
+
+    Each entry is the raster window under one TOFPA surface, buffered by
+    the clip buffer, with every cell outside the clip set to NaN — i.e. the
+    model's ``cliprasterbymasklayer`` output — stored as a tiled GeoTIFF in
+    *directory*.  Entries are keyed by a hash of the surface (runway frame
+    and footprint), the clip buffer, the band and the source raster's
+    fingerprint, so a rewritten DTM is never served stale.
+
+    The cache holds at most *max_bytes*; the least recently used entries
+    are evicted first (use is recorded in the file mtime).
+    """
+
+    SUFFIX = ".tif"
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max(0, int(max_bytes))
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(dataset, frame, footprint, clip_buffer: float, band_index: int = 1) -> str:
+        """Cache key of the clip of *dataset* under the given surface."""
+        parts = (raster_fingerprint(dataset), band_index, frame, footprint, float(clip_buffer))
+        return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of the cached entry for *key*, marking it used; ``None`` if absent."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def clipped_dtm(self, dataset, extent, frame, footprint, clip_buffer: float,
+                    band_index: int = 1, max_tile_cells: int = 1 << 20) -> str:
+        """Return the path of the clipped window of *dataset*, clipping on a miss."""
+        key = self.key(dataset, frame, footprint, clip_buffer, band_index)
+        path = self.get(key)
+        if path is not None:
+            return path
+        path = self.path(key)
+        partial = os.path.join(self.directory, f"{key}.{os.getpid()}.{threading.get_ident()}.part")
+        try:
+            write_clipped_dtm(partial, dataset, extent, frame, footprint, clip_buffer,
+                              band_index, max_tile_cells)
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Remove least recently used entries until the cache fits its limit.
+
+        *keep* (the entry just written) is never removed, even when it alone
+        exceeds the limit.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _mtime, size, _path in entries)
+        for _mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+
+def write_clipped_dtm(path: str, dataset, extent, frame, footprint, clip_buffer: float,
+                      band_index: int = 1, max_tile_cells: int = 1 << 20) -> None:
+    """Write the window of *dataset* under *extent*, clipped, to a GeoTIFF.
+
+    Cells whose centre is farther than *clip_buffer* from the surface, and
+    NODATA cells, become NaN.  The output keeps the source alignment and
+    resolution; Float64 sources stay Float64, anything else is stored as
+    Float32.
+    """
+    geotransform = dataset.GetGeoTransform()
+    col_off, row_off, cols, rows = window_offsets(
+        geotransform, (dataset.RasterXSize, dataset.RasterYSize), extent
+    )
+    band = dataset.GetRasterBand(band_index)
+    data_type = gdal.GDT_Float64 if band.DataType == gdal.GDT_Float64 else gdal.GDT_Float32
+    driver = gdal.GetDriverByName("GTiff")
+    try:
+        out = driver.Create(path, max(cols, 1), max(rows, 1), 1, data_type,
+                            options=_CLIPPED_GTIFF_OPTIONS)
+    except RuntimeError as exc:
+        raise ValueError(f"Cannot create clipped DTM '{path}': {exc}") from exc
+    out.SetGeoTransform(_sub_geotransform(geotransform, col_off, row_off))
+    out.SetProjection(dataset.GetProjection())
+    out_band = out.GetRasterBand(1)
+    # Blocks never written (tiles outside the clip) are filled with NODATA
+    out_band.SetNoDataValue(float("nan"))
+    for tile in tile_offsets(dataset, extent, band_index, max_tile_cells):
+        window = read_tile(dataset, tile, band_index)
+        xs, ys = window.cell_centres()
+        along, cross = frame.to_local(xs, ys)
+        keep = window.valid_mask() & (footprint.distance_to(along, cross) <= clip_buffer)
+        if not keep.any():
+            continue
+        values = np.where(keep, window.values, np.nan)
+        out_band.WriteArray(values, tile[0] - col_off, tile[1] - row_off)
+    out.FlushCache()
+    out_band = None
+    out = None
+
+
+class ClearanceRasterWriter:
+    """Write terrain clearance to a tiled, DEFLATE-compressed GeoTIFF.
+
+    The output grid is the DTM window under *extent* (same alignment and
+    resolution as the source), Float32, ``CLEARANCE_NODATA`` outside the
+    clip.  Feed it each tile's ``TerrainResult`` with :meth:`write`, then
+    :meth:`close` to build the overviews.
+    """
+
+    def __init__(self, path: str, dataset, extent, projection_wkt: Optional[str] = None):
+        geotransform = dataset.GetGeoTransform()
+        col_off, row_off, cols, rows = window_offsets(
+            geotransform, (dataset.RasterXSize, dataset.RasterYSize), extent
+        )
+        self.path = path
+        self.geotransform = _sub_geotransform(geotransform, col_off, row_off)
+        self.cols, self.rows = max(cols, 1), max(rows, 1)
+
+        driver = gdal.GetDriverByName("GTiff")
+        try:
+            self._dataset = driver.Create(
+                path, self.cols, self.rows, 1, gdal.GDT_Float32, options=_CLEARANCE_GTIFF_OPTIONS
+            )
+        except RuntimeError as exc:
+            raise ValueError(f"Cannot create clearance raster '{path}': {exc}") from exc
+        self._dataset.SetGeoTransform(self.geotransform)
+        self._dataset.SetProjection(projection_wkt or dataset.GetProjection())
+        self._band = self._dataset.GetRasterBand(1)
+        self._band.SetNoDataValue(CLEARANCE_NODATA)
+        self._band.SetDescription("clearance")
+
+    def write(self, result) -> None:
+        """Write the clearance of one tile's ``TerrainResult``."""
+        if not len(result):
+            return
+        x0, dx, _rx, y0, _ry, dy = self.geotransform
+        cols = np.floor((result.x - x0) / dx).astype(np.int64)
+        rows = np.floor((result.y - y0) / dy).astype(np.int64)
+        c_a, r_a = int(cols.min()), int(rows.min())
+        block = np.full((int(rows.max()) - r_a + 1, int(cols.max()) - c_a + 1),
+                        CLEARANCE_NODATA, dtype=np.float32)
+        block[rows - r_a, cols - c_a] = result.clearance
+        # Tiles are disjoint, so the block never overlaps another tile's cells
+        self._band.WriteArray(block, c_a, r_a)
+
+    def close(self) -> str:
+        """Build internal overviews, flush and return the file path."""
+        factors = []
+        factor = 2
+        while max(self.cols, self.rows) // factor >= _MIN_OVERVIEW_SIZE:
+            factors.append(factor)
+            factor *= 2
+        if factors:
+            # Nearest keeps true clearance values; averaging would smooth
+            # penetrations away at small scales.
+            self._dataset.BuildOverviews("NEAREST", factors)
+        self._dataset.FlushCache()
+        self._band = None
+        self._dataset = None
+        return self.path
+
+
+def _tile_shape(block_size, max_tile_cells: int) -> tuple[int, int]:
+    """Grow the native block to a tile of at most *max_tile_cells* cells."""
+    block_w, block_h = (max(1, int(v)) for v in block_size)
+    budget = max(1, max_tile_cells // (block_w * block_h))
+    # Strip-organised rasters (block_h == 1) grow downwards, tiled ones evenly
+    if block_h == 1:
+        return block_w, budget
+    k = max(1, int(budget ** 0.5))
+    return block_w * k, block_h * k
+
+
+def _sub_geotransform(geotransform, col_off: int, row_off: int) -> tuple:
+    """Geotransform of a window starting at (*col_off*, *row_off*)."""
+    x0, dx, rx, y0, ry, dy = geotransform
+    return (x0 + col_off * dx, dx, rx, y0 + row_off * dy, ry, dy)
+
+
+def _check_north_up(geotransform, path: str) -> None:
+    if geotransform[2] != 0 or geotransform[4] != 0:
+        raise ValueError(f"DTM '{path}' is rotated; only north-up rasters are supported")
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Climb-gradient sweep for survey obstacles.
+
+No QGIS dependency: works on the runway-local arrays of
+``core.obstacles.ObstacleProjection`` / ``ObstacleAnalyzer.analyze_projection``.
+
+The OCS elevation is linear in the climb gradient (``z_der + along * g``
+ahead of the DER), so one pass yields, per obstacle, the smallest gradient
+whose surface clears it, and, for any list of gradients, the penetration
+counts the analysis would report at each — without re-running it.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .surface import ocs_elevation
+
+# Obstacles evaluated per block of the gradient table (bounds peak memory).
+_SWEEP_BLOCK = 65_536
+
+
+@dataclass
+class GradientSweep:
+    """Penetration statistics of one obstacle set over several climb gradients.
+
+    Attributes:
+        gradients:       Climb gradients evaluated (fractions, 0.012 = 1.2 %).
+        penetrating:     Obstacles penetrating the surface at each gradient.
+        max_penetration: Largest penetration (metres, 0.0 when clear).
+        worst_index:     Index of the obstacle holding *max_penetration*,
+                         -1 when none penetrates.
+        controlling_index:    Obstacle needing the steepest gradient to be
+                              cleared (the controlling obstacle), -1 when
+                              none with an elevation is in the footprint.
+        controlling_gradient: Its required gradient (``inf`` when no
+                              gradient clears it).
+    """
+    gradients: np.ndarray
+    penetrating: np.ndarray
+    max_penetration: np.ndarray
+    worst_index: np.ndarray
+    controlling_index: int = -1
+    controlling_gradient: float = 0.0
+
+
+def required_climb_gradient(along, elevation, z_der: float) -> np.ndarray:
+    """Smallest climb gradient whose OCS clears each obstacle.
+
+    0.0 for obstacles at or below the DER elevation, ``inf`` for obstacles
+    above it at or behind the DER (the surface is flat there, no gradient
+    clears them), ``(elevation - z_der) / along`` otherwise, NaN where the
+    elevation is NaN.  At exactly that gradient the obstacle touches the
+    surface without penetrating.
+    """
+    along = np.asarray(along, dtype=np.float64)
+    rise = np.asarray(elevation, dtype=np.float64) - z_der
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gradient = np.where(along > 0, rise / along, np.inf)
+    return np.where(np.isnan(rise), np.nan, np.where(rise <= 0, 0.0, gradient))
+
+
+def gradient_sweep(along, elevation, in_footprint, z_der: float, gradients) -> GradientSweep:
+    """Penetration counts and worst obstacle at each of *gradients*.
+
+    Counts follow ``ObstacleAnalyzer.analyze_projection`` exactly: an
+    obstacle in the footprint penetrates when its elevation is above the
+    OCS (unrounded); *max_penetration* is rounded to the millimetre.
+    """
+    gradients = np.asarray(sorted(set(float(g) for g in gradients)), dtype=np.float64)
+    along = np.asarray(along, dtype=np.float64)
+    elevation = np.asarray(elevation, dtype=np.float64)
+    candidates = np.flatnonzero(np.asarray(in_footprint, dtype=bool))
+
+    penetrating = np.zeros(len(gradients), dtype=np.int64)
+    max_penetration = np.zeros(len(gradients))
+    worst_index = np.full(len(gradients), -1, dtype=np.int64)
+    for start in range(0, len(candidates), _SWEEP_BLOCK):
+        idx = candidates[start:start + _SWEEP_BLOCK]
+        pen = elevation[idx, None] - ocs_elevation(along[idx, None], z_der, gradients[None, :])
+        pen[np.isnan(pen)] = -np.inf  # no DTM under the obstacle: never penetrates
+        penetrating += np.count_nonzero(pen > 0, axis=0)
+        block_worst = np.argmax(pen, axis=0)
+        block_max = pen[block_worst, np.arange(len(gradients))]
+        better = (block_max > 0) & (block_max > max_penetration)
+        max_penetration[better] = block_max[better]
+        worst_index[better] = idx[block_worst[better]]
+
+    controlling_index, controlling_gradient = -1, 0.0
+    required = required_climb_gradient(along[candidates], elevation[candidates], z_der)
+    if not np.isnan(required).all():
+        k = int(np.nanargmax(required))
+        controlling_index, controlling_gradient = int(candidates[k]), float(required[k])
+    return GradientSweep(gradients, penetrating, np.round(max_penetration, 3), worst_index,
+                         controlling_index, controlling_gradient)
+
+
+def gradient_range(start: float, stop: float, step: float) -> np.ndarray:
+    """Gradients from *start* to *stop* inclusive every *step* (fractions)."""
+    if step <= 0 or stop < start:
+        raise ValueError(f"Invalid gradient range {start}:{stop}:{step}")
+    count = int(np.floor((stop - start) / step + 1e-9)) + 1
+    return np.round(start + np.arange(count) * step, 6)
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental obstacle re-analysis between runs.
+
+No QGIS dependency: works on the arrays of
+``core.obstacles.ObstacleProjection`` / ``ObstacleAnalyzer.analyze_projection``.
+
+A run leaves an ``ObstacleRunState``: its ``core.records.ObstacleRecords``,
+a 64-bit signature of each obstacle's base point and height, and the key of
+the parameters they were computed with.  When the next run has the same
+key, ``diff_obstacles`` tells which obstacles were added, changed or
+removed; only those are analysed again and ``merge_state`` rebuilds the
+full record store from the previous one.
+
+Shadowing only looks at obstacles within ``shadow_tolerance`` degrees of
+each other as seen from the takeoff point, so ``shadow_sectors`` re-runs
+``core.shadow.shadow_sweep`` just for the critical obstacles in the angular
+sectors around the touched obstacles (old and new positions).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from .records import ObstacleRecords
+from .shadow import shadow_sweep
+
+# FNV-1a offset basis and prime, applied per 64-bit word rather than per byte.
+_SIGNATURE_SEED = np.uint64(0xCBF29CE484222325)
+_SIGNATURE_PRIME = np.uint64(0x100000001B3)
+# Bearings here (numpy) and in shadow_sweep (math) may differ in the last bit.
+_BEARING_EPS = 1e-9
+
+
+def obstacle_signatures(x, y, height, ground=None) -> np.ndarray:
+    """64-bit signature per obstacle of its base point, height and ground.
+
+    Any change of a coordinate or of the raw height value (NaN included)
+    changes the signature; equal inputs always give equal signatures.
+    """
+    columns = [x, y, height] + ([] if ground is None else [ground])
+    signature = np.full(len(np.atleast_1d(x)), _SIGNATURE_SEED, dtype=np.uint64)
+    for column in columns:
+        bits = np.ascontiguousarray(column, dtype=np.float64).view(np.uint64)
+        signature = (signature ^ bits) * _SIGNATURE_PRIME
+        signature ^= signature >> np.uint64(29)
+    return signature
+
+
+@dataclass
+class ObstacleChanges:
+    """Differences between the obstacles of two runs.
+
+    Attributes:
+        added:    Indices (new run) of obstacles without a previous result.
+        changed:  Indices (new run) of obstacles whose signature changed.
+        changed_old: Their indices in the previous run.
+        removed:  Indices (previous run) of obstacles gone from the new one.
+        kept_new, kept_old: Unchanged obstacles in the new / previous run.
+    """
+    added: np.ndarray
+    changed: np.ndarray
+    changed_old: np.ndarray
+    removed: np.ndarray
+    kept_new: np.ndarray
+    kept_old: np.ndarray
+
+    @classmethod
+    def all_added(cls, count: int) -> "ObstacleChanges":
+        empty = np.empty(0, dtype=np.int64)
+        return cls(np.arange(count), empty, empty, empty, empty, empty)
+
+    @property
+    def fresh(self) -> np.ndarray:
+        """Indices (new run) of the obstacles to analyse, in run order."""
+        return np.sort(np.concatenate((self.added, self.changed)))
+
+    def __len__(self) -> int:
+        return len(self.added) + len(self.changed) + len(self.removed)
+
+
+def diff_obstacles(old_ids, old_signatures, new_ids, new_signatures) -> ObstacleChanges:
+    """Match two runs by feature id and compare their signatures."""
+    old_ids = np.asarray(old_ids, dtype=np.int64)
+    new_ids = np.asarray(new_ids, dtype=np.int64)
+    if not len(old_ids):
+        return ObstacleChanges.all_added(len(new_ids))
+
+    order = np.argsort(old_ids, kind="stable")
+    pos = np.minimum(np.searchsorted(old_ids[order], new_ids), len(old_ids) - 1)
+    old_index = order[pos]
+    found = old_ids[old_index] == new_ids
+    same = found & (np.asarray(old_signatures)[old_index] == np.asarray(new_signatures))
+    changed = found & ~same
+
+    present = np.zeros(len(old_ids), dtype=bool)
+    present[old_index[found]] = True
+    return ObstacleChanges(
+        added=np.flatnonzero(~found),
+        changed=np.flatnonzero(changed),
+        changed_old=old_index[changed],
+        removed=np.flatnonzero(~present),
+        kept_new=np.flatnonzero(same),
+        kept_old=old_index[same],
+    )
+
+
+@dataclass
+class ObstacleRunState:
+    """Per-obstacle results of one run, reused by the next.
+
+    Attributes:
+        key:        Parameters the results depend on; a run with another
+                    key starts from scratch.
+        signatures: ``obstacle_signatures`` of the analysed obstacles.
+        records:    Their results, in run order; no obstacle is flagged
+                    ``SHADOWED`` when shadows were not analysed.
+    """
+    key: tuple
+    signatures: np.ndarray
+    records: ObstacleRecords
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
+def merge_state(
+    key: tuple,
+    previous: Optional[ObstacleRunState],
+    changes: ObstacleChanges,
+    signatures,
+    fresh: ObstacleRecords,
+) -> ObstacleRunState:
+    """New run state from *previous* and the records of ``changes.fresh``.
+
+    Unchanged obstacles keep their previous records, shadow included;
+    fresh ones start unshadowed.
+    """
+    records = ObstacleRecords.empty(len(signatures))
+    records.put(changes.fresh, fresh)
+    if previous is not None:
+        records.put(changes.kept_new, previous.records.subset(changes.kept_old))
+    return ObstacleRunState(key, np.asarray(signatures), records)
+
+
+def bearings(x, y, origin_x: float, origin_y: float) -> np.ndarray:
+    """Bearing in degrees (-180, 180] from the origin, as ``shadow_sweep``."""
+    return np.degrees(np.arctan2(np.asarray(x) - origin_x, np.asarray(y) - origin_y))
+
+
+def in_sectors(bearing, centres, half_width: float) -> np.ndarray:
+    """Mask of the *bearing* values within *half_width* degrees of any centre."""
+    bearing = np.asarray(bearing, dtype=np.float64)
+    centres = np.sort(np.asarray(centres, dtype=np.float64))
+    if not len(centres):
+        return np.zeros(len(bearing), dtype=bool)
+    pos = np.searchsorted(centres, bearing)
+    nearest = np.full(len(bearing), np.inf)
+    for neighbour in (centres[(pos - 1) % len(centres)], centres[pos % len(centres)]):
+        diff = np.abs(bearing - neighbour) % 360.0
+        nearest = np.minimum(nearest, np.minimum(diff, 360.0 - diff))
+    return nearest <= half_width
+
+
+def shadow_sectors(
+    records: ObstacleRecords,
+    origin: Tuple[float, float, float],
+    shadow_tolerance: float = 5.0,
+    touched: Optional[Sequence[float]] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Shadow analysis of the critical obstacles in the touched sectors.
+
+    Args:
+        records: Every obstacle of the run.
+        origin:  Takeoff reference point ``(x, y, z)``.
+        touched: Bearings (degrees from *origin*) of the obstacles added,
+                 changed or removed since the previous run; ``None``
+                 re-evaluates every critical obstacle.
+
+    Returns ``(targets, shadowing)``: the indices of the re-evaluated
+    critical obstacles and, for each, the index of the obstacle shadowing
+    it or -1 (see ``ObstacleRecords.set_shadows``).  Decisions are those of
+    ``shadow_sweep`` over all critical obstacles: a target is only compared
+    with obstacles within *shadow_tolerance* of it, which all lie within
+    twice that of a touched bearing and are swept in the same order.
+    """
+    candidates = np.flatnonzero(records.critical)
+    targets = candidates
+    if touched is not None:
+        bearing = bearings(records.x[candidates], records.y[candidates], origin[0], origin[1])
+        targets = candidates[in_sectors(bearing, touched, shadow_tolerance + _BEARING_EPS)]
+        candidates = candidates[in_sectors(bearing, touched, 2 * shadow_tolerance + _BEARING_EPS)]
+    if not len(targets):
+        return targets, np.empty(0, dtype=np.int64)
+
+    shadowing = shadow_sweep(
+        records.x[candidates].tolist(),
+        records.y[candidates].tolist(),
+        records.z[candidates].tolist(),
+        records.ids[candidates].tolist(),
+        origin[0], origin[1], origin[2],
+        shadow_tolerance,
+    )
+    shadowing = np.array([-1 if s is None else candidates[s] for s in shadowing], dtype=np.int64)
+    return targets, shadowing[np.searchsorted(candidates, targets)]
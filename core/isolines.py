@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+Clearance isolines: where the terrain meets the TOFPA surface.
+
+No QGIS dependency.
+
+Vectorised marching squares over the per-cell clearance grid (surface
+elevation minus DTM elevation plus tolerance, see ``core.terrain``).  Level
+0 traces the terrain/surface intersection; other levels give, e.g., the
+line 10 m below (``+10``) or above (``-10``) the surface.
+
+The grid is processed tile by tile.  Tiles overlap by one row and column
+(``core.dtm.tile_offsets(overlap=1)``) so every square of four cell centres
+belongs to exactly one tile.  Segments are keyed by the grid edge they
+cross, which is the same integer in every tile, and joined into polylines
+at the end with pointer jumping — memory holds the isoline segments, never
+the whole grid.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from .surface import TOFPA_CLIMB_GRADIENT, RunwayFrame, SurfaceFootprint
+from .terrain import clearance_grid, reference_line_distance
+
+# Square corners in (row, col) offsets and the bit each sets in the case index.
+_CORNERS = ((0, 0), (0, 1), (1, 1), (1, 0))      # tl, tr, br, bl
+_CORNER_BITS = (8, 4, 2, 1)
+# Square edges: the two corners each one joins (indices into _CORNERS).
+_EDGE_CORNERS = ((0, 1), (1, 2), (3, 2), (0, 3))  # top, right, bottom, left
+_EDGE_MIDPOINTS = ((0.5, 0.0), (1.0, 0.5), (0.5, 1.0), (0.0, 0.5))  # (x, y), y down
+
+
+@dataclass
+class Isoline:
+    """One traced isoline.
+
+    Attributes:
+        level:  Clearance level in metres (0 = terrain meets the surface).
+        coords: ``(n, 3)`` array of x, y and surface elevation; closed
+                lines repeat their first vertex.
+    """
+    level: float
+    coords: np.ndarray
+
+    @property
+    def is_closed(self) -> bool:
+        return len(self.coords) > 2 and bool(np.all(self.coords[0] == self.coords[-1]))
+
+
+def _build_case_table() -> Dict[tuple, List[tuple]]:
+    """Segments per (case, centre above level) as oriented (from, to) edge pairs.
+
+    Every segment is oriented with the cells above the level on the same
+    side (the right, in map coordinates of a north-up raster), so along any
+    isoline each crossed edge has exactly one outgoing and one incoming
+    segment.
+    """
+    table = {}
+    for case in range(16):
+        above = [bool(case & bit) for bit in _CORNER_BITS]
+        crossed = [e for e, (a, b) in enumerate(_EDGE_CORNERS) if above[a] != above[b]]
+        for centre_above in (False, True):
+            if len(crossed) == 4:
+                # Saddle: cut off the corners on the other side of the centre
+                lonely = [k for k in range(4) if above[k] != centre_above]
+                pairs = [tuple(e for e in range(4) if k in _EDGE_CORNERS[e]) for k in lonely]
+            elif len(crossed) == 2:
+                pairs = [tuple(crossed)]
+            else:
+                pairs = []
+            segments = []
+            for a, b in pairs:
+                (ax, ay), (bx, by) = _EDGE_MIDPOINTS[a], _EDGE_MIDPOINTS[b]
+                # Normal of a -> b in row/col coordinates
+                nx, ny = -(by - ay), bx - ax
+                mx, my = (ax + bx) / 2, (ay + by) / 2
+                # Judge by the corner the segment cuts off (adjacent edges),
+                # else by any corner: both sides are then uniform.
+                shared = set(_EDGE_CORNERS[a]) & set(_EDGE_CORNERS[b])
+                k = shared.pop() if shared else 0
+                r, c = _CORNERS[k]
+                on_right = (c - mx) * nx + (r - my) * ny > 0
+                segments.append((a, b) if above[k] == on_right else (b, a))
+            table[(case, centre_above)] = segments
+    return table
+
+
+_CASES = _build_case_table()
+
+
+class IsolineBuilder:
+    """Collect marching-squares segments tile by tile and join them.
+
+    Args:
+        geotransform: GDAL geotransform of the full raster; tiles are placed
+                      on it by their ``(row_off, col_off)``.
+        levels:       Clearance levels to trace (metres).
+        raster_width: Raster width in cells (for the integer edge keys).
+    """
+
+    def __init__(self, geotransform: tuple, levels: Sequence[float], raster_width: int):
+        self.geotransform = geotransform
+        self.levels = [float(level) for level in levels]
+        self._key_width = int(raster_width) + 1
+        self._parts: Dict[float, List[tuple]] = {level: [] for level in self.levels}
+
+    def add(self, clearance: np.ndarray, row_off: int, col_off: int) -> None:
+        """March one clearance tile (NaN outside the clip) at every level."""
+        grid = np.asarray(clearance, dtype=np.float64)
+        if grid.shape[0] < 2 or grid.shape[1] < 2:
+            return
+        corners = [grid[r:grid.shape[0] - 1 + r, c:grid.shape[1] - 1 + c] for r, c in _CORNERS]
+        valid = np.logical_and.reduce([np.isfinite(v) for v in corners])
+        if not valid.any():
+            return
+        sq_rows, sq_cols = np.nonzero(valid)
+        values = [v[valid] for v in corners]
+        centre = sum(values) / 4.0
+        for level in self.levels:
+            part = self._march(values, centre, sq_rows + row_off, sq_cols + col_off, level)
+            if part is not None:
+                self._parts[level].append(part)
+
+    def isolines(self, frame: RunwayFrame, der_elevation: float,
+                 climb_gradient: float = TOFPA_CLIMB_GRADIENT) -> List[Isoline]:
+        """Join the collected segments into polylines with surface elevations."""
+        lines = []
+        for level in self.levels:
+            if not self._parts[level]:
+                continue
+            start, end, sx, sy, ex, ey = (np.concatenate(v) for v in zip(*self._parts[level]))
+            for xs, ys in _join(start, end, sx, sy, ex, ey):
+                along, cross = frame.to_local(xs, ys)
+                zs = der_elevation + reference_line_distance(along, cross) * climb_gradient
+                lines.append(Isoline(level, np.column_stack((xs, ys, zs))))
+        return lines
+
+    # ------------------------------------------------------------------
+
+    def _march(self, values, centre, rows, cols, level):
+        """Segments of one tile at *level*: (start key, end key, start xy, end xy)."""
+        bits = sum((v > level).astype(np.int64) * bit for v, bit in zip(values, _CORNER_BITS))
+        crossing = (bits != 0) & (bits != 15)
+        if not crossing.any():
+            return None
+        rows, cols, bits, centre_above = (
+            rows[crossing], cols[crossing], bits[crossing], centre[crossing] > level
+        )
+        values = [v[crossing] for v in values]
+
+        starts, ends = [], []
+        for (case, above), segments in _CASES.items():
+            if not segments:
+                continue
+            mask = (bits == case) & (centre_above == above)
+            if not mask.any():
+                continue
+            idx = np.nonzero(mask)[0]
+            for a, b in segments:
+                starts.append((idx, a))
+                ends.append((idx, b))
+
+        out = []
+        for pairs in (starts, ends):
+            keys, xs, ys = [], [], []
+            for idx, edge in pairs:
+                k, x, y = self._edge_point(values, rows, cols, idx, edge, level)
+                keys.append(k)
+                xs.append(x)
+                ys.append(y)
+            out.append((np.concatenate(keys), np.concatenate(xs), np.concatenate(ys)))
+        (start, sx, sy), (end, ex, ey) = out
+        return start, end, sx, sy, ex, ey
+
+    def _edge_point(self, values, rows, cols, idx, edge, level):
+        """Integer key and interpolated position of *edge* in squares *idx*.
+
+        Interpolation always runs from the edge's top/left cell, so a
+        shared edge gives bit-identical points in neighbouring tiles.
+        """
+        a, b = _EDGE_CORNERS[edge]
+        va, vb = values[a][idx], values[b][idx]
+        ra, ca = _CORNERS[a]
+        rb, cb = _CORNERS[b]
+        r = rows[idx] + ra
+        c = cols[idx] + ca
+        t = (level - va) / (vb - va)
+        x0, dx, _rx, y0, _ry, dy = self.geotransform
+        horizontal = ra == rb
+        key = (r * self._key_width + c) * 2 + (0 if horizontal else 1)
+        if horizontal:
+            return key, x0 + (c + 0.5 + t) * dx, y0 + (r + 0.5) * dy
+        return key, x0 + (c + 0.5) * dx, y0 + (r + 0.5 + t) * dy
+
+
+def trace_clearance_isolines(
+    tiles: Iterable[tuple],
+    read: Callable,
+    frame: RunwayFrame,
+    footprint: SurfaceFootprint,
+    der_elevation: float,
+    levels: Sequence[float],
+    geotransform: tuple,
+    raster_width: int,
+    vertical_tolerance: float = 0.0,
+    clip_buffer: float = 0.0,
+    climb_gradient: float = TOFPA_CLIMB_GRADIENT,
+) -> List[Isoline]:
+    """Trace clearance isolines over the DTM tile by tile.
+
+    Args:
+        tiles: ``(col_off, row_off, cols, rows)`` tiles overlapping by one
+               cell, i.e. ``core.dtm.tile_offsets(..., overlap=1)``.
+        read:  Callable turning a tile into a ``RasterWindow``
+               (``core.dtm.TileReader``).
+        levels: Clearance levels in metres; 0 is the terrain/surface
+               intersection.
+
+    Only one tile's grid is in memory at a time.
+    """
+    builder = IsolineBuilder(geotransform, levels, raster_width)
+    for tile in tiles:
+        window = read(tile)
+        if window is None:
+            continue
+        grid = clearance_grid(
+            window, frame, footprint, der_elevation,
+            vertical_tolerance=vertical_tolerance,
+            clip_buffer=clip_buffer,
+            climb_gradient=climb_gradient,
+        )
+        builder.add(grid, tile[1], tile[0])
+    return builder.isolines(frame, der_elevation, climb_gradient)
+
+
+def _join(start, end, sx, sy, ex, ey):
+    """Chain oriented segments sharing edge keys into polylines.
+
+    Yields ``(xs, ys)`` per polyline.  Open lines run from a segment without
+    predecessor; closed ones are cut at their lowest segment index and
+    repeat their first vertex.
+    """
+    n = len(start)
+    idx = np.arange(n)
+    order = np.argsort(start, kind="stable")
+    pos = np.minimum(np.searchsorted(start[order], end), n - 1)
+    hit = start[order][pos] == end
+    succ = np.where(hit, order[pos], -1)
+    pred = np.full(n, -1)
+    pred[succ[hit]] = idx[hit]
+
+    steps = max(1, int(np.ceil(np.log2(n))) + 1)
+
+    # Cycles: no head reachable through pred.  Cut each at its minimum index.
+    root = np.where(pred < 0, idx, pred)
+    for _ in range(steps):
+        root = root[root]
+    in_cycle = pred[root] >= 0
+    if in_cycle.any():
+        low = np.where(in_cycle, idx, n)
+        jump = np.where(succ >= 0, succ, idx)
+        for _ in range(steps):
+            low = np.minimum(low, low[jump])
+            jump = jump[jump]
+        cut = np.nonzero(in_cycle & (low == idx))[0]
+        pred[cut] = -1
+
+    # List ranking towards the head of every chain
+    link = np.where(pred < 0, idx, pred)
+    head = link.copy()
+    rank = (pred >= 0).astype(np.int64)
+    for _ in range(steps):
+        rank = rank + rank[head]
+        head = head[head]
+
+    chain_order = np.lexsort((rank, head))
+    heads = head[chain_order]
+    bounds = np.flatnonzero(np.r_[True, heads[1:] != heads[:-1], True])
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        seg = chain_order[a:b]
+        xs = np.r_[sx[seg], ex[seg[-1]]]
+        ys = np.r_[sy[seg], ey[seg[-1]]]
+        yield xs, ys
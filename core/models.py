@@ -12,9 +12,12 @@ dataclasses rather than a sprawling positional argument list.
 
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass
 from enum import IntEnum
-from typing import Optional
+from typing import Optional, Tuple
+
+from .gradient import gradient_range
 
 
 class RunwayDirection(IntEnum):
@@ -51,6 +54,9 @@ class TofpaParams:
     # Contour generation (issue #27) — 0 = disabled
     contour_interval_m: int = 0
 
+    # Aerodrome batch: every runway feature in both directions (``s`` ignored)
+    aerodrome_batch: bool = False
+
     @classmethod
     def from_dict(cls, d: dict) -> "TofpaParams":
         """Build from the dict returned by ``TofpaDockWidget.get_parameters()``."""
@@ -67,6 +73,7 @@ class TofpaParams:
             export_kmz=bool(d.get("export_kmz", False)),
             export_aixm=bool(d.get("export_aixm", False)),
             contour_interval_m=int(d.get("contour_interval_m", 0)),
+            aerodrome_batch=bool(d.get("aerodrome_batch", False)),
         )
 
 
@@ -81,6 +88,10 @@ class ObstacleParams:
     min_obstacle_height: float   # minimum height threshold — shorter obstacles are ignored
     enable_shadow_analysis: bool
     shadow_tolerance: float      # angular cone (degrees) within which shadowing can occur
+    heights_agl: bool = False    # height field is above ground; add the sampled ground DTM
+    ground_dtm_layer_id: Optional[str] = None  # DTM sampled at obstacle bases when heights_agl
+    gradient_sweep: Tuple[float, ...] = ()  # climb gradients (fractions) to tabulate; empty = off
+    workers: int = 1             # processes sharing the penetration test (large surveys)
 
     @classmethod
     def from_dict(cls, d: dict) -> "ObstacleParams":
@@ -93,4 +104,91 @@ class ObstacleParams:
             min_obstacle_height=float(d.get("min_obstacle_height", 5.0)),
             enable_shadow_analysis=bool(d.get("enable_shadow_analysis", False)),
             shadow_tolerance=float(d.get("shadow_tolerance", 5.0)),
+            heights_agl=bool(d.get("obstacle_heights_agl", False)),
+            ground_dtm_layer_id=d.get("obstacle_ground_dtm_id"),
+            gradient_sweep=parse_gradients(d.get("obstacle_gradient_sweep", "")),
+            workers=max(1, int(d.get("obstacle_workers", os.cpu_count() or 1))),
+        )
+
+
+@dataclass
+class TerrainParams:
+    """Terrain (DTM) penetration analysis parameters extracted from the TOFPA panel.
+
+    Mirrors the inputs of ``model/TOFPA_analysis.model3``.
+    """
+
+    include_terrain: bool
+    dtm_layer_id: Optional[str]
+    dtm_post_spacing: float      # DTM post spacing (metres); clip buffer = post diagonal
+    vertical_tolerance_m: float  # added to every DTM elevation before comparison
+    source: str                  # free-text annotation copied to the ``source`` field
+    penetrating_only: bool = False  # output only cells with clearance < 0
+    workers: int = 1             # DTM tiles analysed in parallel (threads)
+    output_mode: str = "points"  # "points" (model layer) or "raster" (clearance GeoTIFF)
+    raster_path: str = ""        # clearance GeoTIFF path; empty = temporary file
+    penetration_areas: bool = False  # polygons of contiguous penetrating cells
+    isoline_levels: Tuple[float, ...] = ()  # clearance isoline levels (metres); empty = off
+    cache_mb: int = 2048         # on-disk cache of clipped DTM windows (MB); 0 = off
+    dtm_fallback_ids: Tuple[str, ...] = ()  # further DTM layers where the DTM has no data, by priority
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "TerrainParams":
+        """Build from the dict returned by ``TofpaDockWidget.get_parameters()``."""
+        return cls(
+            include_terrain=bool(d.get("include_terrain", False)),
+            dtm_layer_id=d.get("dtm_layer_id"),
+            dtm_post_spacing=float(d.get("dtm_post_spacing", 0.0)),
+            vertical_tolerance_m=float(d.get("vertical_tolerance_m", 0.0)),
+            source=str(d.get("terrain_source", "SRTM")),
+            penetrating_only=bool(d.get("terrain_penetrating_only", False)),
+            workers=max(1, int(d.get("terrain_workers", os.cpu_count() or 1))),
+            output_mode=str(d.get("terrain_output_mode", "points")),
+            raster_path=str(d.get("terrain_raster_path", "") or ""),
+            penetration_areas=bool(d.get("terrain_penetration_areas", False)),
+            isoline_levels=parse_levels(d.get("terrain_isoline_levels", "")),
+            cache_mb=max(0, int(d.get("terrain_cache_mb", 2048))),
+            dtm_fallback_ids=tuple(d.get("dtm_fallback_ids") or ()),
         )
+
+
+def parse_levels(value) -> Tuple[float, ...]:
+    """Parse clearance levels such as ``"-10, 0, 10"`` into sorted unique floats.
+
+    Accepts a string (comma, semicolon or space separated) or a sequence of
+    numbers.  Raises ``ValueError`` on a token that is not a number.
+    """
+    if isinstance(value, str):
+        tokens = value.replace(";", " ").replace(",", " ").split()
+    else:
+        tokens = list(value or ())
+    try:
+        return tuple(sorted({float(token) for token in tokens}))
+    except ValueError as exc:
+        raise ValueError(f"Invalid clearance level list '{value}': {exc}") from exc
+
+
+def parse_gradients(value) -> Tuple[float, ...]:
+    """Parse climb gradients in percent into sorted unique fractions.
+
+    Accepts a list such as ``"1.2, 2.5, 3.3"`` and/or ranges
+    ``start:stop:step`` (``"1.2:5:0.1"``, stop inclusive).  Raises
+    ``ValueError`` on malformed input.
+    """
+    if isinstance(value, str):
+        tokens = value.replace(";", " ").replace(",", " ").split()
+    else:
+        tokens = [str(v) for v in (value or ())]
+    gradients = set()
+    try:
+        for token in tokens:
+            if ":" in token:
+                start, stop, step = (float(part) for part in token.split(":"))
+                gradients.update(gradient_range(start, stop, step) / 100.0)
+            else:
+                gradients.add(float(token) / 100.0)
+    except ValueError as exc:
+        raise ValueError(f"Invalid climb gradient list '{value}': {exc}") from exc
+    if any(g <= 0 for g in gradients):
+        raise ValueError(f"Invalid climb gradient list '{value}': gradients must be positive")
+    return tuple(sorted(round(float(g), 8) for g in gradients))
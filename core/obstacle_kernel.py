@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Obstacle penetration kernel and its process pool.
+
+No QGIS dependency: worker processes import this module, ``core.surface``,
+``core.gradient`` and ``core.records`` only (``QgsFeature`` /
+``QgsGeometry`` cannot be pickled, and a worker must not start a QGIS
+application).
+
+``evaluate_obstacles`` is the array test behind
+``ObstacleAnalyzer.analyze_projection``: footprint membership of each
+obstacle buffer and 3-D penetration of the OCS, in the runway-local frame.
+
+``ObstaclePool`` runs the same kernel on chunks of a large obstacle set in
+worker processes.  The input columns are copied once into a
+``multiprocessing.shared_memory`` block; every worker attaches to it,
+evaluates its ``[start, stop)`` slice and writes height, penetration,
+required gradient and one byte of flags into a shared output block.
+Nothing but the chunk bounds crosses the process boundary.
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+from .gradient import required_climb_gradient
+from .records import CRITICAL, IN_FOOTPRINT
+from .surface import SurfaceFootprint, surface_sample
+
+logger = logging.getLogger("TOFPA.obstacle_kernel")
+
+
+def evaluate_obstacles(
+    along,
+    cross,
+    height,
+    footprint: SurfaceFootprint,
+    buffer_distance: float,
+    min_height: float,
+    der_elevation: float = 0.0,
+    climb_gradient: float = 0.012,
+    ground_elevations=None,
+) -> dict:
+    """Penetration test of obstacles given in the runway-local frame.
+
+    *height* holds the raw height values (NaN when missing): they are
+    clamped to at least *min_height*, then *ground_elevations* (if any)
+    are added.  Returns a dict of equally sized arrays: ``height``,
+    ``in_footprint``, ``ocs_elevation``, ``penetration_m`` (rounded to mm,
+    0.0 outside the footprint), ``is_critical`` (unrounded excess > 0, so an
+    obstacle 0.1 mm above the OCS is critical with ``penetration_m`` 0.0)
+    and ``required_gradient`` (NaN outside the footprint).
+    """
+    along = np.asarray(along, dtype=np.float64)
+    height = np.asarray(height, dtype=np.float64)
+    height = np.where(np.isnan(height), min_height, np.maximum(height, min_height))
+    if ground_elevations is not None:
+        height = height + np.asarray(ground_elevations, dtype=np.float64)
+
+    surface = surface_sample(along, cross, footprint, der_elevation, climb_gradient,
+                             buffer_distance)
+    in_footprint, z_ocs = surface.inside, surface.elevation
+    # Criticality on the exact excess, as analyze_single; only the output is rounded
+    excess = height - z_ocs
+    penetration_m = np.where(in_footprint, np.round(excess, 3), 0.0)
+    required = np.where(
+        in_footprint, required_climb_gradient(along, height, der_elevation), np.nan
+    )
+    return {
+        "height": height,
+        "in_footprint": in_footprint,
+        "ocs_elevation": z_ocs,
+        "penetration_m": penetration_m,
+        "is_critical": in_footprint & (excess > 0),
+        "required_gradient": required,
+    }
+
+
+class ObstaclePool:
+    """Worker processes evaluating obstacle chunks over shared memory.
+
+    Args:
+        workers:    Worker processes; ``1`` evaluates on the calling thread.
+        min_chunk:  Smallest chunk handed to a worker.  Sets below
+                    ``2 * min_chunk`` obstacles are evaluated inline: the
+                    kernel is a few vectorised passes, so smaller sets do not
+                    pay for the copy into shared memory.
+
+    The processes are started on first use and kept until ``close()``, so
+    only the first parallel run pays the interpreter start-up.  If they
+    cannot be started (or die), evaluation falls back to the calling thread.
+    """
+
+    def __init__(self, workers: int = 1, min_chunk: int = 131_072):
+        self.workers = max(1, int(workers))
+        self.min_chunk = max(1, int(min_chunk))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_workers = 0
+
+    def evaluate(
+        self,
+        along,
+        cross,
+        height,
+        footprint: SurfaceFootprint,
+        buffer_distance: float,
+        min_height: float,
+        der_elevation: float = 0.0,
+        climb_gradient: float = 0.012,
+        ground_elevations=None,
+    ) -> dict:
+        """``evaluate_obstacles`` split over the worker processes."""
+        count = len(along)
+        chunks = min(self.workers * 4, count // self.min_chunk)
+        if self.workers <= 1 or chunks < 2:
+            return evaluate_obstacles(along, cross, height, footprint, buffer_distance,
+                                      min_height, der_elevation, climb_gradient,
+                                      ground_elevations)
+
+        columns = [along, cross, height]
+        if ground_elevations is not None:
+            columns.append(ground_elevations)
+        inputs = shared_memory.SharedMemory(create=True, size=8 * len(columns) * count)
+        outputs = shared_memory.SharedMemory(create=True, size=(8 * 4 + 1) * count)
+        try:
+            in_array = np.ndarray((len(columns), count), dtype=np.float64, buffer=inputs.buf)
+            for row, column in zip(in_array, columns):
+                row[:] = column
+            spec = (inputs.name, outputs.name, count, len(columns) == 4, footprint,
+                    float(buffer_distance), float(min_height), float(der_elevation),
+                    float(climb_gradient))
+            bounds = np.linspace(0, count, chunks + 1).astype(np.int64)
+            try:
+                executor = self._pool()
+                futures = [executor.submit(_evaluate_chunk, spec, int(a), int(b))
+                           for a, b in zip(bounds[:-1], bounds[1:])]
+                for future in futures:
+                    future.result()
+            except (BrokenProcessPool, OSError) as exc:
+                logger.warning("Obstacle worker processes unavailable (%s); "
+                               "evaluating on the calling thread", exc)
+                self.close()
+                self.workers = 1
+                return evaluate_obstacles(along, cross, height, footprint, buffer_distance,
+                                          min_height, der_elevation, climb_gradient,
+                                          ground_elevations)
+            values, flags = _output_arrays(outputs, count)
+            return {
+                "height": values[0].copy(),
+                "in_footprint": (flags & IN_FOOTPRINT) != 0,
+                "ocs_elevation": values[1].copy(),
+                "penetration_m": values[2].copy(),
+                "is_critical": (flags & CRITICAL) != 0,
+                "required_gradient": values[3].copy(),
+            }
+        finally:
+            # Views into the blocks must be gone before they are closed
+            in_array = values = flags = None
+            for block in (inputs, outputs):
+                block.close()
+                block.unlink()
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None or self._executor_workers != self.workers:
+            self.close()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=_spawn_context()
+            )
+            self._executor_workers = self.workers
+        return self._executor
+
+
+def _spawn_context():
+    """``spawn`` context running a plain Python interpreter.
+
+    Embedded interpreters (QGIS) report the application binary as
+    ``sys.executable``; spawning it would start another application
+    instead of a worker, so the interpreter next to it is used.
+    """
+    context = multiprocessing.get_context("spawn")
+    if not os.path.basename(sys.executable).lower().startswith("python"):
+        for candidate in (
+            os.path.join(sys.exec_prefix, "pythonw.exe"),
+            os.path.join(sys.exec_prefix, "python.exe"),
+            os.path.join(sys.exec_prefix, "bin", "python3"),
+            os.path.join(sys.exec_prefix, "bin", "python"),
+        ):
+            if os.path.exists(candidate):
+                context.set_executable(candidate)
+                break
+    return context
+
+
+def _output_arrays(block, count: int):
+    values = np.ndarray((4, count), dtype=np.float64, buffer=block.buf)
+    flags = np.ndarray(count, dtype=np.uint8, buffer=block.buf, offset=8 * 4 * count)
+    return values, flags
+
+
+def _evaluate_chunk(spec, start: int, stop: int) -> int:
+    """Worker: evaluate obstacles ``[start, stop)`` of the shared input block."""
+    (in_name, out_name, count, has_ground, footprint, buffer_distance, min_height,
+     der_elevation, climb_gradient) = spec
+    inputs = shared_memory.SharedMemory(name=in_name)
+    outputs = shared_memory.SharedMemory(name=out_name)
+    try:
+        columns = np.ndarray((4 if has_ground else 3, count), dtype=np.float64,
+                             buffer=inputs.buf)[:, start:stop]
+        result = evaluate_obstacles(
+            columns[0], columns[1], columns[2], footprint, buffer_distance, min_height,
+            der_elevation, climb_gradient, columns[3] if has_ground else None,
+        )
+        values, flags = _output_arrays(outputs, count)
+        values[0, start:stop] = result["height"]
+        values[1, start:stop] = result["ocs_elevation"]
+        values[2, start:stop] = result["penetration_m"]
+        values[3, start:stop] = result["required_gradient"]
+        flags[start:stop] = (np.where(result["in_footprint"], IN_FOOTPRINT, 0)
+                             | np.where(result["is_critical"], CRITICAL, 0))
+        return stop - start
+    finally:
+        columns = values = flags = None
+        inputs.close()
+        outputs.close()
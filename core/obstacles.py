@@ -13,25 +13,39 @@ catches them and shows them via the QGIS message bar.
 from __future__ import annotations
 
 import logging
+from collections import OrderedDict
+from dataclasses import dataclass
 from math import atan, atan2, cos, pi, radians, sin
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
+import numpy as np
 from qgis.core import (
     QgsFillSymbol,
     QgsFeature,
+    QgsFeatureRequest,
     QgsField,
     QgsGeometry,
     QgsMarkerSymbol,
     QgsPoint,
     QgsPointXY,
     QgsProject,
+    QgsRectangle,
+    QgsSpatialIndex,
     QgsVectorLayer,
     QgsWkbTypes,
 )
 from ..utils.compat import FIELD_INT, FIELD_DOUBLE, FIELD_STRING, WKB_POLYGON_GEOM  # MIGA-01, MIGA-02
+from .gradient import required_climb_gradient
+from .incremental import shadow_sectors
+from .obstacle_kernel import ObstaclePool, evaluate_obstacles
+from .records import ObstacleRecords
+from .surface import RunwayFrame, SurfaceFootprint
 
 logger = logging.getLogger("TOFPA.obstacles")
 
+# Obstacles written between two ``write_results`` progress callbacks
+WRITE_CHUNK = 10_000
+
 
 # ---------------------------------------------------------------------------
 # Module-level helpers for 3-D OCS elevation computation  (BUG-B fix, C-1)
@@ -57,6 +71,300 @@ def _ocs_elevation_at_distance(d: float, z_der: float, climb_gradient: float) ->
     return z_der + d * climb_gradient
 
 
+def obstacle_base_point(geom: QgsGeometry) -> QgsPointXY:
+    """Base point of an obstacle: the point itself, or a polygon's centroid."""
+    if geom.type() == WKB_POLYGON_GEOM:
+        return geom.centroid().asPoint()
+    return geom.asPoint()
+
+
+def _gradient_pct(gradient) -> Optional[float]:
+    """Required gradient as a rounded percentage; ``None`` when not applicable
+    (outside the footprint) or when no gradient clears the obstacle."""
+    gradient = float(gradient)
+    if not np.isfinite(gradient):
+        return None
+    return round(gradient * 100.0, 3)
+
+
+class SurfaceContext:
+    """
+    Per-run, read-only view of the TOFPA surface used for footprint tests.
+
+    The surface features are fetched once, each geometry is prepared with a
+    GEOS engine and registered in a spatial index.  Every obstacle check then
+    costs a bounding-box rejection and, only for candidates, one prepared
+    ``intersects`` call — instead of a layer iteration plus a full GEOS
+    predicate per obstacle.
+
+        context = SurfaceContext(tofpa_surface_layer)
+        context.intersects(buffer_geom)
+    """
+
+    def __init__(self, tofpa_surface_layer):
+        self._index = QgsSpatialIndex()
+        # fid -> (geometry, prepared engine); the geometry is kept alive
+        # because the engine only borrows its abstract geometry.
+        self._prepared: dict[int, tuple[QgsGeometry, Any]] = {}
+        self.extent = QgsRectangle()
+        self.extent.setMinimal()
+
+        for feature in tofpa_surface_layer.getFeatures():
+            geom = feature.geometry()
+            if not geom or geom.isEmpty():
+                continue
+            geom = QgsGeometry(geom)
+            engine = QgsGeometry.createGeometryEngine(geom.constGet())
+            engine.prepareGeometry()
+            self._prepared[feature.id()] = (geom, engine)
+            self._index.addFeature(feature)
+            self.extent.combineExtentWith(geom.boundingBox())
+
+    def is_empty(self) -> bool:
+        """Return ``True`` when the surface layer had no usable geometry."""
+        return not self._prepared
+
+    def intersects(self, geometry: QgsGeometry) -> bool:
+        """Return ``True`` if *geometry* intersects any surface feature."""
+        if self.is_empty():
+            return False
+        bbox = geometry.boundingBox()
+        if not self.extent.intersects(bbox):
+            return False
+        for fid in self._index.intersects(bbox):
+            _geom, engine = self._prepared[fid]
+            if engine.intersects(geometry.constGet()):
+                return True
+        return False
+
+
+class FeatureAccumulator:
+    """
+    Collects output features per target layer and commits them in bulk.
+
+    Memory-provider ``addFeatures`` calls carry a fixed per-call overhead,
+    so one call per obstacle dominates large runs.  Features are queued here
+    and written with a single ``addFeatures`` per layer; once *max_pending*
+    features are queued across all layers everything is flushed, which caps
+    the peak number of features held outside the layers.
+
+    Targets are memory layers or any ``QgsFeatureSink`` (Processing
+    outputs); features queued for ``None`` — an output that was not
+    requested — are dropped.  With *max_pending* ``None`` nothing is
+    written before ``flush``, e.g. to edit project layers from the main
+    thread after a background run.
+
+        accumulator = FeatureAccumulator()
+        accumulator.add(layer, feature)
+        ...
+        accumulator.flush()   # mandatory before reading the layers
+    """
+
+    def __init__(self, max_pending: Optional[int] = 50_000):
+        self.max_pending = None if max_pending is None else max(1, int(max_pending))
+        self._pending: dict = {}
+        self._count = 0
+
+    def add(self, layer, feature: QgsFeature) -> None:
+        """Queue *feature* for *layer*; may trigger a flush of all layers."""
+        if layer is None:
+            return
+        key = layer.id() if isinstance(layer, QgsVectorLayer) else id(layer)
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = self._pending[key] = (layer, [])
+        entry[1].append(feature)
+        self._count += 1
+        if self.max_pending is not None and self._count >= self.max_pending:
+            self.flush()
+
+    def flush(self) -> None:
+        """Commit every queued feature, one ``addFeatures`` call per layer."""
+        for layer, features in self._pending.values():
+            if features:
+                sink = layer.dataProvider() if isinstance(layer, QgsVectorLayer) else layer
+                sink.addFeatures(features)
+        self._pending.clear()
+        self._count = 0
+
+
+@dataclass
+class ObstacleProjection:
+    """Obstacles of one layer projected into one runway-local frame.
+
+    Compact column arrays, one entry per obstacle: the feature id, the base
+    point (layer coordinates; polygon centroids) and its ``along``/``cross``
+    coordinates in *frame*, plus the raw height field value (NaN when
+    missing or not numeric).  Everything the penetration test needs, so
+    other widths, buffers or gradients only re-run array comparisons.
+    """
+    frame: RunwayFrame
+    ids: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+    along: np.ndarray
+    cross: np.ndarray
+    height: np.ndarray
+
+    @classmethod
+    def from_points(cls, frame: RunwayFrame, ids, xs, ys, heights) -> "ObstacleProjection":
+        x = np.asarray(xs, dtype=np.float64)
+        y = np.asarray(ys, dtype=np.float64)
+        along, cross = frame.to_local(x, y)
+        return cls(frame, np.asarray(ids, dtype=np.int64), x, y, along, cross,
+                   np.asarray(heights, dtype=np.float64))
+
+    @classmethod
+    def from_features(cls, frame: RunwayFrame, features, height_field: Optional[str],
+                      count: int = 0) -> "ObstacleProjection":
+        """Read base point and height of every feature of the iterable *features*.
+
+        *count* pre-sizes the columns (e.g. ``featureCount()``, which may
+        be an estimate).  Features without geometry are skipped; a missing
+        or non-numeric height is NaN.
+        """
+        count = max(0, int(count))
+        ids = np.empty(count, dtype=np.int64)
+        xs = np.empty(count)
+        ys = np.empty(count)
+        heights = np.full(count, np.nan)
+        n = 0
+        for feature in features:
+            geom = feature.geometry()
+            if not geom or geom.isEmpty():
+                continue
+            if n == len(ids):
+                grow = max(1024, n)
+                ids = np.r_[ids, np.empty(grow, dtype=np.int64)]
+                xs, ys = np.r_[xs, np.empty(grow)], np.r_[ys, np.empty(grow)]
+                heights = np.r_[heights, np.full(grow, np.nan)]
+            point = obstacle_base_point(geom)
+            ids[n], xs[n], ys[n] = feature.id(), point.x(), point.y()
+            if height_field:
+                value = feature.attribute(height_field)
+                if value is not None and isinstance(value, (int, float)):
+                    heights[n] = float(value)
+            n += 1
+        return cls.from_points(frame, ids[:n], xs[:n], ys[:n], heights[:n])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def subset(self, mask) -> "ObstacleProjection":
+        """Return the obstacles selected by the boolean or index *mask*."""
+        return ObstacleProjection(self.frame, self.ids[mask], self.x[mask], self.y[mask],
+                                  self.along[mask], self.cross[mask], self.height[mask])
+
+    def in_rectangle(self, xmin: float, ymin: float, xmax: float, ymax: float) -> np.ndarray:
+        """Mask of the obstacles whose base point lies in the rectangle."""
+        return (self.x >= xmin) & (self.x <= xmax) & (self.y >= ymin) & (self.y <= ymax)
+
+
+class ObstacleProjectionCache:
+    """``ObstacleProjection`` per layer, height field and runway frame, kept between runs.
+
+    The first request for a layer reads every feature once (base point and
+    height attribute only); later runs on the same runway end reuse the
+    arrays.  Entries of a layer are dropped as soon as it is edited
+    (``dataChanged``) or deleted, so results never come from stale data.
+    At most *max_entries* projections are kept (least recently used first
+    out).
+
+    A projection read elsewhere (e.g. on a task thread) is stored with
+    ``put``, passing the ``generation`` taken before the read started; it
+    is discarded if an edit invalidated entries in between.
+    """
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[tuple, ObstacleProjection]" = OrderedDict()
+        self._watched: dict[str, tuple] = {}
+        self._generation = 0
+
+    def get(self, layer: QgsVectorLayer, height_field: Optional[str],
+            frame: RunwayFrame) -> ObstacleProjection:
+        """Projection of every feature of *layer* into *frame*."""
+        projection = self.lookup(layer, height_field, frame)
+        if projection is None:
+            generation = self.generation
+            projection = self._project(layer, height_field, frame)
+            self.put(layer.id(), height_field, frame, projection, generation)
+        return projection
+
+    def lookup(self, layer: QgsVectorLayer, height_field: Optional[str],
+               frame: RunwayFrame) -> Optional[ObstacleProjection]:
+        """Cached projection of *layer* into *frame*, or ``None``.
+
+        Starts watching *layer* for edits, so a ``generation`` taken after
+        this call detects them.
+        """
+        self._watch(layer)
+        key = (layer.id(), height_field or "", frame)
+        projection = self._entries.get(key)
+        if projection is not None:
+            self._entries.move_to_end(key)
+        return projection
+
+    @property
+    def generation(self) -> int:
+        """Counter bumped by every invalidation."""
+        return self._generation
+
+    def put(self, layer_id: str, height_field: Optional[str], frame: RunwayFrame,
+            projection: ObstacleProjection, generation: int) -> bool:
+        """Store *projection*, unless entries were invalidated since *generation*."""
+        if generation != self._generation:
+            return False
+        self._entries[(layer_id, height_field or "", frame)] = projection
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return True
+
+    def invalidate(self, layer_id: Optional[str] = None) -> None:
+        """Drop the entries of *layer_id*, or every entry."""
+        self._generation += 1
+        for key in [k for k in self._entries if layer_id is None or k[0] == layer_id]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        """Drop every entry and disconnect from the watched layers."""
+        self.invalidate()
+        for layer, on_change in self._watched.values():
+            try:
+                layer.dataChanged.disconnect(on_change)
+                layer.willBeDeleted.disconnect(on_change)
+            except (RuntimeError, TypeError):
+                pass  # layer already deleted
+        self._watched.clear()
+
+    def _watch(self, layer: QgsVectorLayer) -> None:
+        layer_id = layer.id()
+        if layer_id in self._watched:
+            return
+
+        def on_change(*_args):
+            self.invalidate(layer_id)
+
+        layer.dataChanged.connect(on_change)
+        layer.willBeDeleted.connect(on_change)
+        self._watched[layer_id] = (layer, on_change)
+
+    @staticmethod
+    def request(layer: QgsVectorLayer, height_field: Optional[str]) -> QgsFeatureRequest:
+        """Request for every feature of *layer*, height attribute only."""
+        return QgsFeatureRequest().setSubsetOfAttributes(
+            [height_field] if height_field else [], layer.fields()
+        )
+
+    @classmethod
+    def _project(cls, layer: QgsVectorLayer, height_field: Optional[str],
+                 frame: RunwayFrame) -> ObstacleProjection:
+        return ObstacleProjection.from_features(
+            frame, layer.getFeatures(cls.request(layer, height_field)), height_field,
+            layer.featureCount(),
+        )
+
+
 class ObstacleAnalyzer:
     """
     Pure obstacle / shadow-analysis operations.
@@ -73,9 +381,10 @@ class ObstacleAnalyzer:
     # Layer creation
     # ------------------------------------------------------------------
 
-    def create_layers(self, crs) -> dict:
-        """Create memory layers for obstacles analysis including shadow analysis layers."""
-        critical_fields = [
+    @staticmethod
+    def obstacle_fields(extra_fields=()) -> list:
+        """Fields of the obstacle point layers (critical, safe, shadowed, visible)."""
+        return [
             QgsField("id", FIELD_INT),
             QgsField("height", FIELD_DOUBLE),
             QgsField("buffer_m", FIELD_DOUBLE),
@@ -84,7 +393,27 @@ class ObstacleAnalyzer:
             QgsField("penetration_m", FIELD_DOUBLE),  # C-4: MSL elevation excess above OCS (> 0 = critical)
             QgsField("shadow_status", FIELD_STRING),
             QgsField("shadowed_by", FIELD_STRING),
-        ]
+            QgsField("req_gradient_pct", FIELD_DOUBLE),  # smallest clearing climb gradient (%)
+        ] + list(extra_fields)
+
+    @staticmethod
+    def buffer_fields(extra_fields=()) -> list:
+        """Fields of the ``Obstacle_Buffers`` polygon layer."""
+        return [
+            QgsField("obstacle_id", FIELD_INT),
+            QgsField("buffer_m", FIELD_DOUBLE),
+            QgsField("status", FIELD_STRING),
+        ] + list(extra_fields)
+
+    def create_layers(self, crs, extra_fields=()) -> dict:
+        """Create memory layers for obstacles analysis including shadow analysis layers.
+
+        *extra_fields* (``QgsField``) are appended to every layer, e.g. the
+        runway end of aerodrome batch runs; features then carry the
+        matching ``extra_attributes`` of ``write_results`` /
+        ``apply_shadow_results``.
+        """
+        critical_fields = self.obstacle_fields(extra_fields)
 
         def _make_point_layer(name: str) -> QgsVectorLayer:
             layer = QgsVectorLayer(f"PointZ?crs={crs.authid()}", name, "memory")
@@ -98,12 +427,7 @@ class ObstacleAnalyzer:
         safe_layer = _make_point_layer("Safe_Obstacles")
 
         buffer_layer = QgsVectorLayer(f"PolygonZ?crs={crs.authid()}", "Obstacle_Buffers", "memory")
-        buffer_fields = [
-            QgsField("obstacle_id", FIELD_INT),
-            QgsField("buffer_m", FIELD_DOUBLE),
-            QgsField("status", FIELD_STRING),
-        ]
-        buffer_layer.dataProvider().addAttributes(buffer_fields)
+        buffer_layer.dataProvider().addAttributes(self.buffer_fields(extra_fields))
         buffer_layer.updateFields()
 
         return {
@@ -132,11 +456,16 @@ class ObstacleAnalyzer:
         der_elevation: float = 0.0,
         takeoff_azimuth: float = 0.0,
         climb_gradient: float = 0.012,
+        surface_context: Optional[SurfaceContext] = None,
+        accumulator: Optional[FeatureAccumulator] = None,
+        ground_elevation: Optional[float] = None,
     ) -> dict:
         """Analyze a single obstacle against the TOFPA surface.
 
         Returns a dict with keys: ``is_critical``, ``height``,
-        ``intersection_type``, ``obstacle_point``, ``penetration_m``.
+        ``intersection_type``, ``obstacle_point``, ``penetration_m``,
+        ``required_gradient`` (fraction, NaN when not applicable) and
+        ``required_gradient_pct``.
 
         When *der_point* is supplied, criticality is determined by a proper
         ICAO 3-D elevation comparison: the obstacle is critical only if its
@@ -144,7 +473,18 @@ class ObstacleAnalyzer:
         position (ICAO Doc 8168 §3.1.3).  Without *der_point* the previous
         2-D footprint-only logic is used as fallback.
 
-        Raises ``ValueError`` for features with invalid geometry.
+        Pass a *surface_context* built once per run (see ``SurfaceContext``);
+        without it the surface is fetched and prepared for this call alone.
+        Likewise, an *accumulator* defers the two layer writes to a bulk
+        commit; without it each feature is written immediately.
+
+        With a *ground_elevation* (MSL, e.g. from ``core.dtm.sample_dtm``)
+        the height field is read as a height above ground: the min-height
+        clamp applies to it, then the ground elevation is added so ``height``
+        and the point's Z are MSL elevations.
+
+        Raises ``ValueError`` for features with invalid geometry or a NaN
+        *ground_elevation* (no DTM data under the obstacle).
         """
         geom = feature.geometry()
         if not geom or geom.isEmpty():
@@ -156,14 +496,14 @@ class ObstacleAnalyzer:
             height_value = feature.attribute(height_field)
             if height_value is not None and isinstance(height_value, (int, float)):
                 obstacle_height = max(float(height_value), min_height)
+        if ground_elevation is not None:
+            if np.isnan(ground_elevation):
+                raise ValueError("No DTM elevation under the obstacle")
+            obstacle_height += float(ground_elevation)
 
         # Build 3-D obstacle point
-        if geom.type() == WKB_POLYGON_GEOM:
-            centroid = geom.centroid().asPoint()
-            obstacle_point = QgsPoint(centroid.x(), centroid.y(), obstacle_height)
-        else:
-            point = geom.asPoint()
-            obstacle_point = QgsPoint(point.x(), point.y(), obstacle_height)
+        base = obstacle_base_point(geom)
+        obstacle_point = QgsPoint(base.x(), base.y(), obstacle_height)
 
         # Buffer (BUG-01 fix: fromPointXY requires QgsPointXY, not QgsPoint)
         buffer_geom = (
@@ -172,22 +512,23 @@ class ObstacleAnalyzer:
         )
 
         # 1) 2-D footprint check — determine if obstacle is inside the surface area
-        intersects_footprint = False
-        intersection_type = "None"
-        for tofpa_feature in tofpa_surface_layer.getFeatures():
-            if buffer_geom.intersects(tofpa_feature.geometry()):
-                intersects_footprint = True
-                intersection_type = "Buffer intersects TOFPA surface"
-                break
+        if surface_context is None:
+            surface_context = SurfaceContext(tofpa_surface_layer)
+        intersects_footprint = surface_context.intersects(buffer_geom)
+        intersection_type = "Buffer intersects TOFPA surface" if intersects_footprint else "None"
 
         # 2) Criticality: 3-D comparison when DER context is supplied (BUG-B fix)
         is_critical = False
         penetration_m = 0.0
+        required_gradient = float("nan")
         if intersects_footprint and der_point is not None:
             d = _distance_along_axis(obstacle_point, der_point, takeoff_azimuth)
             z_ocs = _ocs_elevation_at_distance(d, der_elevation, climb_gradient)
             penetration_m = obstacle_point.z() - z_ocs
             is_critical = penetration_m > 0
+            required_gradient = float(
+                required_climb_gradient(d, obstacle_point.z(), der_elevation)
+            )
         elif intersects_footprint:
             # Fallback: no 3-D data provided → 2-D behaviour (all footprint = critical)
             is_critical = True
@@ -204,6 +545,7 @@ class ObstacleAnalyzer:
             round(penetration_m, 3),  # penetration_m
             "",  # shadow_status
             "",  # shadowed_by
+            _gradient_pct(required_gradient),  # req_gradient_pct
         ])
 
         # Build buffer feature
@@ -212,11 +554,13 @@ class ObstacleAnalyzer:
         buffer_feature.setAttributes([int(feature.id()), buffer_distance,
                                       "CRITICAL" if is_critical else "SAFE"])
 
-        if is_critical:
-            layers_info["critical_layer"].dataProvider().addFeatures([obstacle_feature])
+        target_layer = layers_info["critical_layer"] if is_critical else layers_info["safe_layer"]
+        if accumulator is not None:
+            accumulator.add(target_layer, obstacle_feature)
+            accumulator.add(layers_info["buffer_layer"], buffer_feature)
         else:
-            layers_info["safe_layer"].dataProvider().addFeatures([obstacle_feature])
-        layers_info["buffer_layer"].dataProvider().addFeatures([buffer_feature])
+            target_layer.dataProvider().addFeatures([obstacle_feature])
+            layers_info["buffer_layer"].dataProvider().addFeatures([buffer_feature])
 
         return {
             "is_critical": is_critical,
@@ -224,18 +568,143 @@ class ObstacleAnalyzer:
             "intersection_type": intersection_type,
             "obstacle_point": obstacle_point,
             "penetration_m": round(penetration_m, 3),
+            "required_gradient": required_gradient,
+            "required_gradient_pct": _gradient_pct(required_gradient),
         }
 
+    # ------------------------------------------------------------------
+    # Batch analysis
+    # ------------------------------------------------------------------
+
+    def analyze_batch(
+        self,
+        xs,
+        ys,
+        heights,
+        footprint: SurfaceFootprint,
+        buffer_distance: float,
+        min_height: float,
+        der_point,
+        der_elevation: float = 0.0,
+        takeoff_azimuth: float = 0.0,
+        climb_gradient: float = 0.012,
+        ground_elevations=None,
+    ) -> dict:
+        """Analyze many obstacles at once against the TOFPA surface.
+
+        Array counterpart of ``analyze_single`` with the same 3-D semantics
+        (``_distance_along_axis`` / ``_ocs_elevation_at_distance``), evaluated
+        in the runway-local frame of *der_point* / *takeoff_azimuth* where the
+        footprint is the closed-form *footprint*.  No layers are touched.
+
+        *heights* may contain NaN for missing values; like ``analyze_single``
+        they are replaced by *min_height*, and every height is clamped to at
+        least *min_height*.  *ground_elevations* turns them from heights
+        above ground into MSL elevations after the clamp, as in
+        ``analyze_single``; obstacles with a NaN ground elevation get a NaN
+        ``height`` and ``penetration_m`` and are never critical.
+
+        The buffer is tested as an exact disc, whereas ``analyze_single``
+        intersects a 64-vertex polygon inscribed in it; results can only
+        differ for buffers grazing the surface edge (< 0.13 % of the radius).
+
+        Returns a dict of equally sized arrays: ``height``, ``along``,
+        ``cross``, ``in_footprint``, ``ocs_elevation``, ``penetration_m``
+        (rounded to mm, 0.0 outside the footprint), ``is_critical`` and
+        ``required_gradient`` (``core.gradient.required_climb_gradient``,
+        NaN outside the footprint).
+        """
+        frame = RunwayFrame(der_point.x(), der_point.y(), takeoff_azimuth)
+        projection = ObstacleProjection.from_points(
+            frame, np.arange(len(np.atleast_1d(xs))), xs, ys, heights
+        )
+        return self.analyze_projection(
+            projection, footprint, buffer_distance, min_height,
+            der_elevation, climb_gradient, ground_elevations,
+        )
+
+    def analyze_projection(
+        self,
+        projection: ObstacleProjection,
+        footprint: SurfaceFootprint,
+        buffer_distance: float,
+        min_height: float,
+        der_elevation: float = 0.0,
+        climb_gradient: float = 0.012,
+        ground_elevations=None,
+        pool: Optional[ObstaclePool] = None,
+    ) -> dict:
+        """``analyze_batch`` on obstacles already in the runway-local frame.
+
+        Only array comparisons (``core.obstacle_kernel.evaluate_obstacles``):
+        the projection (e.g. from an ``ObstacleProjectionCache``) is reused
+        as is.  With a *pool*, large sets are split over its worker
+        processes.
+        """
+        args = (projection.along, projection.cross, projection.height, footprint,
+                buffer_distance, min_height, der_elevation, climb_gradient, ground_elevations)
+        results = pool.evaluate(*args) if pool is not None else evaluate_obstacles(*args)
+        results["along"], results["cross"] = projection.along, projection.cross
+        return results
+
+    def write_results(
+        self,
+        projection: ObstacleProjection,
+        results: dict,
+        buffer_distance: float,
+        layers_info: dict,
+        accumulator: FeatureAccumulator,
+        extra_attributes=(),
+        on_progress: Optional[Callable[[float], None]] = None,
+    ) -> ObstacleRecords:
+        """Write ``analyze_projection`` *results* to the obstacle layers.
+
+        Produces the same features as ``analyze_single`` for each obstacle
+        and returns the ``ObstacleRecords`` the shadow analysis works on.
+        *on_progress* receives the fraction written every ``WRITE_CHUNK``
+        obstacles; an exception it raises (a cancelled run) stops the write.
+        """
+        records = ObstacleRecords.from_results(projection.ids, projection.x, projection.y, results)
+        for i in range(len(records)):
+            if on_progress is not None and i % WRITE_CHUNK == 0:
+                on_progress(i / len(records))
+            fid = int(records.ids[i])
+            x, y, height = float(records.x[i]), float(records.y[i]), float(records.z[i])
+            is_critical = bool(results["is_critical"][i])
+            status = "CRITICAL" if is_critical else "SAFE"
+            intersection_type = (
+                "Buffer intersects TOFPA surface" if results["in_footprint"][i] else "None"
+            )
+
+            obstacle_feature = QgsFeature()
+            obstacle_feature.setGeometry(QgsGeometry(QgsPoint(x, y, height)))
+            obstacle_feature.setAttributes([
+                fid, height, buffer_distance, status, intersection_type,
+                float(records.penetration_m[i]), "", "",
+                _gradient_pct(records.required_gradient[i]),
+                *extra_attributes,
+            ])
+            buffer_feature = QgsFeature()
+            buffer_feature.setGeometry(
+                QgsGeometry.fromPointXY(QgsPointXY(x, y)).buffer(buffer_distance, 16)
+            )
+            buffer_feature.setAttributes([fid, buffer_distance, status, *extra_attributes])
+
+            target_layer = layers_info["critical_layer"] if is_critical else layers_info["safe_layer"]
+            accumulator.add(target_layer, obstacle_feature)
+            accumulator.add(layers_info["buffer_layer"], buffer_feature)
+        return records
+
     # ------------------------------------------------------------------
     # Shadow analysis
     # ------------------------------------------------------------------
 
     def perform_shadow_analysis(
         self,
-        obstacles_data: list[dict],
+        records: ObstacleRecords,
         tofpa_surface_layer,
         shadow_tolerance: float = 5.0,
-    ) -> dict:
+    ) -> Optional[QgsPoint]:
         """
         Determine which critical obstacles are shadowed (hidden) by others.
 
@@ -244,40 +713,23 @@ class ObstacleAnalyzer:
         2. For each critical obstacle, check whether any *closer*, *taller*
            obstacle lies within the angular cone (``shadow_tolerance`` degrees).
         3. Confirm the blockage via elevation angles.
+
+        Steps 2–3 run as a distance sweep (``core.shadow.shadow_sweep``) that
+        returns exactly what ``is_obstacle_shadowed`` would for every
+        obstacle, without the pairwise scan.  The outcome is stored in
+        *records* (``shadowed_by`` and the ``SHADOWED`` flag).
+
+        Returns the takeoff reference point, or ``None`` when the surface
+        has none (every critical obstacle is then left visible).
         """
         takeoff_point = self.get_takeoff_reference_point(tofpa_surface_layer)
         if not takeoff_point:
-            return {"shadowed_obstacles": [], "visible_obstacles": obstacles_data}
-
-        critical_obstacles = [o for o in obstacles_data if o["is_critical"]]
-        shadowed_obstacles: list[dict] = []
-        visible_obstacles: list[dict] = []
+            return None
 
-        for obstacle in critical_obstacles:
-            is_shadowed, shadowing = self.is_obstacle_shadowed(
-                obstacle, critical_obstacles, takeoff_point, shadow_tolerance
-            )
-            if is_shadowed:
-                obstacle["shadow_status"] = "SHADOWED"
-                obstacle["shadowed_by"] = f"Obstacle ID {shadowing['feature'].id()}"
-                shadowed_obstacles.append(obstacle)
-            else:
-                obstacle["shadow_status"] = "VISIBLE"
-                obstacle["shadowed_by"] = ""
-                visible_obstacles.append(obstacle)
-
-        # Non-critical obstacles are always "not applicable"
-        for obstacle in obstacles_data:
-            if not obstacle["is_critical"]:
-                obstacle["shadow_status"] = "NOT_APPLICABLE"
-                obstacle["shadowed_by"] = ""
-                visible_obstacles.append(obstacle)
-
-        return {
-            "shadowed_obstacles": shadowed_obstacles,
-            "visible_obstacles": visible_obstacles,
-            "takeoff_point": takeoff_point,
-        }
+        origin = (takeoff_point.x(), takeoff_point.y(),
+                  takeoff_point.z() if takeoff_point.is3D() else 0.0)
+        records.set_shadows(*shadow_sectors(records, origin, shadow_tolerance))
+        return takeoff_point
 
     def get_takeoff_reference_point(self, tofpa_surface_layer) -> Optional[QgsPoint]:
         """
@@ -307,29 +759,33 @@ class ObstacleAnalyzer:
 
     def is_obstacle_shadowed(
         self,
-        target_obstacle: dict,
-        all_obstacles: list[dict],
+        records: ObstacleRecords,
+        target: int,
         takeoff_point: QgsPoint,
         shadow_tolerance: float = 5.0,
-    ) -> tuple[bool, Optional[dict]]:
+    ) -> tuple[bool, Optional[int]]:
         """
-        Return ``(True, shadowing_obstacle)`` if *target_obstacle* is hidden
-        behind another obstacle as seen from *takeoff_point*.
+        Return ``(True, index)`` if obstacle *target* of *records* is hidden
+        behind the obstacle at *index* as seen from *takeoff_point*.
+
+        Single-target reference check against every critical obstacle;
+        whole surveys go through ``perform_shadow_analysis``, which gives
+        identical answers in O(n log² n).
         """
-        target_point = target_obstacle["point"]
-        target_height = target_obstacle["height"]
+        target_point = QgsPoint(records.x[target], records.y[target], records.z[target])
+        target_height = float(records.z[target])
         target_distance = takeoff_point.distance(target_point)
         target_angle = self.calculate_bearing(takeoff_point, target_point)
 
-        for other in all_obstacles:
-            if other["feature"].id() == target_obstacle["feature"].id():
+        for other in np.flatnonzero(records.critical):
+            if records.ids[other] == records.ids[target]:
                 continue
 
-            other_point = other["point"]
+            other_point = QgsPoint(records.x[other], records.y[other], records.z[other])
             other_distance = takeoff_point.distance(other_point)
             if other_distance >= target_distance:
                 continue
-            if other["height"] <= target_height:
+            if records.z[other] <= target_height:
                 continue
 
             other_angle = self.calculate_bearing(takeoff_point, other_point)
@@ -339,9 +795,9 @@ class ObstacleAnalyzer:
             if diff <= shadow_tolerance:
                 if self.check_elevation_shadow(
                     takeoff_point, target_point, target_height,
-                    other_point, other["height"]
+                    other_point, float(records.z[other])
                 ):
-                    return True, other
+                    return True, int(other)
 
         return False, None
 
@@ -384,92 +840,109 @@ class ObstacleAnalyzer:
     def apply_shadow_results(
         self,
         layers_info: dict,
-        shadow_results: dict,
+        records: ObstacleRecords,
         buffer_distance: float,
+        accumulator: Optional[FeatureAccumulator] = None,
+        indices=None,
+        extra_attributes=(),
     ) -> None:
         """
-        Populate the shadowed / visible layers from *shadow_results*.
+        Populate the shadowed / visible layers from the shadow analysis in *records*.
 
         BUG-02 fix: ``buffer_distance`` is the user-supplied value, NOT hardcoded 10.0.
+
+        Only the critical obstacles among *indices* (default: all) are
+        written.  Features are committed in bulk through *accumulator*;
+        when none is given a private one is used and flushed before
+        returning.
         """
+        owns_accumulator = accumulator is None
+        if owns_accumulator:
+            accumulator = FeatureAccumulator()
         try:
-            for obstacle in shadow_results.get("shadowed_obstacles", []):
-                if obstacle["is_critical"]:
-                    feat = QgsFeature()
-                    feat.setGeometry(QgsGeometry(obstacle["point"]))
-                    feat.setAttributes([
-                        int(obstacle["feature"].id()),
-                        obstacle["height"],
-                        buffer_distance,
-                        "CRITICAL",
-                        obstacle["obstacle_info"]["intersection_type"],
-                        obstacle["obstacle_info"].get("penetration_m", 0.0),
-                        obstacle["shadow_status"],
-                        obstacle["shadowed_by"],
-                    ])
-                    layers_info["shadowed_layer"].dataProvider().addFeatures([feat])
-
-            for obstacle in shadow_results.get("visible_obstacles", []):
-                if obstacle["is_critical"]:
-                    feat = QgsFeature()
-                    feat.setGeometry(QgsGeometry(obstacle["point"]))
-                    feat.setAttributes([
-                        int(obstacle["feature"].id()),
-                        obstacle["height"],
-                        buffer_distance,
-                        "CRITICAL",
-                        obstacle["obstacle_info"]["intersection_type"],
-                        obstacle["obstacle_info"].get("penetration_m", 0.0),
-                        obstacle.get("shadow_status", "VISIBLE"),
-                        obstacle.get("shadowed_by", ""),
-                    ])
-                    layers_info["visible_layer"].dataProvider().addFeatures([feat])
+            if indices is None:
+                indices = np.arange(len(records))
+            for obstacle in (records[int(i)] for i in indices):
+                if not obstacle.is_critical:
+                    continue
+                feat = QgsFeature()
+                feat.setGeometry(QgsGeometry(QgsPoint(obstacle.x, obstacle.y, obstacle.z)))
+                feat.setAttributes([
+                    obstacle.id,
+                    obstacle.z,
+                    buffer_distance,
+                    "CRITICAL",
+                    "Buffer intersects TOFPA surface" if obstacle.in_footprint else "None",
+                    obstacle.penetration_m,
+                    obstacle.shadow_status,
+                    f"Obstacle ID {obstacle.shadowed_by}" if obstacle.is_shadowed else "",
+                    _gradient_pct(obstacle.required_gradient),
+                    *extra_attributes,
+                ])
+                target = "shadowed_layer" if obstacle.is_shadowed else "visible_layer"
+                accumulator.add(layers_info[target], feat)
+
+            if owns_accumulator:
+                accumulator.flush()
 
         except Exception as exc:
             logger.error("Error applying shadow results: %s", exc)
 
+    def remove_obstacle_features(self, layers_info: dict, ids) -> None:
+        """Delete the output features of the obstacles *ids* from every layer.
+
+        Used by incremental runs before re-writing changed obstacles.
+        """
+        wanted = {int(i) for i in ids}
+        if not wanted:
+            return
+        for name, layer in layers_info.items():
+            field = "obstacle_id" if name == "buffer_layer" else "id"
+            request = QgsFeatureRequest().setSubsetOfAttributes([field], layer.fields())
+            fids = [f.id() for f in layer.getFeatures(request) if f.attribute(field) in wanted]
+            if fids:
+                layer.dataProvider().deleteFeatures(fids)
+
     # ------------------------------------------------------------------
     # Map layer finalisation
     # ------------------------------------------------------------------
 
     def finalize_layers(self, layers_info: dict) -> None:
-        """Apply symbology to each obstacles layer and add them to the QGIS map."""
-        _sym = QgsMarkerSymbol.createSimple
-
-        layers_info["critical_layer"].renderer().setSymbol(
-            _sym({"color": "255,0,0,255", "size": "4", "outline_color": "0,0,0,255"})
-        )
-        layers_info["safe_layer"].renderer().setSymbol(
-            _sym({"color": "0,255,0,255", "size": "3", "outline_color": "0,0,0,255"})
-        )
+        """Apply symbology to each obstacles layer and add them to the QGIS map.
 
-        if layers_info.get("shadowed_layer") and layers_info["shadowed_layer"].featureCount() > 0:
-            layers_info["shadowed_layer"].renderer().setSymbol(
-                _sym({"color": "255,165,0,255", "size": "4",
-                      "outline_color": "0,0,0,255", "outline_width": "0.5"})
-            )
-        if layers_info.get("visible_layer") and layers_info["visible_layer"].featureCount() > 0:
-            layers_info["visible_layer"].renderer().setSymbol(
-                _sym({"color": "139,0,0,255", "size": "5",
-                      "outline_color": "0,0,0,255", "outline_width": "0.5"})
-            )
-
-        layers_info["buffer_layer"].renderer().setSymbol(
-            QgsFillSymbol.createSimple({
+        Layers already in the project (patched by an incremental run) are
+        only repainted; their symbology is left as the user set it.
+        """
+        _sym = QgsMarkerSymbol.createSimple
+        project = QgsProject.instance()
+        symbols = {
+            "critical_layer": _sym({"color": "255,0,0,255", "size": "4", "outline_color": "0,0,0,255"}),
+            "safe_layer": _sym({"color": "0,255,0,255", "size": "3", "outline_color": "0,0,0,255"}),
+            "buffer_layer": QgsFillSymbol.createSimple({
                 "color": "255,255,0,100",
                 "outline_color": "255,165,0,255",
                 "outline_width": "0.3",
-            })
-        )
+            }),
+            "shadowed_layer": _sym({"color": "255,165,0,255", "size": "4",
+                                    "outline_color": "0,0,0,255", "outline_width": "0.5"}),
+            "visible_layer": _sym({"color": "139,0,0,255", "size": "5",
+                                   "outline_color": "0,0,0,255", "outline_width": "0.5"}),
+        }
+
+        layers_to_add = []
+        for name, symbol in symbols.items():
+            layer = layers_info.get(name)
+            if layer is None:
+                continue
+            if project.mapLayer(layer.id()) is not None:
+                layer.updateExtents()
+                layer.triggerRepaint()
+                continue
+            # Shadow layers are only added once they have features
+            if name in ("shadowed_layer", "visible_layer") and layer.featureCount() == 0:
+                continue
+            layer.renderer().setSymbol(symbol)
+            layers_to_add.append(layer)
 
-        layers_to_add = [
-            layers_info["critical_layer"],
-            layers_info["safe_layer"],
-            layers_info["buffer_layer"],
-        ]
-        if layers_info.get("shadowed_layer") and layers_info["shadowed_layer"].featureCount() > 0:
-            layers_to_add.append(layers_info["shadowed_layer"])
-        if layers_info.get("visible_layer") and layers_info["visible_layer"].featureCount() > 0:
-            layers_to_add.append(layers_info["visible_layer"])
-
-        QgsProject.instance().addMapLayers(layers_to_add)
+        if layers_to_add:
+            project.addMapLayers(layers_to_add)
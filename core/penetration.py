@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+Penetration areas: contiguous terrain cells piercing the TOFPA surface.
+
+No QGIS dependency.
+
+Penetrating cells (``clearance < 0``) are collected tile by tile as grid
+indices, labelled into 4-connected components, and each component is
+vectorised by tracing the boundary edges of its cells — all with bulk NumPy
+operations on the (sparse) penetrating cells, never a per-feature dissolve.
+
+The traced polygons follow the cell edges exactly.  Cells touching only at a
+corner belong to different areas (4-connectivity), so every polygon is valid.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+
+
+@dataclass
+class PenetrationArea:
+    """One contiguous penetration area.
+
+    Attributes:
+        cell_count:       Number of DTM cells in the area.
+        max_penetration:  Largest penetration (``-clearance``) in metres.
+        mean_penetration: Mean penetration over the area's cells.
+        worst_x, worst_y: Centre of the cell holding *max_penetration*.
+        rings:            ``(n, 2)`` coordinate arrays, closed; the exterior
+                          ring first, then any holes.
+    """
+    cell_count: int
+    max_penetration: float
+    mean_penetration: float
+    worst_x: float
+    worst_y: float
+    rings: List[np.ndarray] = field(default_factory=list)
+
+
+class PenetrationCollector:
+    """Gather penetrating cells from ``TerrainResult`` tiles on one raster grid.
+
+    Only penetrating cells are kept, so memory follows the penetrating area,
+    not the DTM window.
+    """
+
+    def __init__(self, geotransform: tuple):
+        self.geotransform = geotransform
+        self._rows: List[np.ndarray] = []
+        self._cols: List[np.ndarray] = []
+        self._penetration: List[np.ndarray] = []
+
+    def add(self, result) -> None:
+        """Keep the penetrating cells of one tile's *result*."""
+        mask = result.penetrates
+        if not mask.any():
+            return
+        x0, dx, _rx, y0, _ry, dy = self.geotransform
+        self._cols.append(np.floor((result.x[mask] - x0) / dx).astype(np.int64))
+        self._rows.append(np.floor((result.y[mask] - y0) / dy).astype(np.int64))
+        self._penetration.append(-result.clearance[mask])
+
+    def areas(self) -> List[PenetrationArea]:
+        """Label and vectorise everything collected so far."""
+        if not self._rows:
+            return []
+        return penetration_areas(
+            np.concatenate(self._rows),
+            np.concatenate(self._cols),
+            np.concatenate(self._penetration),
+            self.geotransform,
+        )
+
+
+def label_cells(rows, cols) -> np.ndarray:
+    """Label the 4-connected components of a sparse set of grid cells.
+
+    Returns one label per cell, ``0 .. n_components - 1``, numbered in
+    row-major order of each component's first cell.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    n = len(rows)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    width = int(cols.max()) + 2
+    keys = rows * width + cols
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+
+    # Neighbour pairs (right and down), as positions in the sorted order
+    pairs_a, pairs_b = [], []
+    for step in (1, width):
+        target = sorted_keys + step
+        pos = np.minimum(np.searchsorted(sorted_keys, target), n - 1)
+        hit = sorted_keys[pos] == target
+        pairs_a.append(np.nonzero(hit)[0])
+        pairs_b.append(pos[hit])
+    a = np.concatenate(pairs_a)
+    b = np.concatenate(pairs_b)
+
+    # Min-label propagation with pointer jumping (union-find in bulk)
+    parent = np.arange(n)
+    while True:
+        low = np.minimum(parent[a], parent[b])
+        updated = parent.copy()
+        np.minimum.at(updated, parent[a], low)
+        np.minimum.at(updated, parent[b], low)
+        while True:
+            jumped = updated[updated]
+            if np.array_equal(jumped, updated):
+                break
+            updated = jumped
+        if np.array_equal(updated, parent):
+            break
+        parent = updated
+
+    _, dense = np.unique(parent, return_inverse=True)
+    labels = np.empty(n, dtype=np.int64)
+    labels[order] = dense
+    return labels
+
+
+def penetration_areas(rows, cols, penetration, geotransform: tuple) -> List[PenetrationArea]:
+    """Group penetrating cells into areas with statistics and outlines.
+
+    Args:
+        rows, cols:   Grid indices of the penetrating cells (unique).
+        penetration:  Penetration of each cell in metres (``-clearance``).
+        geotransform: GDAL geotransform of the grid the indices refer to.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    penetration = np.asarray(penetration, dtype=np.float64)
+    labels = label_cells(rows, cols)
+    if not len(labels):
+        return []
+    n_areas = int(labels.max()) + 1
+    x0, dx, _rx, y0, _ry, dy = geotransform
+
+    counts = np.bincount(labels, minlength=n_areas)
+    means = np.bincount(labels, weights=penetration, minlength=n_areas) / counts
+    # Worst cell per area: last entry of each label after sorting by penetration
+    by_label = np.lexsort((penetration, labels))
+    worst = by_label[np.cumsum(counts) - 1]
+
+    rings_by_area = _trace_rings(rows, cols, labels, n_areas)
+
+    areas = []
+    for k in range(n_areas):
+        w = worst[k]
+        areas.append(PenetrationArea(
+            cell_count=int(counts[k]),
+            max_penetration=float(penetration[w]),
+            mean_penetration=float(means[k]),
+            worst_x=float(x0 + (cols[w] + 0.5) * dx),
+            worst_y=float(y0 + (rows[w] + 0.5) * dy),
+            rings=[
+                np.column_stack((x0 + ring[:, 0] * dx, y0 + ring[:, 1] * dy))
+                for ring in rings_by_area[k]
+            ],
+        ))
+    return areas
+
+
+# ---------------------------------------------------------------------------
+# Boundary tracing
+# ---------------------------------------------------------------------------
+
+# Cell edges in traversal order, as (corner offsets, neighbour across the
+# edge).  Corners are (col, row) offsets; traversal is clockwise on screen.
+_EDGES = (
+    ((0, 0), (1, 0), (-1, 0)),   # top:    neighbour above
+    ((1, 0), (1, 1), (0, 1)),    # right:  neighbour to the right
+    ((1, 1), (0, 1), (1, 0)),    # bottom: neighbour below
+    ((0, 1), (0, 0), (0, -1)),   # left:   neighbour to the left
+)
+
+
+def _trace_rings(rows, cols, labels, n_areas) -> List[List[np.ndarray]]:
+    """Return, per area, its closed rings in grid-corner coordinates.
+
+    The exterior ring (largest enclosed area) comes first.
+    """
+    n = len(rows)
+    width = int(cols.max()) + 3
+    keys = (rows + 1) * width + (cols + 1)
+    sorted_keys = np.sort(keys)
+
+    def _present(r, c):
+        target = (r + 1) * width + (c + 1)
+        pos = np.minimum(np.searchsorted(sorted_keys, target), n - 1)
+        return sorted_keys[pos] == target
+
+    # Boundary edges: cell edges whose neighbour across is not penetrating
+    sx, sy, ex, ey, owner = [], [], [], [], []
+    for (a_c, a_r), (b_c, b_r), (n_r, n_c) in _EDGES:
+        boundary = ~_present(rows + n_r, cols + n_c)
+        sx.append(cols[boundary] + a_c)
+        sy.append(rows[boundary] + a_r)
+        ex.append(cols[boundary] + b_c)
+        ey.append(rows[boundary] + b_r)
+        owner.append(labels[boundary])
+    sx, sy, ex, ey, owner = (np.concatenate(v) for v in (sx, sy, ex, ey, owner))
+    n_edges = len(sx)
+
+    # Successor of each edge: the edge starting where it ends.  At a pinch
+    # vertex (two cells touching at a corner) two edges start there.  Cells
+    # of different areas: stay on the owning cell's edges.  Cells of the
+    # same area: turn away from the cell, so a hole touching the exterior
+    # becomes its own ring instead of a self-touching exterior.
+    vwidth = width + 1
+    start_key = sy * vwidth + sx
+    end_key = ey * vwidth + ex
+    order = np.argsort(start_key, kind="stable")
+    sorted_start = start_key[order]
+    first = np.searchsorted(sorted_start, end_key, side="left")
+    last = np.searchsorted(sorted_start, end_key, side="right")
+    successor = order[first]
+    pinch = np.nonzero(last - first > 1)[0]
+    if len(pinch):
+        alt = order[first[pinch] + 1]
+        din_x, din_y = ex[pinch] - sx[pinch], ey[pinch] - sy[pinch]
+        cand = successor[pinch]
+        turn = din_x * (ey[cand] - sy[cand]) - din_y * (ex[cand] - sx[cand])
+        same_area = owner[cand] == owner[alt]
+        keep = np.where(same_area, turn < 0, owner[cand] == owner[pinch])
+        successor[pinch] = np.where(keep, cand, alt)
+
+    # Split the successor permutation into cycles (rings) in bulk: pointer
+    # jumping gives each edge its ring id (smallest edge index of the
+    # cycle) and its distance from the ring's last edge (list ranking).
+    ring_id = np.arange(n_edges)
+    jump = successor.copy()
+    while True:
+        merged = np.minimum(ring_id, ring_id[jump])
+        if np.array_equal(merged, ring_id):
+            break
+        ring_id = merged
+        jump = jump[jump]
+    ring_id = np.minimum(ring_id, ring_id[jump])
+
+    tail = successor == ring_id[successor]
+    link = np.where(tail, -1, successor)
+    dist = (~tail).astype(np.int64)
+    while True:
+        live = link >= 0
+        if not live.any():
+            break
+        dist[live] += dist[link[live]]
+        link[live] = link[link[live]]
+
+    order = np.lexsort((-dist, ring_id))
+    ring_of = ring_id[order]
+    starts = np.flatnonzero(np.r_[True, ring_of[1:] != ring_of[:-1]])
+    ends = np.r_[starts[1:], n_edges]
+    lengths = ends - starts
+
+    # Keep only vertices where the direction changes
+    dir_x = (ex - sx)[order]
+    dir_y = (ey - sy)[order]
+    prev = np.arange(n_edges) - 1
+    prev[starts] = ends - 1
+    turns = (dir_x != dir_x[prev]) | (dir_y != dir_y[prev])
+    kept = order[turns]
+    kept_ring = np.repeat(np.arange(len(starts)), lengths)[turns]
+    ring_counts = np.bincount(kept_ring, minlength=len(starts))
+    ring_first = np.r_[0, np.cumsum(ring_counts)[:-1]]
+
+    vx = sx[kept].astype(np.float64)
+    vy = sy[kept].astype(np.float64)
+    # Signed ring areas (shoelace), to pick each area's exterior ring
+    nxt = np.arange(len(kept)) + 1
+    nxt[ring_first + ring_counts - 1] = ring_first
+    ring_area = np.abs(np.bincount(kept_ring, weights=vx * vy[nxt] - vx[nxt] * vy,
+                                   minlength=len(starts))) / 2
+
+    # Close every ring by repeating its first vertex, then split
+    insert_at = ring_first + ring_counts
+    coords = np.column_stack((np.insert(vx, insert_at, vx[ring_first]),
+                              np.insert(vy, insert_at, vy[ring_first])))
+    rings = np.split(coords, np.cumsum(ring_counts + 1)[:-1])
+
+    rings_by_area: List[List[np.ndarray]] = [[] for _ in range(n_areas)]
+    ring_owner = owner[order[starts]]
+    for k in np.lexsort((-ring_area, ring_owner)):
+        rings_by_area[ring_owner[k]].append(rings[k])
+    return rings_by_area
+
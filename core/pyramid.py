@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Hierarchical max-elevation pyramid for pruning terrain analysis.
+
+No QGIS dependency.
+
+Most terrain under a climbing 1.2 % surface is far below it.  The pyramid
+stores the maximum DTM elevation of square cell blocks (``base`` × ``base``
+cells at level 0, doubling per level).  Walking it from the coarsest level
+down, a block is only descended into when its maximum — plus the vertical
+tolerance — could reach the *lowest* surface elevation over the block, and
+when it lies within the clip buffer of the footprint.  Cells of the other
+blocks cannot penetrate and are never evaluated, so the penetrating cells
+found are exactly those of a full scan.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from math import ceil
+from typing import List
+
+import numpy as np
+
+from .surface import TOFPA_CLIMB_GRADIENT, RunwayFrame, SurfaceFootprint
+
+# Safety margin (metres) absorbing the model's 3-decimal rounding of
+# ``elev``, ``x_dist`` and ``clearance`` in the pruning bound.
+_ROUNDING_MARGIN = 0.01
+
+
+@dataclass
+class MaxPyramid:
+    """Block-max pyramid over a raster window.
+
+    Attributes:
+        base:         Level-0 block size in cells.
+        col0, row0:   Raster offset of the level-0 grid origin (multiples of *base*).
+        geotransform: GDAL geotransform of the full raster.
+        levels:       ``levels[k]`` holds the max elevation of blocks of
+                      ``base * 2**k`` cells; ``-inf`` for all-NODATA blocks.
+    """
+    base: int
+    col0: int
+    row0: int
+    geotransform: tuple
+    levels: List[np.ndarray] = field(default_factory=list)
+
+    @classmethod
+    def empty(cls, base: int, col_off: int, row_off: int, cols: int, rows: int,
+              geotransform: tuple) -> "MaxPyramid":
+        """Allocate a pyramid covering the raster window (*col_off*, *row_off*, *cols*, *rows*)."""
+        col0 = col_off - col_off % base
+        row0 = row_off - row_off % base
+        shape = (ceil((row_off + rows - row0) / base), ceil((col_off + cols - col0) / base))
+        return cls(base, col0, row0, geotransform, [np.full(shape, -np.inf, dtype=np.float32)])
+
+    def add_cells(self, col_off: int, row_off: int, values: np.ndarray, nodata=None) -> None:
+        """Fold a block of raster *values* starting at (*col_off*, *row_off*) into level 0."""
+        self.merge(*self.block_maxima(col_off, row_off, values, nodata))
+
+    def block_maxima(self, col_off: int, row_off: int, values: np.ndarray, nodata=None):
+        """Reduce raster *values* to per-block maxima without touching the pyramid.
+
+        Returns ``(block_row, block_col, maxima)`` for :meth:`merge`; safe to
+        call concurrently from worker threads.
+        """
+        values = np.asarray(values, dtype=np.float32)
+        invalid = ~np.isfinite(values)
+        if nodata is not None:
+            invalid |= values == nodata
+        values = np.where(invalid, -np.inf, values)
+
+        rows, cols = values.shape
+        # Cut the block at level-0 block boundaries and reduce each piece
+        row_cuts = _block_starts(row_off - self.row0, rows, self.base)
+        col_cuts = _block_starts(col_off - self.col0, cols, self.base)
+        maxima = np.maximum.reduceat(np.maximum.reduceat(values, row_cuts, axis=0), col_cuts, axis=1)
+        return (row_off - self.row0) // self.base, (col_off - self.col0) // self.base, maxima
+
+    def merge(self, block_row: int, block_col: int, maxima: np.ndarray) -> None:
+        """Fold per-block *maxima* from :meth:`block_maxima` into level 0."""
+        target = self.levels[0][block_row:block_row + maxima.shape[0],
+                                block_col:block_col + maxima.shape[1]]
+        np.maximum(target, maxima, out=target)
+
+    def build_levels(self) -> None:
+        """Derive the coarser levels from level 0 by 2 × 2 max pooling."""
+        del self.levels[1:]
+        level = self.levels[0]
+        while level.shape[0] > 1 or level.shape[1] > 1:
+            rows, cols = level.shape
+            padded = np.full((rows + rows % 2, cols + cols % 2), -np.inf, dtype=np.float32)
+            padded[:rows, :cols] = level
+            level = padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2).max(axis=(1, 3))
+            self.levels.append(level)
+
+    def block_size(self, level: int) -> int:
+        """Block edge length in cells at *level*."""
+        return self.base << level
+
+    def candidates(
+        self,
+        frame: RunwayFrame,
+        footprint: SurfaceFootprint,
+        der_elevation: float,
+        vertical_tolerance: float = 0.0,
+        clip_buffer: float = 0.0,
+        climb_gradient: float = TOFPA_CLIMB_GRADIENT,
+    ) -> np.ndarray:
+        """Return the level-0 mask of blocks whose cells could penetrate.
+
+        Descends from the coarsest level; a block's children are only tested
+        when the block itself passed.
+        """
+        passed = None
+        for level in range(len(self.levels) - 1, -1, -1):
+            block_max = self.levels[level]
+            if passed is None:
+                test = np.ones(block_max.shape, dtype=bool)
+            else:
+                test = np.repeat(np.repeat(passed, 2, axis=0), 2, axis=1)
+                test = test[:block_max.shape[0], :block_max.shape[1]]
+            rows, cols = np.nonzero(test)
+            ok = self._could_penetrate(
+                level, rows, cols, block_max[rows, cols], frame, footprint,
+                der_elevation, vertical_tolerance, clip_buffer, climb_gradient,
+            )
+            passed = np.zeros(block_max.shape, dtype=bool)
+            passed[rows[ok], cols[ok]] = True
+        return passed
+
+    def cell_mask(self, candidates: np.ndarray, col_off: int, row_off: int,
+                  cols: int, rows: int) -> np.ndarray:
+        """Expand level-0 *candidates* to a cell mask for a raster block."""
+        bi = (np.arange(row_off, row_off + rows) - self.row0) // self.base
+        bj = (np.arange(col_off, col_off + cols) - self.col0) // self.base
+        return candidates[np.ix_(bi, bj)]
+
+    def skipped_cells(self, candidates: np.ndarray, col_off: int, row_off: int,
+                      cols: int, rows: int) -> int:
+        """Cells of the raster window that fall in non-candidate blocks."""
+        row_counts = np.bincount((np.arange(row_off, row_off + rows) - self.row0) // self.base,
+                                 minlength=candidates.shape[0])
+        col_counts = np.bincount((np.arange(col_off, col_off + cols) - self.col0) // self.base,
+                                 minlength=candidates.shape[1])
+        kept = int(row_counts @ candidates.astype(np.int64) @ col_counts)
+        return rows * cols - kept
+
+    # ------------------------------------------------------------------
+
+    def _could_penetrate(self, level, rows, cols, block_max, frame, footprint,
+                         der_elevation, vertical_tolerance, clip_buffer, climb_gradient):
+        """Conservative per-block test (never rejects a penetrating cell)."""
+        x0, dx, _rx, y0, _ry, dy = self.geotransform
+        size = self.block_size(level)
+        # Extent of the cell centres inside each block
+        c_first = self.col0 + cols * size + 0.5
+        r_first = self.row0 + rows * size + 0.5
+        xa, xb = x0 + c_first * dx, x0 + (c_first + size - 1) * dx
+        ya, yb = y0 + r_first * dy, y0 + (r_first + size - 1) * dy
+
+        # Along-track distance is linear, so its extremes sit at the corners;
+        # |along| bounds the model's reference-line distance from below.
+        corners = [frame.to_local(cx, cy)[0] for cx in (xa, xb) for cy in (ya, yb)]
+        lo = np.minimum.reduce(corners)
+        hi = np.maximum.reduce(corners)
+        min_abs_along = np.where((lo <= 0) & (hi >= 0), 0.0, np.minimum(np.abs(lo), np.abs(hi)))
+        surface_floor = der_elevation + min_abs_along * climb_gradient
+
+        reaches = block_max + vertical_tolerance + _ROUNDING_MARGIN >= surface_floor
+
+        # Footprint distance is 1-Lipschitz: centre distance minus the half
+        # diagonal bounds the distance of every cell centre in the block.
+        along, cross = frame.to_local((xa + xb) / 2, (ya + yb) / 2)
+        half_diagonal = 0.5 * np.hypot(xb - xa, yb - ya)
+        near = footprint.distance_to(along, cross) - half_diagonal <= clip_buffer
+
+        return reaches & near
+
+
+def _block_starts(offset: int, length: int, base: int) -> np.ndarray:
+    """Indices in ``[0, length)`` where a new level-0 block begins (always incl. 0)."""
+    first = (-offset) % base
+    starts = np.arange(first, length, base)
+    if first != 0:
+        starts = np.concatenate(([0], starts))
+    return starts
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar store of analysed survey obstacles.
+
+No QGIS dependency.
+
+One numpy column per attribute instead of a dict per obstacle holding a
+``QgsFeature``, a ``QgsPoint`` and a nested info dict: 57 bytes per
+obstacle (seven 8-byte columns and one byte of flags) against about
+650 bytes of Python objects for the dicts alone.  The store pickles as a
+handful of arrays, so it can be sent to worker processes, and
+``core.shadow.shadow_sweep`` / ``core.incremental.shadow_sectors`` read its
+columns directly.
+
+    records = ObstacleRecords.from_results(ids, xs, ys, results)
+    records.critical            # boolean mask
+    records[i].shadow_status    # ObstacleRecord row view, no copy
+"""
+from __future__ import annotations
+
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+# Bits of ObstacleRecords.flags
+IN_FOOTPRINT = 1   # obstacle buffer intersects the surface footprint
+CRITICAL = 2       # obstacle penetrates the surface
+SHADOWED = 4       # critical obstacle hidden behind another one
+
+
+class ObstacleRecord:
+    """Row view of one obstacle in an ``ObstacleRecords`` store."""
+
+    __slots__ = ("_records", "_index")
+
+    def __init__(self, records: "ObstacleRecords", index: int):
+        self._records = records
+        self._index = index
+
+    @property
+    def id(self) -> int:
+        return int(self._records.ids[self._index])
+
+    @property
+    def x(self) -> float:
+        return float(self._records.x[self._index])
+
+    @property
+    def y(self) -> float:
+        return float(self._records.y[self._index])
+
+    @property
+    def z(self) -> float:
+        """MSL elevation of the obstacle top."""
+        return float(self._records.z[self._index])
+
+    @property
+    def in_footprint(self) -> bool:
+        return bool(self._records.flags[self._index] & IN_FOOTPRINT)
+
+    @property
+    def is_critical(self) -> bool:
+        return bool(self._records.flags[self._index] & CRITICAL)
+
+    @property
+    def is_shadowed(self) -> bool:
+        return bool(self._records.flags[self._index] & SHADOWED)
+
+    @property
+    def penetration_m(self) -> float:
+        return float(self._records.penetration_m[self._index])
+
+    @property
+    def required_gradient(self) -> float:
+        return float(self._records.required_gradient[self._index])
+
+    @property
+    def shadowed_by(self) -> Optional[int]:
+        """Feature id of the obstacle shadowing this one, if any."""
+        if not self.is_shadowed:
+            return None
+        return int(self._records.shadowed_by[self._index])
+
+    @property
+    def shadow_status(self) -> str:
+        if not self.is_critical:
+            return "NOT_APPLICABLE"
+        return "SHADOWED" if self.is_shadowed else "VISIBLE"
+
+    def __repr__(self) -> str:
+        return f"ObstacleRecord(id={self.id}, z={self.z}, status={self.shadow_status})"
+
+
+class ObstacleRecords:
+    """Analysed obstacles, one entry per obstacle in each column.
+
+    Attributes:
+        ids:               Feature ids (int64).
+        x, y:              Base point in layer coordinates.
+        z:                 MSL elevation of the obstacle top.
+        flags:             ``IN_FOOTPRINT`` | ``CRITICAL`` | ``SHADOWED`` (uint8).
+        penetration_m:     Elevation above the OCS, rounded to mm (0.0
+                           outside the footprint).
+        required_gradient: Smallest clearing climb gradient (fraction; NaN
+                           outside the footprint, ``inf`` when none clears).
+        shadowed_by:       Feature id of the shadowing obstacle; only
+                           meaningful where ``SHADOWED`` is set, since
+                           uncommitted features have negative ids too.
+    """
+
+    __slots__ = ("ids", "x", "y", "z", "flags", "penetration_m", "required_gradient",
+                 "shadowed_by")
+
+    def __init__(self, ids, x, y, z, flags, penetration_m, required_gradient, shadowed_by=None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.z = np.asarray(z, dtype=np.float64)
+        self.flags = np.asarray(flags, dtype=np.uint8)
+        self.penetration_m = np.asarray(penetration_m, dtype=np.float64)
+        self.required_gradient = np.asarray(required_gradient, dtype=np.float64)
+        if shadowed_by is None:
+            shadowed_by = np.zeros(len(self.ids))
+        self.shadowed_by = np.asarray(shadowed_by, dtype=np.int64)
+
+    @classmethod
+    def empty(cls, count: int = 0) -> "ObstacleRecords":
+        return cls(np.zeros(count), np.zeros(count), np.zeros(count), np.zeros(count),
+                   np.zeros(count), np.zeros(count), np.full(count, np.nan))
+
+    @classmethod
+    def from_results(cls, ids, xs, ys, results: dict) -> "ObstacleRecords":
+        """Records of ``ObstacleAnalyzer.analyze_projection`` *results*."""
+        flags = (np.where(results["in_footprint"], IN_FOOTPRINT, 0)
+                 | np.where(results["is_critical"], CRITICAL, 0))
+        return cls(ids, xs, ys, results["height"], flags, results["penetration_m"],
+                   results["required_gradient"])
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple]) -> "ObstacleRecords":
+        """Records of ``(id, x, y, z, in_footprint, is_critical, penetration_m,
+        required_gradient)`` tuples."""
+        rows = list(rows)
+        if not rows:
+            return cls.empty()
+        ids, xs, ys, zs, in_footprint, critical, penetration, required = zip(*rows)
+        flags = (np.where(in_footprint, IN_FOOTPRINT, 0) | np.where(critical, CRITICAL, 0))
+        return cls(ids, xs, ys, zs, flags, penetration, required)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index: int) -> ObstacleRecord:
+        if not -len(self) <= index < len(self):
+            raise IndexError(index)
+        return ObstacleRecord(self, index % len(self))
+
+    def __iter__(self) -> Iterator[ObstacleRecord]:
+        return (ObstacleRecord(self, i) for i in range(len(self)))
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name in self.__slots__:
+            setattr(self, name, state[name])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.__slots__)
+
+    @property
+    def in_footprint(self) -> np.ndarray:
+        return (self.flags & IN_FOOTPRINT) != 0
+
+    @property
+    def critical(self) -> np.ndarray:
+        return (self.flags & CRITICAL) != 0
+
+    @property
+    def shadowed(self) -> np.ndarray:
+        return (self.flags & SHADOWED) != 0
+
+    def subset(self, index) -> "ObstacleRecords":
+        """Records selected by the boolean or index array *index* (copies)."""
+        return ObstacleRecords(*(getattr(self, name)[index] for name in self.__slots__))
+
+    def put(self, index, other: "ObstacleRecords") -> None:
+        """Overwrite the rows *index* with the rows of *other*, in order."""
+        for name in self.__slots__:
+            getattr(self, name)[index] = getattr(other, name)
+
+    def set_shadows(self, index, shadowing) -> None:
+        """Record the shadow analysis of rows *index*.
+
+        *shadowing* holds, per row, the row index of the obstacle shadowing
+        it or -1 when visible.
+        """
+        index = np.asarray(index, dtype=np.int64)
+        shadowing = np.asarray(shadowing, dtype=np.int64)
+        hidden = shadowing >= 0
+        self.shadowed_by[index] = np.where(hidden, self.ids[np.maximum(shadowing, 0)], 0)
+        self.flags[index] = np.where(hidden, self.flags[index] | SHADOWED,
+                                     self.flags[index] & ~np.uint8(SHADOWED))
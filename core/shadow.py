@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+Sweep-based shadow analysis for critical obstacles.
+
+No QGIS dependency: works on plain coordinate / height sequences so it can
+run in worker processes and unit tests.
+
+``ObstacleAnalyzer.is_obstacle_shadowed`` compares every critical obstacle
+with every other one (O(n²)).  ``shadow_sweep`` reproduces its decisions
+exactly with a distance sweep over a range tree:
+
+  1. Obstacles are sorted by plan distance from the takeoff reference point;
+     an obstacle can only be shadowed by one already swept (strictly closer).
+  2. Swept obstacles live in a segment tree over their bearing rank, so the
+     angular cone of a target is O(log n) tree nodes.  Each node keeps its
+     obstacles in input order under a max-tree of their heights and one of
+     their elevation angles.
+  3. In each cone node, a descent of a max-tree finds the first obstacle (in
+     input order) beating the target: taller for a target at or above the
+     reference point, at a higher elevation angle below it.  That is the
+     only condition left open — closer and taller means a higher angle
+     above the reference point, closer at a higher angle means taller
+     below it — so the first of those across the cone is the obstacle the
+     pairwise scan reports.
+
+Targets are swept in blocks of ``_BLOCK``: the tree answers for obstacles
+swept before the block, a vectorised pairwise test for those inside it.
+Every candidate goes through the exact pairwise test; one failing it (same
+feature id, rounding ties of angles or distances) sends the descent on to
+the next.  A run costs O((n + f) log² n) for n obstacles and f such
+failures, and O(n log n) memory.
+"""
+from __future__ import annotations
+
+from math import atan, atan2, inf, pi, sqrt
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# Obstacles swept together: pairs inside a block are tested directly
+# (_BLOCK² tests), the tree is searched and updated once per block.
+_BLOCK = 512
+
+
+def shadow_sweep(
+    xs: Sequence[float],
+    ys: Sequence[float],
+    heights: Sequence[float],
+    ids: Sequence[int],
+    origin_x: float,
+    origin_y: float,
+    origin_z: float,
+    shadow_tolerance: float = 5.0,
+) -> List[Optional[int]]:
+    """Return, for each obstacle, the index of the obstacle shadowing it.
+
+    Args:
+        xs, ys:           Obstacle plan coordinates (map units, metres).
+        heights:          Obstacle elevations compared along the line of sight.
+        ids:              Feature ids; obstacles sharing an id never shadow
+                          each other (mirrors the pairwise scan).
+        origin_x, origin_y, origin_z: Takeoff reference point.
+        shadow_tolerance: Angular cone half-width in degrees.
+
+    Returns:
+        A list the same length as the inputs holding ``None`` for visible
+        obstacles, or the index of the first obstacle (in input order) that
+        shadows it.
+    """
+    n = len(xs)
+    dist: List[float] = [0.0] * n
+    bearing: List[float] = [0.0] * n
+    elev: List[float] = [-inf] * n
+    for i in range(n):
+        dx = xs[i] - origin_x
+        dy = ys[i] - origin_y
+        d = sqrt(dx * dx + dy * dy)
+        dist[i] = d
+        bearing[i] = atan2(dx, dy) * 180.0 / pi  # same as QgsPoint.azimuth
+        if d > 0:
+            elev[i] = atan((heights[i] - origin_z) / d) * 180 / pi
+    if n < 2:
+        return [None] * n
+
+    test = _PairTest(ids, heights, bearing, elev, dist, shadow_tolerance)
+    # At the reference point (elev -inf) or without a height (NaN) an
+    # obstacle neither shadows nor is shadowed.
+    swept = np.isfinite(test.elev)
+    above = test.height >= origin_z
+    # A single block needs no tree
+    tree = _ConeTree(test.bearing, test.height, test.elev) if n > _BLOCK else None
+
+    first = np.full(n, n, dtype=np.int64)
+    order = np.argsort(test.dist, kind="stable")
+    for start in range(0, n, _BLOCK):
+        block = order[start:start + _BLOCK]
+        block = block[swept[block]]
+        if not len(block):
+            continue
+        # Obstacles of the block shadowing others in it, then those swept before
+        first[block] = np.where(test(block[None, :], block[:, None]), block[None, :], n).min(axis=1)
+        if start:
+            first[block] = np.minimum(first[block],
+                                      tree.first(block, above[block], shadow_tolerance, test))
+        if start + _BLOCK < n:
+            tree.insert(block)
+
+    return [None if f == n else int(f) for f in first.tolist()]
+
+
+class _PairTest:
+    """Pairwise test of ``is_obstacle_shadowed``, vectorised:
+    ``test(o, t)`` is True where obstacle *o* shadows target *t*."""
+
+    def __init__(self, ids, heights, bearing, elev, dist, shadow_tolerance):
+        self.ids = np.asarray(ids)
+        self.height = np.asarray(heights, dtype=np.float64)
+        self.bearing = np.asarray(bearing, dtype=np.float64)
+        self.elev = np.asarray(elev, dtype=np.float64)
+        self.dist = np.asarray(dist, dtype=np.float64)
+        self.tolerance = shadow_tolerance
+
+    def __call__(self, o, t) -> np.ndarray:
+        diff = np.abs(self.bearing[t] - self.bearing[o])
+        diff = np.where(diff > 180, 360 - diff, diff)
+        # elev is -inf for obstacles at the reference point itself, which the
+        # pairwise check rejects as zero-distance.
+        return ((self.dist[o] < self.dist[t]) & (self.ids[o] != self.ids[t])
+                & (self.height[o] > self.height[t]) & (diff <= self.tolerance)
+                & (self.elev[o] > self.elev[t]))
+
+
+class _ConeTree:
+    """Segment tree over bearing rank holding the swept obstacles.
+
+    The node of level ``l`` number ``k`` covers bearing ranks
+    ``[k * 2**l, (k + 1) * 2**l)``; its obstacles, in input order, are the
+    leaves of two max-trees (heights and elevation angles) laid out as
+    binary heaps at ``k * 2**(l + 1)`` of that level's arrays, root at
+    offset 1.  Leaves hold ``-inf`` until their obstacle is inserted.
+    """
+
+    def __init__(self, bearing: np.ndarray, height: np.ndarray, elev: np.ndarray):
+        n = len(bearing)
+        self.n = n
+        self.keys = (height, elev)
+        self.levels = (n - 1).bit_length() + 1
+        size = 1 << (self.levels - 1)
+
+        by_bearing = np.argsort(bearing, kind="stable")
+        self.sorted_bearing = bearing[by_bearing]
+        self.rank = np.empty(n, dtype=np.int64)
+        self.rank[by_bearing] = np.arange(n)
+
+        index = np.arange(n)
+        self.leaf = []      # per level: leaf number of each obstacle in its node
+        self.obstacle = []  # per level: obstacle of each leaf, node after node
+        for level in range(self.levels):
+            node = self.rank >> level
+            in_node = np.lexsort((index, node))
+            leaf = np.empty(n, dtype=np.int64)
+            leaf[in_node] = index - np.searchsorted(node[in_node], node[in_node])
+            obstacle = np.full(size, n, dtype=np.int64)
+            obstacle[(node << level) + leaf] = index
+            self.leaf.append(leaf)
+            self.obstacle.append(obstacle)
+        # Per key, per level
+        self.trees = tuple([np.full(2 * size, -inf) for _level in range(self.levels)]
+                           for _key in self.keys)
+
+    def insert(self, obstacles: np.ndarray) -> None:
+        """Sweep *obstacles* in."""
+        for level in range(self.levels):
+            base = (self.rank[obstacles] >> level) << (level + 1)
+            leaf = (1 << level) + self.leaf[level][obstacles]
+            for trees, key in zip(self.trees, self.keys):
+                tree, values, j = trees[level], key[obstacles], leaf
+                tree[base + j] = values
+                for _step in range(level):
+                    j = j >> 1
+                    np.maximum.at(tree, base + j, values)
+
+    def first(self, targets: np.ndarray, above: np.ndarray, tolerance: float,
+              test: _PairTest) -> np.ndarray:
+        """First swept obstacle shadowing each of *targets* (``n``: none).
+
+        *above* selects, per target, the height max-trees (target at or
+        above the reference point) or the elevation-angle ones.
+        """
+        best = np.full(len(targets), self.n, dtype=np.int64)
+        for level, owner, node in self._cone_nodes(test.bearing[targets], tolerance):
+            for trees, key, use in zip(self.trees, self.keys, (above, ~above)):
+                pick = use[owner]
+                if pick.any():
+                    self._first_in_nodes(level, trees[level], owner[pick], node[pick],
+                                         key[targets[owner[pick]]], targets, best, test)
+        return best
+
+    def _first_in_nodes(self, level, tree, owner, node, threshold, targets, best, test):
+        """Lower ``best[owner]`` to the first obstacle of each *node* (at
+        *level*) whose key exceeds *threshold* and that shadows the target."""
+        span = 1 << level
+        base = node << (level + 1)
+        live = tree[base + 1] > threshold
+        owner, node, base, threshold = owner[live], node[live], base[live], threshold[live]
+        at = _descend(tree, base, np.ones(len(owner), dtype=np.int64), threshold, span)
+        while len(owner):
+            o = self.obstacle[level][(node << level) + at - span]
+            # Later leaves hold later obstacles: stop once past the best so far
+            sooner = o < best[owner]
+            shadows = sooner & test(o, targets[owner])
+            np.minimum.at(best, owner[shadows], o[shadows])
+            retry = sooner & ~shadows
+            owner, node, base, threshold = owner[retry], node[retry], base[retry], threshold[retry]
+            at = _climb(tree, base, at[retry], threshold)
+            found = at > 0
+            owner, node, base, threshold = owner[found], node[found], base[found], threshold[found]
+            at = _descend(tree, base, at[found], threshold, span)
+
+    def _cone_nodes(self, bearing: np.ndarray, tolerance: float):
+        """``(level, owner, node)``: tree nodes covering the cone of each
+        bearing, *owner* indexing *bearing*."""
+        intervals = self._cone(bearing, tolerance)
+        lo = np.concatenate([a for a, _b in intervals])
+        hi = np.concatenate([b for _a, b in intervals])
+        owner = np.tile(np.arange(len(bearing)), len(intervals))
+        for level in range(self.levels):
+            keep = lo < hi
+            lo, hi, owner = lo[keep], hi[keep], owner[keep]
+            if not len(lo):
+                return
+            left = (lo & 1) == 1
+            right = (hi & 1) == 1
+            yield (level, np.concatenate([owner[left], owner[right]]),
+                   np.concatenate([lo[left], hi[right] - 1]))
+            lo = (lo + left) >> 1
+            hi = (hi - right) >> 1
+
+    def _cone(self, bearing: np.ndarray, tolerance: float) -> list:
+        """Bearing-rank ranges ``[lo, hi)`` of the obstacles within the cone
+        of each bearing (the cone proper and, across ±180°, two tails).
+
+        Bounds are settled on the exact test of ``_PairTest`` (monotone on
+        each side of *bearing*), not on ``bearing ± tolerance``, so rounding
+        cannot move an obstacle in or out of the cone.
+        """
+        values, n = self.sorted_bearing, self.n
+        zero = np.zeros(len(bearing), dtype=np.int64)
+        if tolerance >= 180:
+            return [(zero, zero + n)]
+
+        def near(b, which):
+            return np.abs(bearing[which] - b) <= tolerance
+
+        def far(b, which):
+            diff = np.abs(bearing[which] - b)
+            return (diff > 180) & (360 - diff <= tolerance)
+
+        middle = np.searchsorted(values, bearing, "left")
+        end = zero + n
+        return [
+            (zero, _settle(values, np.searchsorted(values, bearing + tolerance - 360, "right"),
+                           zero, middle, lambda b, w: ~far(b, w))),
+            (_settle(values, np.searchsorted(values, bearing - tolerance, "left"),
+                     zero, middle, near),
+             _settle(values, np.searchsorted(values, bearing + tolerance, "right"),
+                     middle, end, lambda b, w: ~near(b, w))),
+            (_settle(values, np.searchsorted(values, bearing + 360 - tolerance, "left"),
+                     middle, end, far), end),
+        ]
+
+
+def _settle(values, guess, lo, hi, predicate) -> np.ndarray:
+    """First index in ``[lo, hi)`` where *predicate* (false, then true on
+    sorted *values*) holds, searched from *guess*.
+
+    ``predicate(v, which)`` tests values *v* for the entries *which*.  Equal
+    values share the outcome, so each step jumps a run of them.
+    """
+    r = np.clip(guess, lo, hi)
+    while True:
+        move = np.flatnonzero(r > lo)
+        move = move[predicate(values[r[move] - 1], move)]
+        if not len(move):
+            break
+        r[move] = np.searchsorted(values, values[r[move] - 1], "left")
+    while True:
+        move = np.flatnonzero(r < hi)
+        move = move[~predicate(values[r[move]], move)]
+        if not len(move):
+            return r
+        r[move] = np.searchsorted(values, values[r[move]], "right")
+
+
+def _descend(tree, base, at, threshold, span) -> np.ndarray:
+    """Leftmost leaf above *threshold* under heap nodes *at* (each above it)."""
+    for _step in range(span.bit_length() - 1):
+        inner = at < span
+        if not inner.any():
+            break
+        at = np.where(inner, 2 * at, at)
+        at += inner & ~(tree[base + at] > threshold)
+    return at
+
+
+def _climb(tree, base, at, threshold) -> np.ndarray:
+    """Heap node whose subtree holds the next leaf right of leaves *at*
+    above *threshold*; 0 when there is none."""
+    at = at.copy()
+    pending = np.ones(len(at), dtype=bool)
+    while pending.any():
+        left = pending & ((at & 1) == 0)
+        sibling = np.where(left, at + 1, 1)
+        step = left & (tree[base + sibling] > threshold)
+        at[step] += 1
+        pending &= ~step
+        root = pending & (at == 1)
+        at[root] = 0
+        pending &= ~root
+        at[pending] >>= 1
+    return at
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+TOFPA surface geometry in the runway-local frame.
+
+No QGIS dependency: safe to import in worker processes and unit tests.
+
+Every TOFPA question is a question about along-track and cross-track
+distance from the DER (pt_01D).  In that frame the AOC Type A footprint is a
+closed-form shape — a trapezoid that diverges at ``TOFPA_DIVERGENCE_RATIO``
+until it reaches the maximum half-width, followed by a rectangle up to
+``TOFPA_SURFACE_LENGTH`` — so footprint and OCS tests reduce to array
+arithmetic.
+
+Frame convention:
+  * ``along`` — signed distance along the takeoff azimuth (> 0 ahead of DER).
+  * ``cross`` — signed distance perpendicular to it (> 0 to the right,
+    i.e. towards ``azimuth + 90``).
+
+``surface_geometry`` turns a ``TofpaParams``, the threshold point and the
+takeoff azimuth into the map vertices of the surface polygon, the reference
+line and the contour lines; the plugin only wraps them in ``QgsPoint``.
+``surface_elevation_at`` answers the point query every analysis needs —
+surface elevation, footprint membership and local coordinates of an array
+of map points.
+
+All distances and elevations in metres, azimuths in degrees from North.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from math import cos, radians, sin
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from ._contour_utils import contour_elevations
+
+if TYPE_CHECKING:
+    from .models import TofpaParams
+
+# ---------------------------------------------------------------------------
+# ICAO Doc 8168 — TOFPA AOC Type A surface constants
+# ---------------------------------------------------------------------------
+TOFPA_DIVERGENCE_RATIO: float = 0.125    # 12.5% semi-width divergence per metre forward
+TOFPA_CLIMB_GRADIENT: float = 0.012     # 1.2% climb gradient
+TOFPA_SURFACE_LENGTH: float = 10_000.0  # Standard surface length in metres
+TOFPA_REF_LINE_HALF_WIDTH: float = 3_000.0  # Reference line half-width in metres
+
+
+# ---------------------------------------------------------------------------
+# Runway-local frame
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class RunwayFrame:
+    """Origin (DER, pt_01D) and takeoff azimuth of the runway-local frame."""
+
+    origin_x: float
+    origin_y: float
+    azimuth: float  # degrees, 0 = North, clockwise
+
+    def to_local(self, xs, ys) -> tuple[np.ndarray, np.ndarray]:
+        """Project map coordinates *xs*, *ys* to ``(along, cross)`` arrays.
+
+        ``along`` matches ``obstacles._distance_along_axis`` element-wise.
+        """
+        az = radians(self.azimuth)
+        sin_az, cos_az = sin(az), cos(az)
+        dx = np.asarray(xs, dtype=np.float64) - self.origin_x
+        dy = np.asarray(ys, dtype=np.float64) - self.origin_y
+        along = dx * sin_az + dy * cos_az
+        cross = dx * cos_az - dy * sin_az
+        return along, cross
+
+    def to_map(self, along, cross):
+        """Map coordinates of local ``(along, cross)``; inverse of ``to_local``.
+
+        Scalars give a pair of floats, arrays a pair of arrays.  Matches
+        ``QgsPoint.project`` along the azimuth then across it.
+        """
+        az = radians(self.azimuth)
+        sin_az, cos_az = sin(az), cos(az)
+        return (self.origin_x + along * sin_az + cross * cos_az,
+                self.origin_y + along * cos_az - cross * sin_az)
+
+
+# ---------------------------------------------------------------------------
+# Footprint
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class SurfaceFootprint:
+    """Plan-view outline of the AOC Type A surface in the runway-local frame.
+
+    Attributes:
+        near_half_width:  Half-width at the DER (metres).
+        max_half_width:   Half-width once divergence stops (metres).
+        length:           Surface length from the DER (metres).
+        divergence_ratio: Lateral growth of the half-width per metre forward.
+    """
+
+    near_half_width: float
+    max_half_width: float
+    length: float = TOFPA_SURFACE_LENGTH
+    divergence_ratio: float = TOFPA_DIVERGENCE_RATIO
+
+    @classmethod
+    def from_widths(cls, width_tofpa: float, max_width_tofpa: float) -> "SurfaceFootprint":
+        """Build from the full widths used by ``TofpaParams``."""
+        return cls(near_half_width=width_tofpa / 2, max_half_width=max_width_tofpa / 2)
+
+    @property
+    def distance_to_max_width(self) -> float:
+        """Distance from the DER at which the surface reaches its max width."""
+        return (self.max_half_width - self.near_half_width) / self.divergence_ratio
+
+    def half_width_at(self, along) -> np.ndarray:
+        """Half-width of the surface at *along* (not clipped to the length)."""
+        along = np.asarray(along, dtype=np.float64)
+        return np.minimum(self.near_half_width + along * self.divergence_ratio,
+                          self.max_half_width)
+
+    def distance_to(self, along, cross) -> np.ndarray:
+        """Plan distance from each point to the footprint polygon (0 inside)."""
+        a = np.asarray(along, dtype=np.float64)
+        c = np.abs(np.asarray(cross, dtype=np.float64))
+
+        # Half outline (cross >= 0) — the polygon is convex and symmetric
+        # about the axis, so folding the point onto this side is exact.
+        d_max = self.distance_to_max_width
+        vertices = [
+            (0.0, 0.0),
+            (0.0, self.near_half_width),
+            (d_max, self.max_half_width),
+            (self.length, self.max_half_width),
+            (self.length, 0.0),
+        ]
+        dist = np.full(a.shape, np.inf)
+        for (a0, c0), (a1, c1) in zip(vertices[:-1], vertices[1:]):
+            dist = np.minimum(dist, _segment_distance(a, c, a0, c0, a1, c1))
+
+        inside = (a >= 0.0) & (a <= self.length) & (c <= self.half_width_at(a))
+        return np.where(inside, 0.0, dist)
+
+    def contains(self, along, cross, buffer: float = 0.0) -> np.ndarray:
+        """Mask of points whose *buffer*-radius disc touches the footprint."""
+        if buffer == 0.0:
+            a = np.asarray(along, dtype=np.float64)
+            return ((a >= 0.0) & (a <= self.length)
+                    & (np.abs(cross) <= self.half_width_at(a)))
+        return self.distance_to(along, cross) <= buffer
+
+
+def ocs_elevation(along, z_der: float, climb_gradient: float = TOFPA_CLIMB_GRADIENT) -> np.ndarray:
+    """Vectorised ``obstacles._ocs_elevation_at_distance``.
+
+    Points behind the DER (along < 0) are evaluated at *z_der*.
+    """
+    along = np.asarray(along, dtype=np.float64)
+    return np.where(along < 0, z_der, z_der + along * climb_gradient)
+
+
+# ---------------------------------------------------------------------------
+# Point queries
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class SurfaceSample:
+    """Surface at an array of points; one entry per point in each array.
+
+    Attributes:
+        elevation: OCS elevation, see ``ocs_elevation`` (defined outside the
+                   footprint too).
+        inside:    Footprint membership, see ``SurfaceFootprint.contains``.
+        along, cross: Runway-local coordinates of the points.
+    """
+
+    elevation: np.ndarray
+    inside: np.ndarray
+    along: np.ndarray
+    cross: np.ndarray
+
+
+def surface_sample(
+    along,
+    cross,
+    footprint: SurfaceFootprint,
+    der_elevation: float,
+    climb_gradient: float = TOFPA_CLIMB_GRADIENT,
+    buffer: float = 0.0,
+) -> SurfaceSample:
+    """``SurfaceSample`` of points already in the runway-local frame."""
+    along = np.asarray(along, dtype=np.float64)
+    cross = np.asarray(cross, dtype=np.float64)
+    return SurfaceSample(
+        elevation=ocs_elevation(along, der_elevation, climb_gradient),
+        inside=footprint.contains(along, cross, buffer),
+        along=along,
+        cross=cross,
+    )
+
+
+def surface_elevation_at(
+    xs,
+    ys,
+    params: "TofpaParams",
+    der_x: float,
+    der_y: float,
+    azimuth: float,
+    climb_gradient: float = TOFPA_CLIMB_GRADIENT,
+    buffer: float = 0.0,
+) -> SurfaceSample:
+    """Surface of *params* at map points (*xs*, *ys*).
+
+    *der_x*, *der_y* is the DER (pt_01D) and *azimuth* the takeoff azimuth;
+    *buffer* widens the footprint test as for buffered obstacles.
+    """
+    along, cross = RunwayFrame(der_x, der_y, azimuth).to_local(xs, ys)
+    footprint = SurfaceFootprint.from_widths(params.width_tofpa, params.max_width_tofpa)
+    return surface_sample(along, cross, footprint, params.ze, climb_gradient, buffer)
+
+
+# ---------------------------------------------------------------------------
+# Surface vertices
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class SurfaceGeometry:
+    """Map vertices ``(x, y, z)`` of one TOFPA surface.
+
+    Attributes:
+        frame:          Runway-local frame, origin at the DER (pt_01D).
+        footprint:      Plan outline in that frame.
+        der_elevation:  Surface elevation at the DER (``ze``).
+        climb_gradient: Surface slope.
+        outline:        (6, 3) polygon ring, not closed, in the plugin's
+                        vertex order: pt_03DR, pt_03DL, pt_02DL, pt_01DL,
+                        pt_01DR, pt_02DR.
+        reference_line: (2, 3) left and right end of the reference line.
+        contours:       (n, 2, 3) left and right end of each contour line,
+                        in elevation order.
+    """
+
+    frame: RunwayFrame
+    footprint: SurfaceFootprint
+    der_elevation: float
+    climb_gradient: float
+    outline: np.ndarray
+    reference_line: np.ndarray
+    contours: np.ndarray
+
+    @property
+    def der(self) -> tuple[float, float, float]:
+        """DER point (pt_01D)."""
+        return self.frame.origin_x, self.frame.origin_y, self.der_elevation
+
+    @property
+    def contour_elevations(self) -> np.ndarray:
+        return self.contours[:, 0, 2]
+
+    def extent(self, margin: float = 0.0) -> tuple[float, float, float, float]:
+        """``(xmin, ymin, xmax, ymax)`` of the outline grown by *margin*."""
+        xmin, ymin = self.outline[:, :2].min(axis=0) - margin
+        xmax, ymax = self.outline[:, :2].max(axis=0) + margin
+        return float(xmin), float(ymin), float(xmax), float(ymax)
+
+    def elevation_at(self, xs, ys, buffer: float = 0.0) -> SurfaceSample:
+        """``surface_elevation_at`` for this surface."""
+        along, cross = self.frame.to_local(xs, ys)
+        return surface_sample(along, cross, self.footprint, self.der_elevation,
+                              self.climb_gradient, buffer)
+
+
+def surface_geometry(
+    params: "TofpaParams",
+    threshold_x: float,
+    threshold_y: float,
+    azimuth: float,
+    climb_gradient: float = TOFPA_CLIMB_GRADIENT,
+) -> SurfaceGeometry:
+    """Vertices of the surface of *params* for a threshold and takeoff azimuth.
+
+    The DER lies ``cwy_length`` ahead of the threshold.  Contours follow
+    ``params.contour_interval_m`` (none when 0).
+    """
+    footprint = SurfaceFootprint.from_widths(params.width_tofpa, params.max_width_tofpa)
+    threshold = RunwayFrame(threshold_x, threshold_y, azimuth)
+    der_x, der_y = threshold.to_map(params.cwy_length or 0.0, 0.0)
+    frame = RunwayFrame(der_x, der_y, azimuth)
+    ze = params.ze
+
+    near, far = footprint.near_half_width, footprint.max_half_width
+    d_max, length = footprint.distance_to_max_width, footprint.length
+    z_max, z_end = ze + d_max * climb_gradient, ze + length * climb_gradient
+    # (along, cross, z); cross > 0 is the plugin's "L" side (azimuth + 90)
+    local = [
+        (length, -far, z_end), (length, far, z_end), (d_max, far, z_max),
+        (0.0, near, ze), (0.0, -near, ze), (d_max, -far, z_max),
+        (0.0, TOFPA_REF_LINE_HALF_WIDTH, ze), (0.0, -TOFPA_REF_LINE_HALF_WIDTH, ze),
+    ]
+    # Contours as in contour_specs_for_takeoff, one array pass per column
+    levels = []
+    if params.contour_interval_m > 0 and climb_gradient > 0:
+        levels = contour_elevations(ze, z_end, params.contour_interval_m)
+    vertices = np.empty((8 + 2 * len(levels), 3))
+    vertices[:8] = local
+    contours = vertices[8:].reshape(-1, 2, 3)
+    if levels:
+        levels = np.array(levels)
+        distance = (levels - ze) / climb_gradient
+        keep = (levels > ze - 1e-9) & (levels <= z_end + 1e-9) & (distance <= length + 1e-6)
+        contours = contours[:np.count_nonzero(keep)]
+        vertices = vertices[:8 + 2 * len(contours)]
+        distance, levels = distance[keep], levels[keep]
+        contours[:, :, 0] = distance[:, None]
+        contours[:, 0, 1] = footprint.half_width_at(distance)
+        contours[:, 1, 1] = -contours[:, 0, 1]
+        contours[:, :, 2] = levels[:, None]
+
+    vertices[:, 0], vertices[:, 1] = frame.to_map(vertices[:, 0], vertices[:, 1])
+    return SurfaceGeometry(
+        frame=frame,
+        footprint=footprint,
+        der_elevation=ze,
+        climb_gradient=climb_gradient,
+        outline=vertices[:6],
+        reference_line=vertices[6:8],
+        contours=contours,
+    )
+
+
+def _segment_distance(px, py, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+    """Distance from points (*px*, *py*) to the segment (x0, y0)–(x1, y1)."""
+    sx, sy = x1 - x0, y1 - y0
+    seg_len2 = sx * sx + sy * sy
+    if seg_len2 == 0.0:
+        return np.hypot(px - x0, py - y0)
+    t = np.clip(((px - x0) * sx + (py - y0) * sy) / seg_len2, 0.0, 1.0)
+    return np.hypot(px - (x0 + t * sx), py - (y0 + t * sy))
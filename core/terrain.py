@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+"""
+TOFPA terrain penetration engine.
+
+No QGIS dependency: operates on NumPy elevation grids so it can run in
+worker threads/processes and unit tests.
+
+Native replacement for ``model/TOFPA_analysis.model3``.  The model clips the
+DTM to the buffered TOFPA polygon, turns every pixel into a point feature and
+runs nine field calculators on it.  Here the same per-cell quantities are
+computed analytically on the raster grid, in the runway-local frame of
+``core.surface``:
+
+  ==============  ==========================================================
+  Model field     Computation (per cell, metres)
+  ==============  ==========================================================
+  ``VALUE``       DTM elevation
+  ``tolerances``  vertical tolerance
+  ``elev``        ``round(VALUE, 3) + tolerances``
+  ``x_dist``      ``round(distance(cell, reference_line), 3)``
+  ``surface_z``   ``der_elevation + x_dist * 1.2 %``
+  ``clearance``   ``round(surface_z - elev, 3)``
+  ``penetrates``  ``clearance < 0``
+  ==============  ==========================================================
+
+Cells are kept where ``gdal:cliprasterbymasklayer`` would keep them: the cell
+centre lies within ``dtm_clip_buffer(post_spacing)`` of the surface polygon
+and the DTM value is not NODATA.  The grid is evaluated on the source raster
+alignment (the model's clip keeps the source resolution).
+"""
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from math import inf, sqrt
+from typing import Callable, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from .surface import (
+    TOFPA_CLIMB_GRADIENT,
+    TOFPA_REF_LINE_HALF_WIDTH,
+    RunwayFrame,
+    SurfaceFootprint,
+    SurfaceGeometry,
+)
+
+
+# ---------------------------------------------------------------------------
+# Data containers
+# ---------------------------------------------------------------------------
+
+@dataclass
+class RasterWindow:
+    """A north-up block of DTM cells and its georeferencing.
+
+    Attributes:
+        values:       2-D elevation array (rows × cols).
+        geotransform: GDAL geotransform of the block's top-left corner.
+        nodata:       NODATA value of the band, or ``None``.
+    """
+    values: np.ndarray
+    geotransform: tuple
+    nodata: Optional[float] = None
+
+    def cell_centres(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return 2-D arrays of cell-centre X and Y coordinates."""
+        x0, dx, _rx, y0, _ry, dy = self.geotransform
+        rows, cols = self.values.shape
+        xs = x0 + (np.arange(cols) + 0.5) * dx
+        ys = y0 + (np.arange(rows) + 0.5) * dy
+        return np.meshgrid(xs, ys)
+
+    def valid_mask(self) -> np.ndarray:
+        """Cells holding real elevations (not NODATA / NaN)."""
+        valid = np.isfinite(self.values)
+        if self.nodata is not None:
+            valid &= self.values != self.nodata
+        return valid
+
+
+@dataclass
+class TerrainResult:
+    """Per-cell model outputs for the cells kept by the clip, row-major.
+
+    Every attribute is a 1-D array of the same length, one entry per output
+    point of the processing model.
+    """
+    x: np.ndarray
+    y: np.ndarray
+    value: np.ndarray
+    tolerances: np.ndarray
+    elev: np.ndarray
+    x_dist: np.ndarray
+    surface_z: np.ndarray
+    clearance: np.ndarray
+    penetrates: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    @property
+    def penetration_count(self) -> int:
+        return int(np.count_nonzero(self.penetrates))
+
+    @property
+    def max_penetration(self) -> float:
+        """Largest penetration (``-clearance``) in metres, 0.0 when clear."""
+        if not len(self):
+            return 0.0
+        return max(0.0, float(-self.clearance.min()))
+
+    def subset(self, mask) -> "TerrainResult":
+        """Return the cells selected by the boolean *mask*."""
+        return TerrainResult(**{
+            name: getattr(self, name)[mask] for name in self.__dataclass_fields__
+        })
+
+
+@dataclass
+class TerrainSummary:
+    """Incremental reduction of terrain results over any number of tiles.
+
+    Attributes:
+        total_cells:       Cells evaluated (kept by the clip).
+        penetrating_cells: Cells with ``clearance < 0``.
+        min_clearance:     Lowest clearance seen (``inf`` before any cell).
+        worst_x, worst_y:  Centre of the cell holding *min_clearance*.
+        skipped_cells:     Window cells never evaluated because the
+                           ``core.pyramid`` bound ruled them out.
+    """
+    total_cells: int = 0
+    penetrating_cells: int = 0
+    min_clearance: float = inf
+    worst_x: Optional[float] = None
+    worst_y: Optional[float] = None
+    skipped_cells: int = 0
+
+    @property
+    def max_penetration(self) -> float:
+        """Largest penetration in metres, 0.0 when nothing penetrates."""
+        return max(0.0, -self.min_clearance)
+
+    def update(self, result: TerrainResult) -> None:
+        """Fold one tile's *result* into the summary."""
+        if not len(result):
+            return
+        self.total_cells += len(result)
+        self.penetrating_cells += result.penetration_count
+        worst = int(np.argmin(result.clearance))
+        if result.clearance[worst] < self.min_clearance:
+            self.min_clearance = float(result.clearance[worst])
+            self.worst_x = float(result.x[worst])
+            self.worst_y = float(result.y[worst])
+
+
+# ---------------------------------------------------------------------------
+# Model-compatible helpers
+# ---------------------------------------------------------------------------
+
+def dtm_clip_buffer(post_spacing: float) -> float:
+    """Buffer applied to the surface polygon before clipping the DTM.
+
+    Same as the model: the diagonal of one DTM post,
+    ``sqrt(spacing² + spacing²)``.
+    """
+    return sqrt(post_spacing ** 2 + post_spacing ** 2)
+
+
+def qgis_round(values, places: int = 3) -> np.ndarray:
+    """QGIS expression ``round()``: half away from zero (NumPy rounds half to even)."""
+    scaler = 10.0 ** places
+    values = np.asarray(values, dtype=np.float64)
+    return np.sign(values) * np.floor(np.abs(values) * scaler + 0.5) / scaler
+
+
+def reference_line_distance(along, cross,
+                            half_width: float = TOFPA_REF_LINE_HALF_WIDTH) -> np.ndarray:
+    """Plan distance to the TOFPA reference line (``x_dist`` before rounding).
+
+    The reference line is perpendicular to the axis through the DER and
+    extends *half_width* to each side, so points behind the DER get a
+    positive distance — exactly as the model's ``distance()`` expression.
+    """
+    along = np.asarray(along, dtype=np.float64)
+    overhang = np.maximum(np.abs(np.asarray(cross, dtype=np.float64)) - half_width, 0.0)
+    return np.hypot(along, overhang)
+
+
+# ---------------------------------------------------------------------------
+# Engine
+# ---------------------------------------------------------------------------
+
+def analyze_terrain(
+    window: RasterWindow,
+    frame: RunwayFrame,
+    footprint: SurfaceFootprint,
+    der_elevation: float,
+    vertical_tolerance: float = 0.0,
+    clip_buffer: float = 0.0,
+    climb_gradient: float = TOFPA_CLIMB_GRADIENT,
+) -> TerrainResult:
+    """Evaluate every clipped DTM cell of *window* against the TOFPA surface.
+
+    Args:
+        window:             DTM block to evaluate (north-up).
+        frame:              Runway-local frame anchored at the DER.
+        footprint:          Plan-view outline of the surface.
+        der_elevation:      Surface elevation at the DER (model ``der_elevation``).
+        vertical_tolerance: Added to every DTM value (model ``vertical_tolerance_m``).
+        clip_buffer:        Polygon buffer of the clip, see ``dtm_clip_buffer``.
+        climb_gradient:     OCS gradient (model: 1.2 %).
+
+    Returns:
+        A :class:`TerrainResult` holding one entry per kept cell.
+    """
+    xs, ys = window.cell_centres()
+    along, cross = frame.to_local(xs, ys)
+    keep = window.valid_mask() & (footprint.distance_to(along, cross) <= clip_buffer)
+
+    value = window.values[keep].astype(np.float64)
+    along = along[keep]
+    cross = cross[keep]
+
+    tolerances = np.full(value.shape, float(vertical_tolerance))
+    elev = qgis_round(value, 3) + tolerances
+    x_dist = qgis_round(reference_line_distance(along, cross), 3)
+    surface_z = np.where(x_dist < 0, der_elevation, der_elevation + x_dist * climb_gradient)
+    clearance = qgis_round(surface_z - elev, 3)
+
+    return TerrainResult(
+        x=xs[keep],
+        y=ys[keep],
+        value=value,
+        tolerances=tolerances,
+        elev=elev,
+        x_dist=x_dist,
+        surface_z=surface_z,
+        clearance=clearance,
+        penetrates=clearance < 0,
+    )
+
+
+def clearance_grid(
+    window: RasterWindow,
+    frame: RunwayFrame,
+    footprint: SurfaceFootprint,
+    der_elevation: float,
+    vertical_tolerance: float = 0.0,
+    clip_buffer: float = 0.0,
+    climb_gradient: float = TOFPA_CLIMB_GRADIENT,
+) -> np.ndarray:
+    """Unrounded clearance of every cell of *window*, NaN where the clip drops it.
+
+    Same quantity as the model's ``clearance`` field without its 3-decimal
+    rounding, laid out on the raster grid (e.g. for ``core.isolines``).
+    """
+    xs, ys = window.cell_centres()
+    along, cross = frame.to_local(xs, ys)
+    keep = window.valid_mask() & (footprint.distance_to(along, cross) <= clip_buffer)
+    surface_z = der_elevation + reference_line_distance(along, cross) * climb_gradient
+    elev = window.values.astype(np.float64) + vertical_tolerance
+    return np.where(keep, surface_z - elev, np.nan)
+
+
+def analyze_terrain_tiled(
+    windows: Iterable[RasterWindow],
+    frame: RunwayFrame,
+    footprint: SurfaceFootprint,
+    der_elevation: float,
+    vertical_tolerance: float = 0.0,
+    clip_buffer: float = 0.0,
+    climb_gradient: float = TOFPA_CLIMB_GRADIENT,
+    on_tile: Optional[Callable[[TerrainResult], None]] = None,
+) -> TerrainSummary:
+    """Run :func:`analyze_terrain` tile by tile and reduce the results.
+
+    *windows* is typically ``core.dtm.iter_tiles``; each tile's result is
+    handed to *on_tile* (e.g. a feature writer) and then dropped, so peak
+    memory is bounded by the tile size.
+    """
+    summary = TerrainSummary()
+    for window in windows:
+        result = analyze_terrain(
+            window, frame, footprint, der_elevation,
+            vertical_tolerance=vertical_tolerance,
+            clip_buffer=clip_buffer,
+            climb_gradient=climb_gradient,
+        )
+        _fold(summary, result, on_tile)
+    return summary
+
+
+def analyze_terrain_parallel(
+    tiles: Iterable,
+    read: Callable[[object], Optional[RasterWindow]],
+    frame: RunwayFrame,
+    footprint: SurfaceFootprint,
+    der_elevation: float,
+    vertical_tolerance: float = 0.0,
+    clip_buffer: float = 0.0,
+    climb_gradient: float = TOFPA_CLIMB_GRADIENT,
+    workers: int = 1,
+    on_tile: Optional[Callable[[TerrainResult], None]] = None,
+) -> TerrainSummary:
+    """Read and analyse *tiles* on *workers* threads, reducing in tile order.
+
+    Args:
+        tiles:   Tile descriptors, typically ``core.dtm.tile_offsets``.
+        read:    Thread-safe callable turning a descriptor into a
+                 ``RasterWindow`` (or ``None`` to skip it), e.g.
+                 ``core.dtm.TileReader``.
+        workers: Worker threads; ``1`` runs everything on the calling thread.
+
+    GDAL reads and the NumPy kernels release the GIL, so threads scale
+    without copying tiles between processes.  Results are folded — and
+    *on_tile* called — on the calling thread in tile order, so the summary
+    is identical to :func:`analyze_terrain_tiled` and *on_tile* may touch
+    non-thread-safe objects.  At most ``2 * workers`` tiles are in flight,
+    which keeps memory bounded by the tile size.
+    """
+    def _work(tile) -> Optional[TerrainResult]:
+        window = read(tile)
+        if window is None:
+            return None
+        return analyze_terrain(
+            window, frame, footprint, der_elevation,
+            vertical_tolerance=vertical_tolerance,
+            clip_buffer=clip_buffer,
+            climb_gradient=climb_gradient,
+        )
+
+    summary = TerrainSummary()
+    if workers <= 1:
+        for tile in tiles:
+            _fold(summary, _work(tile), on_tile)
+        return summary
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        for tile in tiles:
+            pending.append(pool.submit(_work, tile))
+            if len(pending) >= 2 * workers:
+                _fold(summary, pending.popleft().result(), on_tile)
+        while pending:
+            _fold(summary, pending.popleft().result(), on_tile)
+    return summary
+
+
+def analyze_terrain_surfaces(
+    tiles: Iterable,
+    read: Callable[[object], Optional[RasterWindow]],
+    surfaces: Sequence[SurfaceGeometry],
+    vertical_tolerance: float = 0.0,
+    clip_buffer: float = 0.0,
+    workers: int = 1,
+    on_tile: Optional[Callable[[int, TerrainResult], None]] = None,
+    geotransform: Optional[tuple] = None,
+) -> List[TerrainSummary]:
+    """:func:`analyze_terrain_parallel` against several surfaces at once.
+
+    Every tile is read once and evaluated against each surface whose
+    extent (grown by *clip_buffer*) it overlaps; *on_tile* receives the
+    surface index with each result.  With the *geotransform* of the tile
+    offsets, tiles overlapping no surface are skipped without being read.
+    Returns one summary per surface, each identical to a separate
+    :func:`analyze_terrain_parallel` run over the same tiles.
+    """
+    extents = [surface.extent(clip_buffer) for surface in surfaces]
+
+    def _touched(bounds) -> List[int]:
+        xmin, ymin, xmax, ymax = bounds
+        return [k for k, (a, b, c, d) in enumerate(extents)
+                if xmin <= c and a <= xmax and ymin <= d and b <= ymax]
+
+    def _work(tile) -> Optional[list]:
+        if geotransform is not None:
+            col_off, row_off, cols, rows = tile
+            if not _touched(_grid_bounds(geotransform, col_off, row_off, cols, rows)):
+                return None
+        window = read(tile)
+        if window is None:
+            return None
+        rows, cols = window.values.shape
+        results = []
+        for k in _touched(_grid_bounds(window.geotransform, 0, 0, cols, rows)):
+            surface = surfaces[k]
+            results.append((k, analyze_terrain(
+                window, surface.frame, surface.footprint, surface.der_elevation,
+                vertical_tolerance=vertical_tolerance,
+                clip_buffer=clip_buffer,
+                climb_gradient=surface.climb_gradient,
+            )))
+        return results
+
+    summaries = [TerrainSummary() for _ in surfaces]
+
+    def _fold_all(results) -> None:
+        for k, result in results or ():
+            _fold(summaries[k], result, None if on_tile is None else
+                  lambda r, k=k: on_tile(k, r))
+
+    if workers <= 1:
+        for tile in tiles:
+            _fold_all(_work(tile))
+        return summaries
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        for tile in tiles:
+            pending.append(pool.submit(_work, tile))
+            if len(pending) >= 2 * workers:
+                _fold_all(pending.popleft().result())
+        while pending:
+            _fold_all(pending.popleft().result())
+    return summaries
+
+
+def _grid_bounds(geotransform, col_off: int, row_off: int, cols: int, rows: int) -> tuple:
+    """``(xmin, ymin, xmax, ymax)`` of a block of cells of a north-up grid."""
+    x0, dx, _rx, y0, _ry, dy = geotransform
+    xa, xb = x0 + col_off * dx, x0 + (col_off + cols) * dx
+    ya, yb = y0 + row_off * dy, y0 + (row_off + rows) * dy
+    return min(xa, xb), min(ya, yb), max(xa, xb), max(ya, yb)
+
+
+def _fold(summary: TerrainSummary, result: Optional[TerrainResult], on_tile) -> None:
+    """Add one tile's *result* to *summary* and hand it to *on_tile*."""
+    if result is None:
+        return
+    summary.update(result)
+    if on_tile is not None and len(result):
+        on_tile(result)
@@ -0,0 +1,5 @@
+"""TOFPA Processing provider and algorithms."""
+
+from .provider import TofpaProvider
+
+__all__ = ["TofpaProvider"]
@@ -0,0 +1,615 @@
+# -*- coding: utf-8 -*-
+"""
+TOFPA Processing algorithms: surfaces, obstacle and terrain analysis.
+
+Headless counterparts of the panel run for the Processing toolbox, models
+and ``qgis_process``:
+
+    qgis_process run tofpa:surface -- RUNWAY=runways.gpkg THRESHOLD=thresholds.gpkg \\
+        DIRECTION=2 SURFACE=surfaces.gpkg
+    qgis_process run tofpa:obstacles -- RUNWAY=... THRESHOLD=... \\
+        OBSTACLES=survey.gpkg HEIGHT_FIELD=elev CRITICAL=critical.gpkg
+    qgis_process run tofpa:terrain -- RUNWAY=... THRESHOLD=... \\
+        DTM=dtm.tif DTM_POST_SPACING=30 TERRAIN=terrain.gpkg
+
+Every algorithm builds the surfaces of the chosen runway ends with
+``core.aerodrome.runway_ends`` — one per runway and direction with a
+threshold point at its departure end, the DER elevation taken from the
+threshold Z value when there is one — and streams its results to feature
+sinks tagged with the runway end.  The survey and the DTM are read once
+for all runway ends.  Progress and cancellation follow the Processing
+feedback.  Work is done in the CRS of the runway layer: obstacles are
+reprojected on read, DTMs must share that CRS.
+"""
+
+from __future__ import annotations
+
+import os
+
+import numpy as np
+from qgis.PyQt.QtCore import QCoreApplication
+from qgis.core import (
+    Qgis,
+    QgsFeatureRequest,
+    QgsField,
+    QgsProcessingAlgorithm,
+    QgsProcessingException,
+    QgsProcessingOutputNumber,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterField,
+    QgsProcessingParameterNumber,
+    QgsProcessingParameterRasterLayer,
+    QgsProcessingParameterString,
+)
+
+try:
+    from ..core.aerodrome import evaluate_runway_ends, runway_ends
+    from ..core.dtm import (
+        TileReader, open_dtm, sample_dtm, surfaces_tile_reader, tile_offsets,
+    )
+    from ..core.incremental import shadow_sectors
+    from ..core.models import RunwayDirection, TofpaParams
+    from ..core.obstacles import FeatureAccumulator, ObstacleAnalyzer, ObstacleProjection
+    from ..core.records import ObstacleRecords
+    from ..core.terrain import analyze_terrain_surfaces, dtm_clip_buffer
+    from ..utils.compat import (
+        FIELD_STRING, FIELD_TYPE_NUMERIC, NUMBER_DOUBLE, NUMBER_INTEGER,
+        SOURCE_VECTOR_LINE, SOURCE_VECTOR_POINT, SOURCE_VECTOR_POLYGON,
+    )
+    from ..utils.features import (
+        as_fields, contour_features, contour_fields, reference_line_feature,
+        reference_line_fields, surface_feature, surface_fields, terrain_features,
+        terrain_fields,
+    )
+except ImportError:
+    from core.aerodrome import evaluate_runway_ends, runway_ends
+    from core.dtm import (
+        TileReader, open_dtm, sample_dtm, surfaces_tile_reader, tile_offsets,
+    )
+    from core.incremental import shadow_sectors
+    from core.models import RunwayDirection, TofpaParams
+    from core.obstacles import FeatureAccumulator, ObstacleAnalyzer, ObstacleProjection
+    from core.records import ObstacleRecords
+    from core.terrain import analyze_terrain_surfaces, dtm_clip_buffer
+    from utils.compat import (
+        FIELD_STRING, FIELD_TYPE_NUMERIC, NUMBER_DOUBLE, NUMBER_INTEGER,
+        SOURCE_VECTOR_LINE, SOURCE_VECTOR_POINT, SOURCE_VECTOR_POLYGON,
+    )
+    from utils.features import (
+        as_fields, contour_features, contour_fields, reference_line_feature,
+        reference_line_fields, surface_feature, surface_fields, terrain_features,
+        terrain_fields,
+    )
+
+# Obstacle rows written between two progress / cancellation checks
+WRITE_CHUNK = 10_000
+
+
+def _runway_end_field() -> QgsField:
+    return QgsField("runway_end", FIELD_STRING)
+
+
+def _with_progress(items, feedback, total: int, start: float = 0.0, end: float = 100.0):
+    """Yield *items*, reporting progress from *start* to *end* percent of *total*.
+
+    Stops early once the run is cancelled.
+    """
+    step = max(1, total // 100) if total > 0 else 1000
+    span = (end - start) / total if total > 0 else 0.0
+    for i, item in enumerate(items):
+        if i % step == 0:
+            if feedback.isCanceled():
+                return
+            feedback.setProgress(start + min(i * span, end - start))
+        yield item
+    feedback.setProgress(end)
+
+
+class _TofpaAlgorithm(QgsProcessingAlgorithm):
+    """Runway ends and surface parameters shared by the TOFPA algorithms."""
+
+    RUNWAY = "RUNWAY"
+    THRESHOLD = "THRESHOLD"
+    DIRECTION = "DIRECTION"
+    INITIAL_WIDTH = "INITIAL_WIDTH"
+    MAX_WIDTH = "MAX_WIDTH"
+    CLEARWAY = "CLEARWAY"
+    DER_ELEVATION = "DER_ELEVATION"
+
+    DIRECTIONS = ("Start to End", "End to Start", "Both directions (every runway end)")
+
+    def tr(self, message):
+        return QCoreApplication.translate("TOFPA", message)
+
+    def createInstance(self):
+        return type(self)()
+
+    def _add_runway_parameters(self) -> None:
+        self.addParameter(QgsProcessingParameterFeatureSource(
+            self.RUNWAY, self.tr("Runway centrelines"), [SOURCE_VECTOR_LINE]
+        ))
+        self.addParameter(QgsProcessingParameterFeatureSource(
+            self.THRESHOLD, self.tr("Threshold points"), [SOURCE_VECTOR_POINT]
+        ))
+        self.addParameter(QgsProcessingParameterEnum(
+            self.DIRECTION, self.tr("Takeoff direction"),
+            options=[self.tr(d) for d in self.DIRECTIONS], defaultValue=0,
+        ))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.INITIAL_WIDTH, self.tr("Initial width (m)"), NUMBER_DOUBLE, 180.0, minValue=0.0
+        ))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.MAX_WIDTH, self.tr("Maximum width (m)"), NUMBER_DOUBLE, 1800.0, minValue=0.0
+        ))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.CLEARWAY, self.tr("Clearway length (m)"), NUMBER_DOUBLE, 0.0, minValue=0.0
+        ))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.DER_ELEVATION,
+            self.tr("DER elevation (m), for thresholds without Z"),
+            NUMBER_DOUBLE, 0.0,
+        ))
+
+    def _runway_ends(self, parameters, context, feedback, contour_interval: int = 0):
+        """``(runway ends, CRS)`` of the runway and threshold inputs."""
+        runway_source = self.parameterAsSource(parameters, self.RUNWAY, context)
+        if runway_source is None:
+            raise QgsProcessingException(self.invalidSourceError(parameters, self.RUNWAY))
+        threshold_source = self.parameterAsSource(parameters, self.THRESHOLD, context)
+        if threshold_source is None:
+            raise QgsProcessingException(self.invalidSourceError(parameters, self.THRESHOLD))
+        crs = runway_source.sourceCrs()
+
+        runways = [
+            (f.id(), [(p.x(), p.y()) for p in f.geometry().asPolyline()])
+            for f in runway_source.getFeatures() if f.hasGeometry()
+        ]
+        request = QgsFeatureRequest().setDestinationCrs(crs, context.transformContext())
+        thresholds, elevations = [], {}
+        for feature in threshold_source.getFeatures(request):
+            if not feature.hasGeometry():
+                continue
+            vertex = feature.geometry().vertexAt(0)
+            thresholds.append((feature.id(), vertex.x(), vertex.y()))
+            if vertex.is3D() and not np.isnan(vertex.z()):
+                elevations[feature.id()] = vertex.z()
+
+        der_elevation = self.parameterAsDouble(parameters, self.DER_ELEVATION, context)
+        params = TofpaParams(
+            width_tofpa=self.parameterAsDouble(parameters, self.INITIAL_WIDTH, context),
+            max_width_tofpa=self.parameterAsDouble(parameters, self.MAX_WIDTH, context),
+            cwy_length=self.parameterAsDouble(parameters, self.CLEARWAY, context),
+            z0=der_elevation,
+            ze=der_elevation,
+            s=int(RunwayDirection.START_TO_END),
+            runway_layer_id=None,
+            threshold_layer_id=None,
+            use_selected_feature=False,
+            export_kmz=False,
+            export_aixm=False,
+            contour_interval_m=contour_interval,
+            aerodrome_batch=True,
+        )
+        try:
+            ends = runway_ends(params, runways, thresholds, elevations)
+        except ValueError as e:
+            raise QgsProcessingException(str(e))
+
+        direction = self.parameterAsEnum(parameters, self.DIRECTION, context)
+        if direction < 2:
+            wanted = RunwayDirection.START_TO_END if direction == 0 else RunwayDirection.END_TO_START
+            ends = [end for end in ends if end.direction == wanted]
+            if not ends:
+                raise QgsProcessingException(
+                    self.tr("No runway end has a threshold point in the chosen direction")
+                )
+        feedback.pushInfo(self.tr("Runway ends: ") + ", ".join(end.name for end in ends))
+        return ends, crs
+
+    def _check_dtm(self, layer, crs, name: str) -> None:
+        if layer.providerType() != "gdal":
+            raise QgsProcessingException(f"DTM layer '{layer.name()}' is not a GDAL raster!")
+        if layer.crs() != crs:
+            raise QgsProcessingException(
+                f"{name} must be in the CRS of the runway layer ({crs.authid()})"
+            )
+
+
+class TofpaSurfaceAlgorithm(_TofpaAlgorithm):
+    """TOFPA AOC Type A surfaces, reference lines and contours of runway ends."""
+
+    CONTOUR_INTERVAL = "CONTOUR_INTERVAL"
+    SURFACE = "SURFACE"
+    REFERENCE_LINE = "REFERENCE_LINE"
+    CONTOURS = "CONTOURS"
+
+    def name(self):
+        return "surface"
+
+    def displayName(self):
+        return self.tr("TOFPA surface (AOC Type A)")
+
+    def shortHelpString(self):
+        return self.tr(
+            "Builds the take-off flight path area (1.2 % climb) of each runway end that has "
+            "a threshold point at its departure end, with its reference line and, "
+            "optionally, elevation contours. The DER elevation is the threshold Z value "
+            "when available."
+        )
+
+    def initAlgorithm(self, config=None):
+        self._add_runway_parameters()
+        self.addParameter(QgsProcessingParameterNumber(
+            self.CONTOUR_INTERVAL, self.tr("Contour interval (m), 0 = none"),
+            NUMBER_INTEGER, 0, minValue=0,
+        ))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.SURFACE, self.tr("TOFPA surfaces"), SOURCE_VECTOR_POLYGON
+        ))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.REFERENCE_LINE, self.tr("Reference lines"), SOURCE_VECTOR_LINE,
+            optional=True, createByDefault=False,
+        ))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.CONTOURS, self.tr("Contours"), SOURCE_VECTOR_LINE,
+            optional=True, createByDefault=False,
+        ))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        interval = self.parameterAsInt(parameters, self.CONTOUR_INTERVAL, context)
+        ends, crs = self._runway_ends(parameters, context, feedback, interval)
+        extra = [_runway_end_field()]
+
+        surface_sink, surface_id = self.parameterAsSink(
+            parameters, self.SURFACE, context, as_fields(surface_fields(extra)),
+            Qgis.WkbType.PolygonZ, crs,
+        )
+        if surface_sink is None:
+            raise QgsProcessingException(self.invalidSinkError(parameters, self.SURFACE))
+        line_sink, line_id = self.parameterAsSink(
+            parameters, self.REFERENCE_LINE, context, as_fields(reference_line_fields(extra)),
+            Qgis.WkbType.LineStringZ, crs,
+        )
+        contour_sink, contour_id = self.parameterAsSink(
+            parameters, self.CONTOURS, context, as_fields(contour_fields(extra)),
+            Qgis.WkbType.LineStringZ, crs,
+        )
+
+        next_contour = 1
+        for k, end in enumerate(ends):
+            if feedback.isCanceled():
+                break
+            geometry = end.geometry
+            surface_sink.addFeature(surface_feature(geometry, end.name, (end.name,)))
+            if line_sink is not None:
+                line_sink.addFeature(reference_line_feature(geometry, k + 1, end.name, (end.name,)))
+            if contour_sink is not None:
+                contours = contour_features(geometry, next_contour, (end.name,))
+                contour_sink.addFeatures(contours)
+                next_contour += len(contours)
+            feedback.setProgress(100.0 * (k + 1) / len(ends))
+
+        return {self.SURFACE: surface_id, self.REFERENCE_LINE: line_id, self.CONTOURS: contour_id}
+
+
+class TofpaObstaclesAlgorithm(_TofpaAlgorithm):
+    """Survey obstacles tested against the TOFPA surfaces of runway ends."""
+
+    OBSTACLES = "OBSTACLES"
+    HEIGHT_FIELD = "HEIGHT_FIELD"
+    BUFFER = "BUFFER"
+    MIN_HEIGHT = "MIN_HEIGHT"
+    GROUND_DTM = "GROUND_DTM"
+    SHADOWS = "SHADOWS"
+    SHADOW_TOLERANCE = "SHADOW_TOLERANCE"
+    CRITICAL = "CRITICAL"
+    SAFE = "SAFE"
+    BUFFERS = "BUFFERS"
+    SHADOWED = "SHADOWED"
+    VISIBLE = "VISIBLE"
+    TOTAL_OBSTACLES = "TOTAL_OBSTACLES"
+    CRITICAL_OBSTACLES = "CRITICAL_OBSTACLES"
+
+    def name(self):
+        return "obstacles"
+
+    def displayName(self):
+        return self.tr("TOFPA obstacle analysis")
+
+    def shortHelpString(self):
+        return self.tr(
+            "Tests every survey obstacle (points, or polygon centroids) against the TOFPA "
+            "surface of each runway end in one pass over the survey. Obstacles whose base "
+            "lies outside a surface extent grown by the buffer are not reported for that "
+            "end; an obstacle near several surfaces is reported once per runway end. "
+            "With a ground DTM the height field holds heights above ground. Shadow "
+            "analysis splits critical obstacles into shadowed and visible ones, seen "
+            "from each DER."
+        )
+
+    def initAlgorithm(self, config=None):
+        self._add_runway_parameters()
+        self.addParameter(QgsProcessingParameterFeatureSource(
+            self.OBSTACLES, self.tr("Survey obstacles"),
+            [SOURCE_VECTOR_POINT, SOURCE_VECTOR_POLYGON],
+        ))
+        self.addParameter(QgsProcessingParameterField(
+            self.HEIGHT_FIELD, self.tr("Obstacle height field"),
+            parentLayerParameterName=self.OBSTACLES, type=FIELD_TYPE_NUMERIC,
+        ))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.BUFFER, self.tr("Obstacle buffer (m)"), NUMBER_DOUBLE, 10.0, minValue=0.0
+        ))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.MIN_HEIGHT, self.tr("Minimum obstacle height (m)"), NUMBER_DOUBLE, 5.0
+        ))
+        self.addParameter(QgsProcessingParameterRasterLayer(
+            self.GROUND_DTM, self.tr("Ground DTM (heights above ground)"), optional=True
+        ))
+        self.addParameter(QgsProcessingParameterBoolean(
+            self.SHADOWS, self.tr("Shadow analysis"), defaultValue=False
+        ))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.SHADOW_TOLERANCE, self.tr("Shadow tolerance (degrees)"), NUMBER_DOUBLE, 5.0,
+            minValue=0.0,
+        ))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.CRITICAL, self.tr("Critical obstacles"), SOURCE_VECTOR_POINT
+        ))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.SAFE, self.tr("Safe obstacles"), SOURCE_VECTOR_POINT,
+            optional=True, createByDefault=False,
+        ))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.BUFFERS, self.tr("Obstacle buffers"), SOURCE_VECTOR_POLYGON,
+            optional=True, createByDefault=False,
+        ))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.SHADOWED, self.tr("Shadowed obstacles"), SOURCE_VECTOR_POINT,
+            optional=True, createByDefault=False,
+        ))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.VISIBLE, self.tr("Visible critical obstacles"), SOURCE_VECTOR_POINT,
+            optional=True, createByDefault=False,
+        ))
+        self.addOutput(QgsProcessingOutputNumber(self.TOTAL_OBSTACLES, self.tr("Obstacles analysed")))
+        self.addOutput(QgsProcessingOutputNumber(self.CRITICAL_OBSTACLES, self.tr("Critical obstacles")))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        ends, crs = self._runway_ends(parameters, context, feedback)
+        source = self.parameterAsSource(parameters, self.OBSTACLES, context)
+        if source is None:
+            raise QgsProcessingException(self.invalidSourceError(parameters, self.OBSTACLES))
+        height_field = self.parameterAsString(parameters, self.HEIGHT_FIELD, context) or None
+        buffer_distance = self.parameterAsDouble(parameters, self.BUFFER, context)
+        min_height = self.parameterAsDouble(parameters, self.MIN_HEIGHT, context)
+        shadows = self.parameterAsBool(parameters, self.SHADOWS, context)
+        tolerance = self.parameterAsDouble(parameters, self.SHADOW_TOLERANCE, context)
+
+        extra = [_runway_end_field()]
+        point_fields = as_fields(ObstacleAnalyzer.obstacle_fields(extra))
+        outputs, layers_info = {}, {}
+        for name, key, fields, wkb_type in (
+            (self.CRITICAL, "critical_layer", point_fields, Qgis.WkbType.PointZ),
+            (self.SAFE, "safe_layer", point_fields, Qgis.WkbType.PointZ),
+            (self.BUFFERS, "buffer_layer",
+             as_fields(ObstacleAnalyzer.buffer_fields(extra)), Qgis.WkbType.Polygon),
+            (self.SHADOWED, "shadowed_layer", point_fields, Qgis.WkbType.PointZ),
+            (self.VISIBLE, "visible_layer", point_fields, Qgis.WkbType.PointZ),
+        ):
+            # Outputs not requested stay None; their features are dropped
+            layers_info[key], outputs[name] = self.parameterAsSink(
+                parameters, name, context, fields, wkb_type, crs
+            )
+        if layers_info["critical_layer"] is None:
+            raise QgsProcessingException(self.invalidSinkError(parameters, self.CRITICAL))
+
+        # Survey: base point and height of every obstacle, in the runway CRS (0–40 %)
+        feedback.setProgressText(self.tr("Reading obstacles"))
+        request = QgsFeatureRequest().setSubsetOfAttributes(
+            [height_field] if height_field else [], source.fields()
+        )
+        request.setDestinationCrs(crs, context.transformContext())
+        total = source.featureCount()
+        projection = ObstacleProjection.from_features(
+            ends[0].geometry.frame,
+            _with_progress(source.getFeatures(request), feedback, total, 0.0, 40.0),
+            height_field, total,
+        )
+        if feedback.isCanceled():
+            return {}
+
+        near = np.zeros(len(projection), dtype=bool)
+        for end in ends:
+            near |= projection.in_rectangle(*end.geometry.extent(buffer_distance))
+        projection = projection.subset(near)
+
+        ground = None
+        ground_layer = self.parameterAsRasterLayer(parameters, self.GROUND_DTM, context)
+        if ground_layer is not None:
+            self._check_dtm(ground_layer, crs, self.tr("Ground DTM"))
+            ground = sample_dtm(open_dtm(ground_layer.source()), projection.x, projection.y)
+            missing = np.isnan(ground)
+            if missing.any():
+                feedback.pushWarning(f"{int(missing.sum())} obstacles off the ground DTM skipped")
+                projection, ground = projection.subset(~missing), ground[~missing]
+
+        # Penetration test against every surface in one pass (40–50 %)
+        feedback.setProgressText(self.tr("Evaluating obstacles"))
+        found = evaluate_runway_ends(
+            ends, projection.x, projection.y, projection.height,
+            buffer_distance, min_height, ground,
+        )
+        feedback.setProgress(50.0)
+
+        # Output features, streamed to the sinks (50–100 %)
+        feedback.setProgressText(self.tr("Writing obstacles"))
+        analyzer = ObstacleAnalyzer()
+        accumulator = FeatureAccumulator()
+        rows_total = max(1, sum(len(hits) for hits in found))
+        rows_done = 0
+        critical = 0
+        for end, hits in zip(ends, found):
+            records = ObstacleRecords.empty(len(hits))
+            for start in range(0, len(hits), WRITE_CHUNK):
+                if feedback.isCanceled():
+                    return {}
+                rows = slice(start, start + WRITE_CHUNK)
+                part = {name: values[rows] for name, values in hits.results.items()}
+                records.put(rows, analyzer.write_results(
+                    projection.subset(hits.index[rows]), part, buffer_distance,
+                    layers_info, accumulator, (end.name,),
+                ))
+                rows_done += len(part["height"])
+                feedback.setProgress(50.0 + 50.0 * rows_done / rows_total)
+            if shadows:
+                records.set_shadows(*shadow_sectors(records, end.geometry.der, tolerance))
+                analyzer.apply_shadow_results(
+                    layers_info, records, buffer_distance, accumulator,
+                    extra_attributes=(end.name,),
+                )
+            end_critical = int(np.count_nonzero(records.critical))
+            critical += end_critical
+            message = f"{end.name}: {len(records)} obstacles, {end_critical} critical"
+            if shadows:
+                message += f", {int(np.count_nonzero(records.shadowed))} shadowed"
+            feedback.pushInfo(message)
+        accumulator.flush()
+
+        outputs[self.TOTAL_OBSTACLES] = len(projection)
+        outputs[self.CRITICAL_OBSTACLES] = critical
+        return outputs
+
+
+class TofpaTerrainAlgorithm(_TofpaAlgorithm):
+    """DTM cells tested against the TOFPA surfaces of runway ends."""
+
+    DTM = "DTM"
+    DTM_POST_SPACING = "DTM_POST_SPACING"
+    VERTICAL_TOLERANCE = "VERTICAL_TOLERANCE"
+    SOURCE = "SOURCE"
+    PENETRATING_ONLY = "PENETRATING_ONLY"
+    WORKERS = "WORKERS"
+    TERRAIN = "TERRAIN"
+    TOTAL_CELLS = "TOTAL_CELLS"
+    PENETRATING_CELLS = "PENETRATING_CELLS"
+    MAX_PENETRATION = "MAX_PENETRATION"
+
+    def name(self):
+        return "terrain"
+
+    def displayName(self):
+        return self.tr("TOFPA terrain (DTM) analysis")
+
+    def shortHelpString(self):
+        return self.tr(
+            "Evaluates every DTM cell under the TOFPA surface of each runway end "
+            "(native equivalent of the TOFPA_analysis model). The DTM is read once, "
+            "tile by tile, for all runway ends; with 'penetrating cells only', blocks "
+            "that cannot reach any surface are not read. The DTM must be a GDAL raster "
+            "in the CRS of the runway layer."
+        )
+
+    def initAlgorithm(self, config=None):
+        self._add_runway_parameters()
+        self.addParameter(QgsProcessingParameterRasterLayer(self.DTM, self.tr("DTM")))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.DTM_POST_SPACING, self.tr("DTM post spacing (m)"), NUMBER_DOUBLE, 0.0,
+            minValue=0.0,
+        ))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.VERTICAL_TOLERANCE, self.tr("Vertical tolerance (m)"), NUMBER_DOUBLE, 0.0
+        ))
+        self.addParameter(QgsProcessingParameterString(
+            self.SOURCE, self.tr("Terrain source"), defaultValue="SRTM"
+        ))
+        self.addParameter(QgsProcessingParameterBoolean(
+            self.PENETRATING_ONLY, self.tr("Penetrating cells only"), defaultValue=False
+        ))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.WORKERS, self.tr("Worker threads"), NUMBER_INTEGER, os.cpu_count() or 1,
+            minValue=1,
+        ))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.TERRAIN, self.tr("Terrain obstacles"), SOURCE_VECTOR_POINT
+        ))
+        self.addOutput(QgsProcessingOutputNumber(self.TOTAL_CELLS, self.tr("Cells evaluated")))
+        self.addOutput(QgsProcessingOutputNumber(self.PENETRATING_CELLS, self.tr("Penetrating cells")))
+        self.addOutput(QgsProcessingOutputNumber(self.MAX_PENETRATION, self.tr("Maximum penetration (m)")))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        ends, crs = self._runway_ends(parameters, context, feedback)
+        dtm_layer = self.parameterAsRasterLayer(parameters, self.DTM, context)
+        if dtm_layer is None:
+            raise QgsProcessingException(self.invalidRasterError(parameters, self.DTM))
+        self._check_dtm(dtm_layer, crs, self.tr("The DTM"))
+        vertical_tolerance = self.parameterAsDouble(parameters, self.VERTICAL_TOLERANCE, context)
+        source = self.parameterAsString(parameters, self.SOURCE, context)
+        penetrating_only = self.parameterAsBool(parameters, self.PENETRATING_ONLY, context)
+        workers = self.parameterAsInt(parameters, self.WORKERS, context)
+
+        clip_buffer = dtm_clip_buffer(self.parameterAsDouble(parameters, self.DTM_POST_SPACING, context))
+        geometries = [end.geometry for end in ends]
+        extents = np.array([geometry.extent(clip_buffer) for geometry in geometries])
+        window = (extents[:, 0].min(), extents[:, 1].min(),
+                  extents[:, 2].max(), extents[:, 3].max())
+        dataset = open_dtm(dtm_layer.source())
+
+        sink, dest_id = self.parameterAsSink(
+            parameters, self.TERRAIN, context, as_fields(terrain_fields([_runway_end_field()])),
+            Qgis.WkbType.Point, crs,
+        )
+        if sink is None:
+            raise QgsProcessingException(self.invalidSinkError(parameters, self.TERRAIN))
+
+        reader = TileReader(dataset.GetDescription())
+        if penetrating_only:
+            feedback.setProgressText(self.tr("Building the DTM max pyramid"))
+            reader, skipped_cells = surfaces_tile_reader(
+                dataset, window, geometries,
+                vertical_tolerance=vertical_tolerance,
+                clip_buffer=clip_buffer,
+                workers=workers,
+            )
+            feedback.pushInfo(f"{skipped_cells} cells skipped (cannot penetrate)")
+
+        accumulator = FeatureAccumulator()
+        next_id = [1]
+
+        def _write_tile(k: int, result) -> None:
+            if penetrating_only:
+                result = result.subset(result.penetrates)
+            for feature in terrain_features(result, source, next_id[0], (ends[k].name,)):
+                accumulator.add(sink, feature)
+            next_id[0] += len(result)
+
+        feedback.setProgressText(self.tr("Evaluating DTM tiles"))
+        tiles = list(tile_offsets(dataset, window))
+        summaries = analyze_terrain_surfaces(
+            _with_progress(tiles, feedback, len(tiles)),
+            reader,
+            geometries,
+            vertical_tolerance=vertical_tolerance,
+            clip_buffer=clip_buffer,
+            workers=workers,
+            on_tile=_write_tile,
+            geotransform=dataset.GetGeoTransform(),
+        )
+        accumulator.flush()
+        if feedback.isCanceled():
+            return {}
+
+        for end, summary in zip(ends, summaries):
+            feedback.pushInfo(
+                f"{end.name}: {summary.total_cells} DTM cells, "
+                f"{summary.penetrating_cells} penetrate (max {summary.max_penetration:.2f} m)"
+            )
+        return {
+            self.TERRAIN: dest_id,
+            self.TOTAL_CELLS: sum(summary.total_cells for summary in summaries),
+            self.PENETRATING_CELLS: sum(summary.penetrating_cells for summary in summaries),
+            self.MAX_PENETRATION: max(summary.max_penetration for summary in summaries),
+        }
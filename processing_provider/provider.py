@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+TOFPA Processing provider.
+
+Registered by ``TOFPA.initProcessing``, which QGIS also calls when the
+plugin is loaded by ``qgis_process`` (no GUI), so the algorithms run
+headless as ``tofpa:surface``, ``tofpa:obstacles`` and ``tofpa:terrain``.
+"""
+
+import os
+
+from qgis.PyQt.QtGui import QIcon
+from qgis.core import QgsProcessingProvider
+
+from .algorithms import TofpaObstaclesAlgorithm, TofpaSurfaceAlgorithm, TofpaTerrainAlgorithm
+
+
+class TofpaProvider(QgsProcessingProvider):
+    """Processing provider of the TOFPA algorithms."""
+
+    def loadAlgorithms(self):
+        for algorithm in (TofpaSurfaceAlgorithm(), TofpaObstaclesAlgorithm(), TofpaTerrainAlgorithm()):
+            self.addAlgorithm(algorithm)
+
+    def id(self):
+        return "tofpa"
+
+    def name(self):
+        return "TOFPA"
+
+    def longName(self):
+        return "TOFPA — Take-Off Flight Path Area"
+
+    def icon(self):
+        return QIcon(os.path.join(os.path.dirname(os.path.dirname(__file__)), "icon.png"))
@@ -0,0 +1 @@
+"""Unit tests of the QGIS-free core modules (``python -m pytest -q tests``)."""
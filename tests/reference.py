@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Scalar reference implementations the vectorised core is checked against,
+the surface parameters most tests start from and in-memory DTM tiles.
+
+``core.obstacles`` needs QGIS; without it the helpers below are the same
+code with plain ``(x, y)`` points.  ``project`` is ``QgsPoint.project`` in a
+plane (the construction the plugin used before ``core.surface``).
+"""
+from __future__ import annotations
+
+from math import atan, atan2, cos, pi, radians, sin, sqrt
+from types import SimpleNamespace
+
+import numpy as np
+
+from ..core.models import TofpaParams
+from ..core.terrain import RasterWindow
+
+try:
+    from ..core.obstacles import _distance_along_axis, _ocs_elevation_at_distance
+except ImportError:  # no QGIS
+    def _distance_along_axis(obstacle_pt, der_pt, azimuth_deg: float) -> float:
+        az = radians(azimuth_deg)
+        dx = obstacle_pt.x() - der_pt.x()
+        dy = obstacle_pt.y() - der_pt.y()
+        return dx * sin(az) + dy * cos(az)
+
+    def _ocs_elevation_at_distance(d: float, z_der: float, climb_gradient: float) -> float:
+        if d < 0:
+            return z_der
+        return z_der + d * climb_gradient
+
+
+def point(x: float, y: float):
+    """Object with the ``x()`` / ``y()`` accessors of ``QgsPointXY``."""
+    return SimpleNamespace(x=lambda: x, y=lambda: y)
+
+
+def project(x: float, y: float, distance: float, azimuth: float) -> tuple[float, float]:
+    """``QgsPoint(x, y).project(distance, azimuth)`` as an ``(x, y)`` pair."""
+    az = radians(azimuth)
+    return x + distance * sin(az), y + distance * cos(az)
+
+
+def make_params(**changes) -> TofpaParams:
+    """``TofpaParams`` of a 180 m / 1800 m surface, with *changes* applied."""
+    values = dict(width_tofpa=180.0, max_width_tofpa=1800.0, cwy_length=0.0, z0=10.0,
+                  ze=21.7, s=0, runway_layer_id=None, threshold_layer_id=None,
+                  use_selected_feature=False, export_kmz=False, export_aixm=False)
+    values.update(changes)
+    return TofpaParams(**values)
+
+
+def pairwise_shadows(xs, ys, heights, ids, origin_x: float, origin_y: float,
+                     origin_z: float, shadow_tolerance: float = 5.0) -> list:
+    """``ObstacleAnalyzer.is_obstacle_shadowed`` over every obstacle (O(n²)).
+
+    Index of the first obstacle, in input order, shadowing each one, or
+    ``None``; the scan ``core.shadow.shadow_sweep`` replaced.
+    """
+    def distance(i):  # QgsPoint.distance
+        return sqrt((xs[i] - origin_x) ** 2 + (ys[i] - origin_y) ** 2)
+
+    def bearing(i):  # QgsPoint.azimuth
+        return atan2(xs[i] - origin_x, ys[i] - origin_y) * 180 / pi
+
+    def elevation_shadow(target, other):  # check_elevation_shadow
+        target_dist, shadow_dist = distance(target), distance(other)
+        if target_dist <= 0 or shadow_dist <= 0:
+            return False
+        target_elev = atan((heights[target] - origin_z) / target_dist) * 180 / pi
+        shadow_elev = atan((heights[other] - origin_z) / shadow_dist) * 180 / pi
+        return shadow_elev > target_elev
+
+    result = []
+    for target in range(len(xs)):
+        found = None
+        for other in range(len(xs)):
+            if ids[other] == ids[target]:
+                continue
+            if distance(other) >= distance(target) or heights[other] <= heights[target]:
+                continue
+            diff = abs(bearing(target) - bearing(other))
+            if diff > 180:
+                diff = 360 - diff
+            if diff <= shadow_tolerance and elevation_shadow(target, other):
+                found = other
+                break
+        result.append(found)
+    return result
+
+
+def polygon_distance(xs, ys, ring) -> np.ndarray:
+    """Plan distance from points to the polygon *ring* (0 inside), by brute force:
+    even-odd point in polygon and the nearest of all edges."""
+    xs, ys = np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)
+    ring = np.asarray(ring, dtype=np.float64)[:, :2]
+    inside = np.zeros(xs.shape, dtype=bool)
+    dist = np.full(xs.shape, np.inf)
+    for (x0, y0), (x1, y1) in zip(ring, np.roll(ring, -1, axis=0)):
+        crosses = (y0 > ys) != (y1 > ys)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_cross = x0 + (ys - y0) * (x1 - x0) / (y1 - y0)
+        inside ^= crosses & (xs < x_cross)
+        sx, sy = x1 - x0, y1 - y0
+        t = np.clip(((xs - x0) * sx + (ys - y0) * sy) / (sx * sx + sy * sy), 0.0, 1.0)
+        dist = np.minimum(dist, np.hypot(xs - (x0 + t * sx), ys - (y0 + t * sy)))
+    return np.where(inside, 0.0, dist)
+
+
+def segment_distance(xs, ys, a, b) -> np.ndarray:
+    """Plan distance from points to the segment *a*–*b* (QGIS ``distance()``)."""
+    xs, ys = np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)
+    (x0, y0), (x1, y1) = a[:2], b[:2]
+    sx, sy = x1 - x0, y1 - y0
+    t = np.clip(((xs - x0) * sx + (ys - y0) * sy) / (sx * sx + sy * sy), 0.0, 1.0)
+    return np.hypot(xs - (x0 + t * sx), ys - (y0 + t * sy))
+
+
+def raster_tiles(values, geotransform, tile_rows: int, tile_cols: int, overlap: int = 0,
+                 nodata=None):
+    """``(tiles, read)`` over an in-memory DTM, as ``core.dtm.tile_offsets`` /
+    ``TileReader``: ``(col_off, row_off, cols, rows)`` tiles, overlapping by
+    *overlap* cells, and a callable reading one as a ``RasterWindow``."""
+    rows, cols = values.shape
+    x0, dx, rx, y0, ry, dy = geotransform
+    tiles = [(c, r, min(tile_cols + overlap, cols - c), min(tile_rows + overlap, rows - r))
+             for r in range(0, rows, tile_rows) for c in range(0, cols, tile_cols)]
+
+    def read(tile):
+        c, r, w, h = tile
+        return RasterWindow(values[r:r + h, c:c + w],
+                            (x0 + c * dx, dx, rx, y0 + r * dy, ry, dy), nodata)
+    return tiles, read
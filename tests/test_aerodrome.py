@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""``core.aerodrome``: runway ends and the single-pass obstacle test."""
+from dataclasses import replace
+from math import atan2, degrees
+
+import numpy as np
+import pytest
+
+from ..core.aerodrome import evaluate_runway_ends, runway_ends
+from ..core.models import RunwayDirection
+from ..core.obstacle_kernel import evaluate_obstacles
+from ..core.surface import surface_geometry
+from .reference import make_params
+
+RUNWAYS = [(1, [(0.0, 0.0), (500.0, 1000.0), (1000.0, 3000.0)]),
+           (2, [(-2000.0, 1500.0), (1500.0, 1000.0)])]
+# Both ends of runway 1, one end of runway 2 (its start has no threshold)
+THRESHOLDS = [(10, 5.0, -3.0), (11, 1004.0, 2990.0), (12, 1480.0, 1010.0)]
+
+
+def test_runway_ends_pair_thresholds_with_departure_ends():
+    params = make_params(cwy_length=60.0, contour_interval_m=10)
+    ends = runway_ends(params, RUNWAYS, THRESHOLDS, elevations={11: 33.0})
+    found = {(e.runway_id, e.direction): e for e in ends}
+    assert set(found) == {(1, RunwayDirection.START_TO_END), (1, RunwayDirection.END_TO_START),
+                          (2, RunwayDirection.START_TO_END)}
+
+    forward = found[(1, RunwayDirection.START_TO_END)]
+    assert forward.threshold_id == 11 and forward.geometry.der_elevation == 33.0
+    azimuth = degrees(atan2(1000.0, 3000.0))
+    expected = surface_geometry(replace(params, s=0, ze=33.0), 1004.0, 2990.0, azimuth)
+    np.testing.assert_allclose(forward.geometry.outline, expected.outline)
+    np.testing.assert_allclose(forward.geometry.contours, expected.contours)
+
+    backward = found[(1, RunwayDirection.END_TO_START)]
+    assert backward.threshold_id == 10 and backward.geometry.der_elevation == params.ze
+    assert backward.name == "RWY 1 end→start"
+
+
+def test_runway_ends_errors():
+    with pytest.raises(ValueError):
+        runway_ends(make_params(), RUNWAYS, [])
+    with pytest.raises(ValueError):
+        runway_ends(make_params(), [(3, [(0.0, 0.0)])], THRESHOLDS)
+    # A lone threshold belongs to the end it is nearer to
+    ends = runway_ends(make_params(), [(4, [(0.0, 0.0), (0.0, 100.0)])], [(1, 0.0, 20.0)])
+    assert [e.direction for e in ends] == [RunwayDirection.END_TO_START]
+
+
+@pytest.mark.parametrize("chunk_size", [1000, 7, 1 << 18])
+def test_single_pass_equals_one_run_per_end(chunk_size):
+    ends = runway_ends(make_params(), RUNWAYS, THRESHOLDS, elevations={10: 12.0, 12: 9.0})
+    rng = np.random.default_rng(12)
+    n = 5000
+    xs = rng.uniform(-12_000, 12_000, n)
+    ys = rng.uniform(-10_000, 14_000, n)
+    heights = rng.uniform(0, 250, n)
+    heights[::37] = np.nan
+    ground = rng.uniform(0, 20, n)
+
+    found = evaluate_runway_ends(ends, xs, ys, heights, 10.0, 5.0, ground, chunk_size=chunk_size)
+
+    for end, obstacles in zip(ends, found):
+        geometry = end.geometry
+        along, cross = geometry.frame.to_local(xs, ys)
+        alone = evaluate_obstacles(along, cross, heights, geometry.footprint, 10.0, 5.0,
+                                   geometry.der_elevation, geometry.climb_gradient, ground)
+        # Every obstacle outside the returned index misses the footprint
+        outside = np.setdiff1d(np.arange(n), obstacles.index)
+        assert not alone["in_footprint"][outside].any()
+        assert (np.diff(obstacles.index) > 0).all()
+        for name, column in obstacles.results.items():
+            expected = along if name == "along" else cross if name == "cross" else alone[name]
+            np.testing.assert_array_equal(column, expected[obstacles.index], err_msg=name)
+        assert obstacles.results["is_critical"].any()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""``core.gradient``: the sweep reproduces the analysis at every gradient."""
+import numpy as np
+import pytest
+
+from ..core.gradient import gradient_range, gradient_sweep, required_climb_gradient
+from ..core.obstacle_kernel import evaluate_obstacles
+from ..core.surface import SurfaceFootprint
+
+FOOTPRINT = SurfaceFootprint.from_widths(180.0, 1800.0)
+Z_DER = 30.0
+
+
+def survey(n=3000, seed=6):
+    rng = np.random.default_rng(seed)
+    along = rng.uniform(-300, 10_300, n)
+    cross = rng.uniform(-1000, 1000, n)
+    height = Z_DER + np.maximum(along, 0) * 0.02 * rng.uniform(0, 1.5, n)
+    height[::50] = Z_DER + np.maximum(along[::50], 0) * 0.012 + 3e-4  # sub-mm above 1.2 %
+    return along, cross, height
+
+
+@pytest.mark.parametrize("gradient", [0.012, 0.025, 0.033, 0.05])
+def test_sweep_matches_the_analysis(gradient):
+    along, cross, height = survey()
+    results = evaluate_obstacles(along, cross, height, FOOTPRINT, 10.0, 0.0, Z_DER, gradient)
+    sweep = gradient_sweep(along, results["height"], results["in_footprint"], Z_DER,
+                           [0.02, gradient, 0.04])
+    k = int(np.flatnonzero(sweep.gradients == gradient)[0])
+    critical = results["is_critical"]
+    assert sweep.penetrating[k] == np.count_nonzero(critical)
+    if not critical.any():
+        assert (sweep.worst_index[k], sweep.max_penetration[k]) == (-1, 0.0)
+        return
+    worst = int(np.argmax(np.where(critical, height - results["ocs_elevation"], -np.inf)))
+    assert sweep.worst_index[k] == worst
+    assert sweep.max_penetration[k] == results["penetration_m"][worst]
+
+
+def test_required_gradient_is_the_clearing_threshold():
+    along, cross, height = survey()
+    required = required_climb_gradient(along, height, Z_DER)
+    ahead = (along > 0) & (height > Z_DER)
+    for factor, expect_critical in ((0.999, True), (1.001, False)):
+        results = evaluate_obstacles(along[ahead], np.zeros(ahead.sum()), height[ahead],
+                                     FOOTPRINT, 0.0, 0.0, Z_DER, 0.0)
+        ocs = Z_DER + along[ahead] * required[ahead] * factor
+        assert ((height[ahead] - ocs > 0) == expect_critical).all()
+        assert results["in_footprint"].any()
+
+
+def test_required_gradient_edge_cases():
+    required = required_climb_gradient([100.0, -50.0, 0.0, 100.0], [20.0, 40.0, 40.0, 31.0], 30.0)
+    assert required.tolist() == [0.0, np.inf, np.inf, 0.01]
+    assert np.isnan(required_climb_gradient([-50.0, 0.0, 100.0], [np.nan] * 3, 30.0)).all()
+
+
+def test_controlling_obstacle_and_missing_ground():
+    along = np.array([1000.0, 2000.0, 3000.0])
+    elevation = np.array([np.nan, 30.0 + 2000 * 0.05, 30.0 + 3000 * 0.02])
+    sweep = gradient_sweep(along, elevation, [True, True, True], Z_DER, [0.012])
+    assert sweep.penetrating.tolist() == [2]
+    assert sweep.worst_index.tolist() == [1]
+    assert sweep.controlling_index == 1
+    assert sweep.controlling_gradient == pytest.approx(0.05)
+
+
+def test_missing_ground_behind_the_der_never_controls():
+    sweep = gradient_sweep([-50.0, 1000.0], [np.nan, 105.0], [True, True], 100.0, [0.012])
+    assert sweep.controlling_index == 1
+    assert sweep.controlling_gradient == pytest.approx(0.005)
+
+
+def test_nothing_in_the_footprint():
+    sweep = gradient_sweep([100.0], [500.0], [False], Z_DER, [0.012, 0.02])
+    assert sweep.penetrating.tolist() == [0, 0]
+    assert sweep.worst_index.tolist() == [-1, -1]
+    assert sweep.controlling_index == -1
+
+
+def test_gradient_range():
+    assert gradient_range(0.012, 0.02, 0.002).tolist() == [0.012, 0.014, 0.016, 0.018, 0.02]
+    with pytest.raises(ValueError):
+        gradient_range(0.02, 0.01, 0.001)
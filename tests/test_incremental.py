@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""``core.incremental``: an edited survey re-analysed in part equals a full run."""
+import numpy as np
+import pytest
+
+from ..core.incremental import (
+    ObstacleChanges, bearings, diff_obstacles, in_sectors, merge_state, obstacle_signatures,
+    shadow_sectors,
+)
+from ..core.obstacle_kernel import evaluate_obstacles
+from ..core.records import ObstacleRecords
+from ..core.surface import SurfaceFootprint
+
+FOOTPRINT = SurfaceFootprint.from_widths(180.0, 1800.0)
+ORIGIN = (0.0, 0.0, 20.0)
+
+
+def analyse(ids, x, y, height):
+    """Records of obstacles on a North-facing frame at the origin."""
+    results = evaluate_obstacles(y, x, height, FOOTPRINT, 10.0, 5.0, ORIGIN[2])
+    return ObstacleRecords.from_results(ids, x, y, results)
+
+
+def full_run(ids, x, y, height, tolerance):
+    records = analyse(ids, x, y, height)
+    records.set_shadows(*shadow_sectors(records, ORIGIN, tolerance))
+    return records
+
+
+def incremental_run(previous, ids, x, y, height, tolerance):
+    """The panel's incremental path (``TOFPA._analyze_projected_obstacles``)."""
+    signatures = obstacle_signatures(x, y, height)
+    changes = diff_obstacles(previous.records.ids, previous.signatures, ids, signatures)
+    fresh = changes.fresh
+    state = merge_state("key", previous, changes, signatures,
+                        analyse(ids[fresh], x[fresh], y[fresh], height[fresh]))
+    stale = np.concatenate((changes.changed_old, changes.removed))
+    touched = np.concatenate((bearings(x[fresh], y[fresh], *ORIGIN[:2]),
+                              bearings(previous.records.x[stale], previous.records.y[stale],
+                                       *ORIGIN[:2])))
+    state.records.set_shadows(*shadow_sectors(state.records, ORIGIN, tolerance, touched))
+    return state, changes
+
+
+def survey(rng, n):
+    ids = rng.permutation(n * 3)[:n].astype(np.int64) - n  # negative ids too
+    x = rng.uniform(-900, 900, n)
+    y = rng.uniform(0, 10_000, n)
+    height = 20.0 + y * rng.uniform(0.008, 0.03, n)
+    return ids, x, y, height
+
+
+def edit(rng, ids, x, y, height):
+    """A few edits, so only some angular sectors are touched.  Features keep
+    their order, as in a layer (the first shadowing obstacle depends on it)."""
+    n = len(ids)
+    keep = np.ones(n, dtype=bool)
+    keep[rng.choice(n, 2, replace=False)] = False                     # remove
+    ids, x, y, height = ids[keep], x[keep].copy(), y[keep].copy(), height[keep].copy()
+    moved, raised = rng.choice(len(ids), (2, 3), replace=False)
+    x[moved] += rng.uniform(-300, 300, 3)
+    height[raised] *= rng.uniform(0.8, 1.5, 3)
+    ids = np.concatenate((ids, ids.max() + 1 + rng.integers(0, 5, 1)))  # add, as a new fid
+    x = np.concatenate((x, rng.uniform(-900, 900, 1)))
+    y = np.concatenate((y, rng.uniform(0, 10_000, 1)))
+    height = np.concatenate((height, 20.0 + y[-1:] * 0.03))
+    return ids, x, y, height
+
+
+@pytest.mark.parametrize("tolerance", [0.0, 2.0, 5.0, 20.0])
+def test_incremental_run_equals_full_run(tolerance):
+    rng = np.random.default_rng(int(tolerance) + 1)
+    ids, x, y, height = survey(rng, 400)
+    first = full_run(ids, x, y, height, tolerance)
+    state = merge_state("key", None, ObstacleChanges.all_added(len(ids)),
+                        obstacle_signatures(x, y, height), first)
+    for _ in range(20):
+        ids, x, y, height = edit(rng, ids, x, y, height)
+        state, changes = incremental_run(state, ids, x, y, height, tolerance)
+        assert len(changes)
+        expected = full_run(ids, x, y, height, tolerance)
+        for name in ObstacleRecords.__slots__:
+            if name != "shadowed_by":
+                np.testing.assert_array_equal(getattr(state.records, name),
+                                              getattr(expected, name), err_msg=name)
+        assert [r.shadowed_by for r in state.records] == [r.shadowed_by for r in expected]
+
+
+def test_diff_obstacles():
+    old_ids = np.array([5, -1, 9, 3])
+    old_sig = obstacle_signatures([0.0, 1.0, 2.0, 3.0], [0.0] * 4, [10.0] * 4)
+    new_ids = np.array([9, 5, 7, -1])
+    new_sig = obstacle_signatures([2.0, 0.0, 4.0, 1.5], [0.0] * 4, [10.0] * 4)
+    changes = diff_obstacles(old_ids, old_sig, new_ids, new_sig)
+    assert changes.added.tolist() == [2]
+    assert (changes.changed.tolist(), changes.changed_old.tolist()) == ([3], [1])
+    assert changes.removed.tolist() == [3]
+    assert (changes.kept_new.tolist(), changes.kept_old.tolist()) == ([0, 1], [2, 0])
+    assert changes.fresh.tolist() == [2, 3]
+
+
+def test_signatures_see_every_column():
+    base = obstacle_signatures([1.0], [2.0], [3.0], [4.0])
+    assert base == obstacle_signatures([1.0], [2.0], [3.0], [4.0])
+    for changed in (([1.0 + 1e-12], [2.0], [3.0], [4.0]), ([1.0], [2.0], [np.nan], [4.0]),
+                    ([1.0], [2.0], [3.0], [4.5]), ([2.0], [1.0], [3.0], [4.0])):
+        assert obstacle_signatures(*changed) != base
+
+
+def test_in_sectors_wraps_around():
+    mask = in_sectors([179.0, -179.0, 0.0, 170.0], [-178.0], 5.0)
+    assert mask.tolist() == [True, True, False, False]
+    assert not in_sectors([10.0], [], 5.0).any()
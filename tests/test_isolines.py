@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""``core.isolines``: marching squares over analytic grids and tiled DTMs."""
+import numpy as np
+import pytest
+
+from ..core.isolines import IsolineBuilder, trace_clearance_isolines
+from ..core.surface import RunwayFrame
+from ..core.terrain import reference_line_distance
+from .reference import raster_tiles
+from .test_penetration import signed_area
+from .test_terrain import NODATA, SPACING, dtm, geometry
+
+GT = (500.0, 2.0, 0.0, 800.0, 0.0, -2.0)
+FRAME = RunwayFrame(0.0, 0.0, 0.0)
+
+
+def centres(shape, gt=GT):
+    rows, cols = np.mgrid[0:shape[0], 0:shape[1]]
+    return gt[0] + (cols + 0.5) * gt[1], gt[3] + (rows + 0.5) * gt[5]
+
+
+def trace(grid, levels, tile=None, gt=GT):
+    builder = IsolineBuilder(gt, levels, grid.shape[1])
+    if tile is None:
+        builder.add(grid, 0, 0)
+    else:
+        tiles, _read = raster_tiles(grid, gt, *tile, overlap=1)
+        for c, r, w, h in tiles:
+            builder.add(grid[r:r + h, c:c + w], r, c)
+    return builder.isolines(FRAME, 0.0)
+
+
+def canonical(lines):
+    """Order-independent form of a set of lines (closed ones from their lowest vertex)."""
+    out = []
+    for line in lines:
+        xy = [tuple(p) for p in np.round(line.coords[:, :2], 9)]
+        if line.is_closed:
+            ring = xy[:-1]
+            k = ring.index(min(ring))
+            xy = ring[k:] + ring[:k]
+        out.append((line.level, tuple(xy)))
+    return sorted(out)
+
+
+def test_cone_gives_one_closed_clockwise_circle():
+    xs, ys = centres((80, 90))
+    cx, cy, radius = 590.0, 720.0, 50.0
+    grid = radius - np.hypot(xs - cx, ys - cy)  # clearance > 0 inside
+    lines = trace(grid, [0.0])
+    assert len(lines) == 1 and lines[0].is_closed
+    r = np.hypot(lines[0].coords[:, 0] - cx, lines[0].coords[:, 1] - cy)
+    np.testing.assert_allclose(r, radius, atol=0.02)
+    assert signed_area(lines[0].coords) < 0  # above the level on the right
+
+
+def test_plane_gives_exact_open_line():
+    xs, _ys = centres((40, 30))
+    lines = trace(xs - 531.3, [0.0, 10.0])
+    assert [line.level for line in lines] == [0.0, 10.0]
+    for line, x in zip(lines, (531.3, 541.3)):
+        assert not line.is_closed
+        np.testing.assert_allclose(line.coords[:, 0], x)
+        assert len(line.coords) == 40  # one vertex per row of squares, plus the end
+
+
+@pytest.mark.parametrize("tile", [(7, 9), (16, 16), (33, 5)])
+def test_tiles_overlapping_by_one_cell_equal_one_grid(tile):
+    rng = np.random.default_rng(9)
+    grid = rng.normal(size=(60, 70)).cumsum(axis=0).cumsum(axis=1) / 10.0
+    grid[20:30, 30:45] = np.nan  # clipped cells
+    levels = [-2.0, 0.0, 3.5]
+    whole = trace(grid, levels)
+    assert len(whole) > 3
+    assert canonical(trace(grid, levels, tile)) == canonical(whole)
+
+
+def test_lines_follow_the_surface_elevation():
+    values, gt = dtm(seed=7)
+    surface = geometry()
+    tiles, read = raster_tiles(values, gt, 64, 64, overlap=1, nodata=NODATA)
+    lines = trace_clearance_isolines(
+        tiles, read, surface.frame, surface.footprint, surface.der_elevation, [0.0, -20.0],
+        gt, values.shape[1], vertical_tolerance=1.0, clip_buffer=SPACING * 1.5,
+    )
+    assert {line.level for line in lines} == {0.0, -20.0}
+    for line in lines:
+        along, cross = surface.frame.to_local(line.coords[:, 0], line.coords[:, 1])
+        expected = surface.der_elevation + reference_line_distance(along, cross) * 0.012
+        np.testing.assert_allclose(line.coords[:, 2], expected)
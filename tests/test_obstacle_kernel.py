@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""``core.obstacle_kernel``: the batch test against the per-feature semantics."""
+import numpy as np
+import pytest
+
+from ..core.obstacle_kernel import ObstaclePool, evaluate_obstacles
+from ..core.surface import RunwayFrame, SurfaceFootprint
+from .reference import _distance_along_axis, _ocs_elevation_at_distance, point
+
+FOOTPRINT = SurfaceFootprint.from_widths(180.0, 1800.0)
+DER_ELEVATION = 21.7
+GRADIENT = 0.012
+
+
+def single(along, cross, height, buffer_distance=10.0, min_height=5.0, ground=None):
+    """``ObstacleAnalyzer.analyze_single``: (is_critical, penetration_m), with
+    the obstacle at (*along*, *cross*) of a North-facing frame at the origin."""
+    obstacle_height = min_height if np.isnan(height) else max(float(height), min_height)
+    if ground is not None:
+        obstacle_height += ground
+    if not FOOTPRINT.contains(along, cross, buffer_distance):
+        return False, 0.0
+    d = _distance_along_axis(point(cross, along), point(0.0, 0.0), 0.0)
+    penetration_m = obstacle_height - _ocs_elevation_at_distance(d, DER_ELEVATION, GRADIENT)
+    return bool(penetration_m > 0), round(penetration_m, 3)
+
+
+def evaluate(along, cross, height, ground=None, **kwargs):
+    return evaluate_obstacles(np.asarray(along, float), np.asarray(cross, float),
+                              np.asarray(height, float), FOOTPRINT, 10.0, 5.0,
+                              DER_ELEVATION, GRADIENT, ground, **kwargs)
+
+
+@pytest.mark.parametrize("excess", [1e-4, 3e-4, 4.9e-4, 5e-4, 2e-3, 0.0, -1e-4, -4e-4])
+def test_criticality_uses_the_unrounded_excess(excess):
+    along = np.array([0.0, 1234.5, 8000.0, -5.0])
+    height = DER_ELEVATION + np.maximum(along, 0.0) * GRADIENT + excess
+    results = evaluate(along, np.zeros(4), height)
+    for i in range(4):
+        assert (bool(results["is_critical"][i]), results["penetration_m"][i]) == \
+            single(along[i], 0.0, height[i])
+
+
+def test_random_obstacles_match_the_per_feature_test():
+    rng = np.random.default_rng(8)
+    along = rng.uniform(-500, 10_500, 5000)
+    cross = rng.uniform(-1100, 1100, 5000)
+    ocs = DER_ELEVATION + np.maximum(along, 0.0) * GRADIENT
+    height = ocs + rng.choice([-1.0, 1.0], 5000) * rng.choice([1e-4, 4e-4, 1e-2, 20.0], 5000)
+    height[::97] = np.nan
+    ground = rng.choice([0.0, 0.0002, 3.0], 5000)
+
+    results = evaluate(along, cross, height - ground, ground)
+
+    expected = [single(a, c, h - g, ground=g)
+                for a, c, h, g in zip(along, cross, height, ground)]
+    assert results["is_critical"].tolist() == [e[0] for e in expected]
+    np.testing.assert_allclose(results["penetration_m"], [e[1] for e in expected], atol=1e-9)
+
+
+def test_no_ground_elevation_is_never_critical():
+    results = evaluate([100.0, 200.0], [0.0, 0.0], [500.0, 500.0], np.array([np.nan, 0.0]))
+    assert results["is_critical"].tolist() == [False, True]
+    assert np.isnan(results["penetration_m"][0])
+
+
+def test_outside_the_footprint_is_safe():
+    results = evaluate([5000.0, -50.0, 10_100.0], [2000.0, 0.0, 0.0], [900.0] * 3)
+    assert not results["in_footprint"].any()
+    assert not results["is_critical"].any()
+    assert results["penetration_m"].tolist() == [0.0, 0.0, 0.0]
+    assert np.isnan(results["required_gradient"]).all()
+
+
+def test_frame_and_kernel_agree_with_map_coordinates():
+    frame = RunwayFrame(1000.0, 2000.0, 71.0)
+    rng = np.random.default_rng(4)
+    xs, ys = 1000.0 + rng.uniform(-11_000, 11_000, (2, 400))
+    along, cross = frame.to_local(xs, ys)
+    der = point(1000.0, 2000.0)
+    expected = [_distance_along_axis(point(x, y), der, 71.0) for x, y in zip(xs, ys)]
+    np.testing.assert_allclose(along, expected, atol=1e-9)
+
+
+def test_pool_matches_inline_evaluation():
+    rng = np.random.default_rng(2)
+    n = 20_000
+    along = rng.uniform(-500, 10_500, n)
+    cross = rng.uniform(-1100, 1100, n)
+    height = DER_ELEVATION + np.maximum(along, 0.0) * GRADIENT + rng.uniform(-5, 5, n)
+    ground = rng.uniform(0, 2, n)
+    pool = ObstaclePool(workers=2, min_chunk=2000)
+    try:
+        pooled = pool.evaluate(along, cross, height, FOOTPRINT, 10.0, 5.0,
+                               DER_ELEVATION, GRADIENT, ground)
+    finally:
+        pool.close()
+    inline = evaluate(along, cross, height, ground)
+    for name, column in inline.items():
+        np.testing.assert_array_equal(pooled[name], column, err_msg=name)
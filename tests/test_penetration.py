@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""``core.penetration``: connected areas and their traced outlines."""
+from collections import deque
+
+import numpy as np
+import pytest
+
+from ..core.penetration import PenetrationCollector, label_cells, penetration_areas
+from ..core.terrain import RasterWindow, analyze_terrain
+from .reference import raster_tiles
+from .test_terrain import NODATA, dtm, geometry
+
+GT = (1000.0, 10.0, 0.0, 5000.0, 0.0, -10.0)
+
+
+def flood_labels(rows, cols):
+    """4-connected component of each cell, by breadth-first search."""
+    index = {(r, c): i for i, (r, c) in enumerate(zip(rows.tolist(), cols.tolist()))}
+    labels = [-1] * len(index)
+    components = 0
+    for start in range(len(labels)):
+        if labels[start] >= 0:
+            continue
+        labels[start] = components
+        queue = deque([start])
+        while queue:
+            i = queue.popleft()
+            r, c = rows[i], cols[i]
+            for cell in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+                j = index.get(cell)
+                if j is not None and labels[j] < 0:
+                    labels[j] = components
+                    queue.append(j)
+        components += 1
+    return np.array(labels)
+
+
+def signed_area(ring):
+    """Shoelace area of a closed ring."""
+    x, y = ring[:, 0], ring[:, 1]
+    return 0.5 * float(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1]))
+
+
+def random_cells(seed, shape=(60, 80), fill=0.45):
+    rng = np.random.default_rng(seed)
+    rows, cols = np.nonzero(rng.random(shape) < fill)
+    order = rng.permutation(len(rows))
+    return rows[order], cols[order]
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_labels_match_flood_fill(seed):
+    rows, cols = random_cells(seed, fill=0.3 + 0.05 * seed)
+    labels = label_cells(rows, cols)
+    expected = flood_labels(rows, cols)
+    # Same partition: the label pairs map one to one
+    pairs = set(zip(labels.tolist(), expected.tolist()))
+    assert len(pairs) == len(set(labels.tolist())) == len(set(expected.tolist()))
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_rings_enclose_exactly_the_area_cells(seed):
+    rows, cols = random_cells(seed)
+    penetration = np.random.default_rng(seed).uniform(0.01, 5.0, len(rows))
+    areas = penetration_areas(rows, cols, penetration, GT)
+    labels = flood_labels(rows, cols)
+    assert sorted(a.cell_count for a in areas) == sorted(np.bincount(labels).tolist())
+    cell_area = abs(GT[1] * GT[5])
+    for area in areas:
+        for ring in area.rings:
+            assert (ring[0] == ring[-1]).all()
+            # Vertices on cell corners
+            np.testing.assert_allclose(((ring - (GT[0], GT[3])) / (GT[1], GT[5])) % 1, 0)
+        exterior, *holes = [abs(signed_area(r)) for r in area.rings]
+        assert all(exterior > h for h in holes)
+        assert exterior - sum(holes) == pytest.approx(area.cell_count * cell_area)
+
+
+def test_area_statistics_and_hole():
+    # A 3 x 3 ring of cells around an empty centre, and a separate cell
+    rows = np.array([0, 0, 0, 1, 1, 2, 2, 2, 5])
+    cols = np.array([0, 1, 2, 0, 2, 0, 1, 2, 5])
+    penetration = np.array([1.0, 2.0, 1.0, 1.0, 7.0, 1.0, 1.0, 1.0, 0.5])
+    first, second = penetration_areas(rows, cols, penetration, GT)
+    assert (first.cell_count, first.max_penetration) == (8, 7.0)
+    assert first.mean_penetration == pytest.approx(15.0 / 8)
+    assert (first.worst_x, first.worst_y) == (1025.0, 4985.0)
+    assert len(first.rings) == 2
+    assert [abs(signed_area(r)) for r in first.rings] == [900.0, 100.0]
+    assert (second.cell_count, len(second.rings)) == (1, 1)
+
+
+def test_corner_touching_cells_are_separate_areas():
+    areas = penetration_areas([0, 1], [0, 1], [1.0, 1.0], GT)
+    assert [a.cell_count for a in areas] == [1, 1]
+
+
+def test_collector_gathers_tiles():
+    values, gt = dtm(seed=6)
+    surface = geometry()
+    tiles, read = raster_tiles(values, gt, 40, 70, nodata=NODATA)
+    collector = PenetrationCollector(gt)
+    args = (surface.frame, surface.footprint, surface.der_elevation, 0.0, 42.0)
+    for tile in tiles:
+        collector.add(analyze_terrain(read(tile), *args))
+    whole = analyze_terrain(RasterWindow(values, gt, NODATA), *args)
+    areas = collector.areas()
+    assert sum(a.cell_count for a in areas) == whole.penetration_count > 0
+    assert max(a.max_penetration for a in areas) == pytest.approx(whole.max_penetration)
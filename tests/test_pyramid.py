@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""``core.pyramid.MaxPyramid``: pruning never drops a penetrating cell."""
+import numpy as np
+import pytest
+
+from ..core.pyramid import MaxPyramid
+from ..core.terrain import RasterWindow, analyze_terrain, dtm_clip_buffer
+from .reference import raster_tiles
+from .test_terrain import NODATA, SPACING, dtm, geometry
+
+
+def build(values, gt, base, window, tile):
+    """Pyramid of the raster *window* ``(col_off, row_off, cols, rows)``, tile by tile."""
+    col_off, row_off, cols, rows = window
+    pyramid = MaxPyramid.empty(base, col_off, row_off, cols, rows, gt)
+    sub = values[row_off:row_off + rows, col_off:col_off + cols]
+    tiles, _read = raster_tiles(sub, gt, *tile)
+    for c, r, w, h in tiles:
+        pyramid.add_cells(col_off + c, row_off + r, sub[r:r + h, c:c + w], NODATA)
+    pyramid.build_levels()
+    return pyramid
+
+
+def test_block_maxima_and_levels():
+    values, gt = dtm(seed=4)
+    pyramid = build(values, gt, 16, (5, 3, 250, 240), (33, 70))
+    level0 = pyramid.levels[0]
+    clean = np.where(np.isfinite(values) & (values != NODATA), values, -np.inf)
+    for i in range(level0.shape[0]):
+        for j in range(level0.shape[1]):
+            r0, c0 = max(3, i * 16), max(5, j * 16)
+            block = clean[r0:min((i + 1) * 16, 243), c0:min((j + 1) * 16, 255)]
+            assert level0[i, j] == np.float32(block.max())
+    assert pyramid.levels[-1].shape == (1, 1)
+    assert pyramid.levels[-1][0, 0] == np.float32(clean[3:243, 5:255].max())
+
+
+@pytest.mark.parametrize("azimuth, tolerance", [(20.0, 0.0), (5.0, 5.0), (-20.0, 30.0)])
+@pytest.mark.parametrize("base", [8, 32])
+def test_pruning_keeps_every_penetrating_cell(azimuth, tolerance, base):
+    values, gt = dtm(seed=5)
+    surface = geometry(azimuth)
+    buffer = dtm_clip_buffer(SPACING)
+    args = (surface.frame, surface.footprint, surface.der_elevation, tolerance, buffer)
+    rows, cols = values.shape
+    pyramid = build(values, gt, base, (0, 0, cols, rows), (64, 64))
+
+    candidates = pyramid.candidates(*args)
+    mask = pyramid.cell_mask(candidates, 0, 0, cols, rows)
+    full = analyze_terrain(RasterWindow(values, gt, NODATA), *args)
+    pruned = analyze_terrain(RasterWindow(np.where(mask, values, NODATA), gt, NODATA), *args)
+
+    assert full.penetration_count > 0
+    np.testing.assert_array_equal(pruned.subset(pruned.penetrates).x, full.subset(full.penetrates).x)
+    np.testing.assert_array_equal(pruned.subset(pruned.penetrates).y, full.subset(full.penetrates).y)
+    assert pyramid.skipped_cells(candidates, 0, 0, cols, rows) == np.count_nonzero(~mask)
+    if tolerance == 0.0:
+        assert (~mask).any()  # something was pruned
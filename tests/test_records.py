@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""``core.records.ObstacleRecords``: flags, shadows and row views."""
+import pickle
+
+import numpy as np
+
+from ..core.records import CRITICAL, IN_FOOTPRINT, ObstacleRecords
+
+
+def records(ids):
+    n = len(ids)
+    return ObstacleRecords(ids, np.arange(n), np.arange(n), 10.0 + np.arange(n),
+                           np.full(n, IN_FOOTPRINT | CRITICAL), np.full(n, 1.5),
+                           np.full(n, 0.02))
+
+
+def test_negative_feature_ids_shadow():
+    # Uncommitted edit-buffer features have negative ids
+    store = records([-3, -4, 7])
+    store.set_shadows([0, 1, 2], [-1, 0, 1])
+    assert [r.shadow_status for r in store] == ["VISIBLE", "SHADOWED", "SHADOWED"]
+    assert [r.shadowed_by for r in store] == [None, -3, -4]
+    assert store.shadowed.tolist() == [False, True, True]
+
+
+def test_set_shadows_clears_previous_shadow():
+    store = records([1, 2])
+    store.set_shadows([1], [0])
+    assert store[1].shadowed_by == 1
+    store.set_shadows([1], [-1])
+    assert store[1].shadowed_by is None
+    assert not store[1].is_shadowed
+
+
+def test_from_results_flags():
+    results = {"in_footprint": np.array([True, True, False]),
+               "is_critical": np.array([True, False, False]),
+               "height": np.array([30.0, 20.0, 10.0]),
+               "penetration_m": np.array([2.0, -1.0, 0.0]),
+               "required_gradient": np.array([0.03, 0.01, np.nan])}
+    store = ObstacleRecords.from_results([5, 6, 7], [0, 1, 2], [0, 1, 2], results)
+    assert store.critical.tolist() == [True, False, False]
+    assert store.in_footprint.tolist() == [True, True, False]
+    assert [r.shadow_status for r in store] == ["VISIBLE", "NOT_APPLICABLE", "NOT_APPLICABLE"]
+    assert store[-1].id == 7
+
+
+def test_subset_put_and_pickle_keep_shadows():
+    store = records([-1, -2, -3, -4])
+    store.set_shadows([0, 1, 2, 3], [-1, 0, -1, 2])
+    part = store.subset(np.array([3, 1]))
+    assert [r.shadowed_by for r in part] == [-3, -1]
+
+    copy = pickle.loads(pickle.dumps(store))
+    target = ObstacleRecords.empty(4)
+    target.put(np.arange(4), copy)
+    assert [r.shadowed_by for r in target] == [None, -1, None, -3]
+    np.testing.assert_array_equal(target.ids, store.ids)
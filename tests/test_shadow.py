@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""``core.shadow.shadow_sweep`` gives the decisions of the pairwise scan."""
+import numpy as np
+import pytest
+
+from ..core import shadow
+from ..core.shadow import shadow_sweep
+from .reference import pairwise_shadows
+
+TOLERANCES = [0.0, 0.5, 1.0, 5.0, 17.3, 45.0, 90.0, 180.0, 360.0]
+
+
+def random_survey(rng, n: int, grid: bool):
+    """Obstacles around the origin; on a coarse integer grid *grid* makes
+    equal distances, bearings and heights (ties) common."""
+    if grid:
+        xs = rng.integers(-6, 7, n).astype(float)
+        ys = rng.integers(-6, 7, n).astype(float)
+        heights = rng.integers(0, 5, n).astype(float)
+    else:
+        xs = rng.uniform(-3000, 3000, n)
+        ys = rng.uniform(-3000, 3000, n)
+        heights = rng.uniform(0, 150, n)
+    ids = rng.integers(-3, n // 2 + 1, n)  # duplicated and negative ids too
+    return xs.tolist(), ys.tolist(), heights.tolist(), ids.tolist()
+
+
+@pytest.fixture(params=[512, 7, 1], ids=lambda block: f"block{block}")
+def block(request, monkeypatch):
+    """Targets swept per block: small blocks run most pairs through the tree."""
+    monkeypatch.setattr(shadow, "_BLOCK", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize("tolerance", TOLERANCES)
+def test_sweep_matches_pairwise_scan(tolerance, block):
+    rng = np.random.default_rng(int(tolerance * 10))
+    for survey in range(40):
+        survey_args = random_survey(rng, int(rng.integers(0, 60)), grid=survey % 2 == 0)
+        origin_z = float(rng.choice([0.0, 2.0, 200.0]))
+        expected = pairwise_shadows(*survey_args, 0.0, 0.0, origin_z, tolerance)
+        assert shadow_sweep(*survey_args, 0.0, 0.0, origin_z, tolerance) == expected
+
+
+def test_sweep_matches_pairwise_scan_on_larger_surveys(block):
+    rng = np.random.default_rng(2024)
+    for tolerance in (0.0, 2.0, 5.0, 30.0, 179.0):
+        survey_args = random_survey(rng, 400, grid=tolerance == 2.0)
+        assert (shadow_sweep(*survey_args, 10.0, -20.0, 5.0, tolerance)
+                == pairwise_shadows(*survey_args, 10.0, -20.0, 5.0, tolerance))
+
+
+def test_obstacles_across_the_south_bearing(block):
+    # Bearings either side of ±180°, origin above some of the obstacles
+    rng = np.random.default_rng(180)
+    for tolerance in (0.5, 5.0, 60.0):
+        n = 300
+        bearing = np.radians(180.0 + rng.uniform(-2 * tolerance, 2 * tolerance, n))
+        dist = rng.uniform(1, 3000, n)
+        survey_args = ((dist * np.sin(bearing)).tolist(), (dist * np.cos(bearing)).tolist(),
+                       rng.uniform(0, 150, n).tolist(), list(range(n)))
+        assert (shadow_sweep(*survey_args, 0.0, 0.0, 75.0, tolerance)
+                == pairwise_shadows(*survey_args, 0.0, 0.0, 75.0, tolerance))
+
+
+def test_obstacle_at_the_reference_point_never_shadows():
+    # Same bearing, taller and closer, but at zero distance
+    xs, ys, heights, ids = [0.0, 0.0], [0.0, 100.0], [50.0, 10.0], [1, 2]
+    assert shadow_sweep(xs, ys, heights, ids, 0.0, 0.0, 0.0) == [None, None]
+
+
+def test_shadowing_obstacle_is_first_in_input_order():
+    # Both closer, taller and within the cone; index 1 comes first
+    xs, ys = [0.0, 1.0, -1.0], [300.0, 100.0, 100.0]
+    heights, ids = [10.0, 40.0, 40.0], [7, 8, 9]
+    assert shadow_sweep(xs, ys, heights, ids, 0.0, 0.0, 0.0) == [1, None, None]
+    assert shadow_sweep(xs[::-1], ys[::-1], heights[::-1], ids, 0.0, 0.0, 0.0) == [None, None, 0]
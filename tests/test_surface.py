@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Point queries of ``core.surface``: elevation and footprint membership."""
+import numpy as np
+import pytest
+
+from ..core.surface import (
+    TOFPA_CLIMB_GRADIENT, RunwayFrame, SurfaceFootprint, surface_elevation_at,
+    surface_geometry,
+)
+from .reference import _distance_along_axis, _ocs_elevation_at_distance, make_params, point
+
+
+def outline_points(footprint: SurfaceFootprint, per_edge: int = 50) -> np.ndarray:
+    """``(along, cross)`` points on every edge of the footprint, corners included."""
+    corners = [(0.0, -footprint.near_half_width), (0.0, footprint.near_half_width),
+               (footprint.distance_to_max_width, footprint.max_half_width),
+               (footprint.length, footprint.max_half_width),
+               (footprint.length, -footprint.max_half_width),
+               (footprint.distance_to_max_width, -footprint.max_half_width)]
+    t = np.linspace(0.0, 1.0, per_edge)[:, None]
+    edges = [np.array(a) + t * (np.array(b) - np.array(a))
+             for a, b in zip(corners, corners[1:] + corners[:1])]
+    return np.concatenate(edges)
+
+
+@pytest.mark.parametrize("azimuth", [0.0, 37.5, 90.0, 211.0, -45.0])
+@pytest.mark.parametrize("gradient", [TOFPA_CLIMB_GRADIENT, 0.033])
+def test_surface_elevation_matches_scalar_ocs(azimuth, gradient):
+    rng = np.random.default_rng(7)
+    params = make_params(ze=35.2)
+    der_x, der_y = 4500.0, -1200.0
+    xs = der_x + rng.uniform(-12_000, 12_000, 2000)
+    ys = der_y + rng.uniform(-12_000, 12_000, 2000)
+
+    sample = surface_elevation_at(xs, ys, params, der_x, der_y, azimuth, gradient)
+
+    der = point(der_x, der_y)
+    along = [_distance_along_axis(point(x, y), der, azimuth) for x, y in zip(xs, ys)]
+    expected = [_ocs_elevation_at_distance(d, params.ze, gradient) for d in along]
+    np.testing.assert_allclose(sample.along, along, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(sample.elevation, expected, rtol=0, atol=1e-9)
+
+
+def test_surface_elevation_behind_der_is_der_elevation():
+    params = make_params(ze=50.0)
+    sample = surface_elevation_at([0.0, 0.0, 0.0], [-500.0, 0.0, 500.0], params, 0.0, 0.0, 0.0)
+    assert sample.elevation.tolist() == [50.0, 50.0, 50.0 + 500.0 * TOFPA_CLIMB_GRADIENT]
+    assert sample.inside.tolist() == [False, True, True]
+
+
+def test_surface_elevation_at_matches_geometry_elevation_at():
+    params = make_params(cwy_length=250.0, ze=12.0)
+    geometry = surface_geometry(params, 1000.0, 2000.0, 123.0)
+    der_x, der_y, _ = geometry.der
+    rng = np.random.default_rng(3)
+    xs, ys = rng.uniform(-10_000, 12_000, (2, 500))
+    a = surface_elevation_at(xs, ys, params, der_x, der_y, 123.0, buffer=10.0)
+    b = geometry.elevation_at(xs, ys, buffer=10.0)
+    np.testing.assert_array_equal(a.elevation, b.elevation)
+    np.testing.assert_array_equal(a.inside, b.inside)
+
+
+@pytest.mark.parametrize("widths", [(180.0, 1800.0), (300.0, 1200.0), (150.0, 150.0)])
+def test_contains_matches_distance_to(widths):
+    footprint = SurfaceFootprint.from_widths(*widths)
+    rng = np.random.default_rng(11)
+    along = rng.uniform(-1000, 11_000, 20_000)
+    cross = rng.uniform(-1500, 1500, 20_000)
+    np.testing.assert_array_equal(footprint.contains(along, cross),
+                                  footprint.distance_to(along, cross) <= 0)
+    for buffer in (10.0, 250.0):
+        np.testing.assert_array_equal(footprint.contains(along, cross, buffer),
+                                      footprint.distance_to(along, cross) <= buffer)
+
+
+@pytest.mark.parametrize("widths", [(180.0, 1800.0), (150.0, 150.0)])
+def test_boundary_points_are_inside(widths):
+    footprint = SurfaceFootprint.from_widths(*widths)
+    along, cross = outline_points(footprint).T
+    assert footprint.contains(along, cross).all()
+    assert (footprint.distance_to(along, cross) == 0).all()
+    assert footprint.contains(along, cross, 5.0).all()
+
+
+def test_points_just_outside_the_boundary():
+    footprint = SurfaceFootprint.from_widths(180.0, 1800.0)
+    eps = 1e-6
+    along = np.array([-eps, footprint.length + eps, 8000.0, 8000.0, 100.0])
+    cross = np.array([0.0, 0.0, footprint.max_half_width + eps,
+                      -footprint.max_half_width - eps,
+                      footprint.half_width_at(100.0) + 1.0])
+    assert not footprint.contains(along, cross).any()
+    distance = footprint.distance_to(along, cross)
+    assert (distance > 0).all()
+    np.testing.assert_allclose(distance[:4], eps, rtol=1e-3)
+    # 1 m outside the diverging edge, measured across it
+    np.testing.assert_allclose(distance[4], np.cos(np.arctan(footprint.divergence_ratio)))
+    assert footprint.contains(along, cross, 1.0).all()
+
+
+def test_buffered_contains_matches_outline_distance():
+    footprint = SurfaceFootprint.from_widths(180.0, 1800.0)
+    rng = np.random.default_rng(5)
+    along = rng.uniform(-300, 10_300, 3000)
+    cross = rng.uniform(-1200, 1200, 3000)
+    outline = outline_points(footprint, per_edge=4000)
+    nearest = np.array([np.hypot(outline[:, 0] - a, outline[:, 1] - c).min()
+                        for a, c in zip(along, cross)])
+    outside = ~footprint.contains(along, cross)
+    np.testing.assert_allclose(footprint.distance_to(along, cross)[outside],
+                               nearest[outside], atol=1.5)
+
+
+def test_frame_round_trip():
+    frame = RunwayFrame(100.0, -50.0, 301.0)
+    rng = np.random.default_rng(1)
+    xs, ys = rng.uniform(-5000, 5000, (2, 100))
+    back = frame.to_map(*frame.to_local(xs, ys))
+    np.testing.assert_allclose(back, (xs, ys), atol=1e-9)
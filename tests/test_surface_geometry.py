@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""``core.surface.surface_geometry`` against the ``QgsPoint.project`` construction."""
+import numpy as np
+import pytest
+
+from ..core._contour_utils import contour_elevations, contour_specs_for_takeoff
+from ..core.surface import (
+    TOFPA_CLIMB_GRADIENT, TOFPA_DIVERGENCE_RATIO, TOFPA_REF_LINE_HALF_WIDTH,
+    TOFPA_SURFACE_LENGTH, surface_geometry,
+)
+from .reference import make_params, project
+
+
+def projected_surface(params, x, y, azimuth):
+    """Outline, reference line and contours built point by point, as the
+    plugin did before ``core.surface``."""
+    ze = params.ze
+    near, far = params.width_tofpa / 2, params.max_width_tofpa / 2
+    d_max = (far - near) / TOFPA_DIVERGENCE_RATIO
+    z_max = ze + d_max * TOFPA_CLIMB_GRADIENT
+    z_end = ze + TOFPA_SURFACE_LENGTH * TOFPA_CLIMB_GRADIENT
+
+    pt_01D = project(x, y, params.cwy_length, azimuth)
+    pt_01DL = (*project(*pt_01D, near, azimuth + 90), ze)
+    pt_01DR = (*project(*pt_01D, near, azimuth - 90), ze)
+    pt_02D = project(*pt_01D, d_max, azimuth)
+    pt_02DL = (*project(*pt_02D, far, azimuth + 90), z_max)
+    pt_02DR = (*project(*pt_02D, far, azimuth - 90), z_max)
+    pt_03D = project(*pt_01D, TOFPA_SURFACE_LENGTH, azimuth)
+    pt_03DL = (*project(*pt_03D, far, azimuth + 90), z_end)
+    pt_03DR = (*project(*pt_03D, far, azimuth - 90), z_end)
+    outline = [pt_03DR, pt_03DL, pt_02DL, pt_01DL, pt_01DR, pt_02DR]
+    reference = [(*project(*pt_01D, TOFPA_REF_LINE_HALF_WIDTH, azimuth + 90), ze),
+                 (*project(*pt_01D, TOFPA_REF_LINE_HALF_WIDTH, azimuth - 90), ze)]
+
+    contours = []
+    if params.contour_interval_m > 0:
+        specs = contour_specs_for_takeoff(
+            z_start=ze, slope_ratio=TOFPA_CLIMB_GRADIENT, distance_to_max_width=d_max,
+            surface_length=TOFPA_SURFACE_LENGTH, near_half_width=near, max_half_width=far,
+            divergence_ratio=TOFPA_DIVERGENCE_RATIO,
+            elevations=contour_elevations(ze, z_end, params.contour_interval_m),
+        )
+        for spec in specs:
+            centre = project(*pt_01D, spec.distance_from_origin, azimuth)
+            contours.append([(*project(*centre, spec.half_width, azimuth + 90), spec.elevation),
+                             (*project(*centre, spec.half_width, azimuth - 90), spec.elevation)])
+    return pt_01D, np.array(outline), np.array(reference), np.array(contours).reshape(-1, 2, 3)
+
+
+@pytest.mark.parametrize("azimuth", [0.0, 12.3, 90.0, 179.9, 270.0, -33.0])
+@pytest.mark.parametrize("changes", [
+    {},
+    {"cwy_length": 400.0, "ze": 103.4, "contour_interval_m": 10},
+    {"width_tofpa": 300.0, "max_width_tofpa": 1200.0, "contour_interval_m": 7},
+    {"width_tofpa": 150.0, "max_width_tofpa": 150.0, "contour_interval_m": 25},
+])
+def test_vertices_match_projected_construction(azimuth, changes):
+    params = make_params(**changes)
+    x, y = 345_678.9, 4_123_456.7
+    der, outline, reference, contours = projected_surface(params, x, y, azimuth)
+
+    geometry = surface_geometry(params, x, y, azimuth)
+
+    np.testing.assert_allclose(geometry.der[:2], der, rtol=0, atol=1e-6)
+    np.testing.assert_allclose(geometry.outline, outline, rtol=0, atol=1e-6)
+    np.testing.assert_allclose(geometry.reference_line, reference, rtol=0, atol=1e-6)
+    assert geometry.contours.shape == contours.shape
+    np.testing.assert_allclose(geometry.contours, contours, rtol=0, atol=1e-6)
+
+
+def test_no_contours_when_disabled():
+    geometry = surface_geometry(make_params(contour_interval_m=0), 0.0, 0.0, 45.0)
+    assert geometry.contours.shape == (0, 2, 3)
+
+
+def test_extent_covers_outline():
+    geometry = surface_geometry(make_params(), 1000.0, 1000.0, 60.0)
+    xmin, ymin, xmax, ymax = geometry.extent(10.0)
+    assert xmin == geometry.outline[:, 0].min() - 10.0
+    assert ymax == geometry.outline[:, 1].max() + 10.0
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""``core.terrain``: the model's per-cell fields, tiled and parallel runs."""
+import numpy as np
+import pytest
+
+from ..core.surface import surface_geometry
+from ..core.terrain import (
+    RasterWindow, TerrainSummary, analyze_terrain, analyze_terrain_parallel,
+    analyze_terrain_surfaces, analyze_terrain_tiled, clearance_grid, dtm_clip_buffer,
+    qgis_round,
+)
+from .reference import make_params, polygon_distance, raster_tiles, segment_distance
+
+SPACING = 30.0
+NODATA = -32768.0
+
+
+def dtm(seed=0, rows=260, cols=300, x0=-4000.0, y0=11_000.0):
+    """Rough terrain with a ridge crossing the surface and a NODATA patch."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:rows, 0:cols]
+    values = 40.0 + 120.0 * np.exp(-((xx - cols / 2) ** 2) / 800.0) + rng.uniform(0, 30, (rows, cols))
+    values[100:120, 40:60] = NODATA
+    values[5, 5] = np.nan
+    return values, (x0 + 0.37, SPACING, 0.0, y0 + 0.61, 0.0, -SPACING)
+
+
+def geometry(azimuth=20.0):
+    return surface_geometry(make_params(ze=50.0), 0.0, 0.0, azimuth)
+
+
+def test_fields_match_the_model():
+    values, gt = dtm()
+    surface = geometry()
+    buffer = dtm_clip_buffer(SPACING)
+    result = analyze_terrain(RasterWindow(values, gt, NODATA), surface.frame, surface.footprint,
+                             surface.der_elevation, vertical_tolerance=2.5, clip_buffer=buffer)
+
+    xs, ys = RasterWindow(values, gt).cell_centres()
+    kept = (polygon_distance(xs, ys, surface.outline) <= buffer) & np.isfinite(values) \
+        & (values != NODATA)
+    assert len(result) == np.count_nonzero(kept)
+    np.testing.assert_array_equal(result.x, xs[kept])
+    np.testing.assert_array_equal(result.value, values[kept])
+
+    # Field calculators of model/TOFPA_analysis.model3
+    elev = qgis_round(values[kept], 3) + 2.5
+    x_dist = qgis_round(segment_distance(xs[kept], ys[kept], *surface.reference_line), 3)
+    surface_z = surface.der_elevation + x_dist * 0.012
+    clearance = qgis_round(surface_z - elev, 3)
+    np.testing.assert_allclose(result.elev, elev, atol=1e-9)
+    np.testing.assert_allclose(result.x_dist, x_dist, atol=1e-9)
+    np.testing.assert_allclose(result.clearance, clearance, atol=1e-9)
+    np.testing.assert_array_equal(result.penetrates, result.clearance < 0)
+    assert 0 < result.penetration_count < len(result)
+
+
+def test_qgis_round_is_half_away_from_zero():
+    assert qgis_round([0.0005, -0.0005, 2.5e-3, 1.2344], 3).tolist() == [0.001, -0.001, 0.003, 1.234]
+
+
+@pytest.mark.parametrize("tile", [(64, 64), (37, 300), (260, 41)])
+def test_tiled_and_parallel_runs_equal_one_window(tile):
+    values, gt = dtm(seed=1)
+    surface = geometry(-35.0)
+    args = (surface.frame, surface.footprint, surface.der_elevation, 1.0, dtm_clip_buffer(SPACING))
+    whole = analyze_terrain(RasterWindow(values, gt, NODATA), *args)
+    tiles, read = raster_tiles(values, gt, *tile, nodata=NODATA)
+
+    parts = []
+    tiled = analyze_terrain_tiled((read(t) for t in tiles), *args, on_tile=parts.append)
+    cells = np.concatenate([np.column_stack((p.x, p.y, p.clearance)) for p in parts])
+    order = np.lexsort((cells[:, 0], -cells[:, 1]))  # back to row-major
+    np.testing.assert_array_equal(cells[order], np.column_stack((whole.x, whole.y, whole.clearance)))
+
+    expected = TerrainSummary()
+    expected.update(whole)
+    for summary in (tiled, analyze_terrain_parallel(tiles, read, *args, workers=3)):
+        assert (summary.total_cells, summary.penetrating_cells, summary.min_clearance) == \
+            (expected.total_cells, expected.penetrating_cells, expected.min_clearance)
+        assert (summary.worst_x, summary.worst_y) == (expected.worst_x, expected.worst_y)
+
+
+def test_several_surfaces_equal_separate_runs():
+    values, gt = dtm(seed=2)
+    surfaces = [geometry(10.0), geometry(190.0), surface_geometry(make_params(ze=80.0),
+                                                                  40_000.0, 0.0, 0.0)]
+    tiles, read = raster_tiles(values, gt, 50, 50, nodata=NODATA)
+    buffer = dtm_clip_buffer(SPACING)
+    seen = []
+    summaries = analyze_terrain_surfaces(tiles, read, surfaces, 1.0, buffer, workers=2,
+                                         on_tile=lambda k, r: seen.append(k), geotransform=gt)
+    for surface, summary in zip(surfaces, summaries):
+        alone = analyze_terrain_parallel(tiles, read, surface.frame, surface.footprint,
+                                         surface.der_elevation, 1.0, buffer)
+        assert summary == alone
+    assert summaries[2].total_cells == 0 and 2 not in seen
+
+
+def test_clearance_grid_matches_rounded_clearance():
+    values, gt = dtm(seed=3)
+    surface = geometry()
+    window = RasterWindow(values, gt, NODATA)
+    args = (surface.frame, surface.footprint, surface.der_elevation, 0.5, 40.0)
+    grid = clearance_grid(window, *args)
+    result = analyze_terrain(window, *args)
+    kept = np.isfinite(grid)
+    assert np.count_nonzero(kept) == len(result)
+    np.testing.assert_allclose(grid[kept], result.clearance, atol=2e-3)
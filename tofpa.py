@@ -21,11 +21,16 @@ from .utils.compat import FIELD_INT, FIELD_STRING, FIELD_DOUBLE, DOCK_RIGHT  # M
 from qgis.core import (QgsProject, QgsVectorLayer, QgsFeature, QgsGeometry,
                       QgsPoint, QgsPointXY, QgsField, QgsPolygon, QgsLineString, Qgis,
                       QgsFillSymbol, QgsLineSymbol, QgsMarkerSymbol, QgsVectorFileWriter, QgsCoordinateTransform,
-                      QgsCoordinateReferenceSystem, QgsWkbTypes,
-                      QgsPalLayerSettings, QgsVectorLayerSimpleLabeling)
+                      QgsCoordinateReferenceSystem, QgsWkbTypes, QgsFeatureRequest, QgsRectangle,
+                      QgsPalLayerSettings, QgsVectorLayerSimpleLabeling,
+                      QgsProcessingUtils, QgsRasterLayer, QgsApplication,
+                      QgsVectorLayerFeatureSource)
 
 import logging
 import os.path
+from typing import Optional
+
+import numpy as np
 
 # Import the dockwidget with error handling
 try:
@@ -42,25 +47,74 @@ except ImportError as e:
 # Module logger
 logger = logging.getLogger('TOFPA')
 
+try:
+    from .processing_provider import TofpaProvider
+except ImportError:
+    from processing_provider import TofpaProvider
+
 # Core modules — imported with relative/absolute fallback for QGIS plugin compatibility
 try:
-    from .core.models import ObstacleParams, TofpaParams
-    from .core.obstacles import ObstacleAnalyzer
-    from .core._contour_utils import contour_elevations, contour_specs_for_takeoff
+    from .core.models import ObstacleParams, TerrainParams, TofpaParams
+    from .core.obstacles import (
+        FeatureAccumulator, ObstacleAnalyzer, ObstacleProjection, ObstacleProjectionCache,
+        SurfaceContext, obstacle_base_point,
+    )
+    from .core.surface import (  # ICAO Doc 8168 — TOFPA AOC Type A surface constants
+        TOFPA_CLIMB_GRADIENT, RunwayFrame, SurfaceFootprint, surface_geometry,
+    )
+    from .core.terrain import analyze_terrain_parallel, analyze_terrain_surfaces, dtm_clip_buffer
+    from .core.aerodrome import evaluate_runway_ends, runway_ends
+    from .core.gradient import gradient_sweep
+    from .core.obstacle_kernel import ObstaclePool
+    from .core.records import ObstacleRecords
+    from .core.incremental import (
+        ObstacleChanges, bearings, diff_obstacles, merge_state, obstacle_signatures,
+        shadow_sectors,
+    )
+    from .core.penetration import PenetrationCollector
+    from .core.isolines import trace_clearance_isolines
+    from .core.dtm import (
+        ClearanceRasterWriter, DtmWindowCache, TileReader,
+        max_pyramid, open_dtm, open_dtm_mosaic, sample_dtm, surfaces_tile_reader, tile_offsets,
+        window_offsets,
+    )
     from .utils.export import generate_aixm_file
+    from .utils.features import (
+        contour_features, contour_fields, qgs_points, reference_line_feature, reference_line_fields,
+        surface_feature, surface_fields, terrain_features, terrain_fields,
+    )
+    from .utils.task import TaskCanceled, TofpaTask
 except ImportError:
-    from core.models import ObstacleParams, TofpaParams
-    from core.obstacles import ObstacleAnalyzer
-    from core._contour_utils import contour_elevations, contour_specs_for_takeoff
+    from core.models import ObstacleParams, TerrainParams, TofpaParams
+    from core.obstacles import (
+        FeatureAccumulator, ObstacleAnalyzer, ObstacleProjection, ObstacleProjectionCache,
+        SurfaceContext, obstacle_base_point,
+    )
+    from core.surface import (  # ICAO Doc 8168 — TOFPA AOC Type A surface constants
+        TOFPA_CLIMB_GRADIENT, RunwayFrame, SurfaceFootprint, surface_geometry,
+    )
+    from core.terrain import analyze_terrain_parallel, analyze_terrain_surfaces, dtm_clip_buffer
+    from core.aerodrome import evaluate_runway_ends, runway_ends
+    from core.gradient import gradient_sweep
+    from core.obstacle_kernel import ObstaclePool
+    from core.records import ObstacleRecords
+    from core.incremental import (
+        ObstacleChanges, bearings, diff_obstacles, merge_state, obstacle_signatures,
+        shadow_sectors,
+    )
+    from core.penetration import PenetrationCollector
+    from core.isolines import trace_clearance_isolines
+    from core.dtm import (
+        ClearanceRasterWriter, DtmWindowCache, TileReader,
+        max_pyramid, open_dtm, open_dtm_mosaic, sample_dtm, surfaces_tile_reader, tile_offsets,
+        window_offsets,
+    )
     from utils.export import generate_aixm_file
-
-# ---------------------------------------------------------------------------
-# ICAO Doc 8168 — TOFPA AOC Type A surface constants
-# ---------------------------------------------------------------------------
-TOFPA_DIVERGENCE_RATIO: float = 0.125    # 12.5% semi-width divergence per metre forward
-TOFPA_CLIMB_GRADIENT: float = 0.012     # 1.2% climb gradient
-TOFPA_SURFACE_LENGTH: float = 10_000.0  # Standard surface length in metres
-TOFPA_REF_LINE_HALF_WIDTH: float = 3_000.0  # Reference line half-width in metres
+    from utils.features import (
+        contour_features, contour_fields, qgs_points, reference_line_feature, reference_line_fields,
+        surface_feature, surface_fields, terrain_features, terrain_fields,
+    )
+    from utils.task import TaskCanceled, TofpaTask
 
 
 class TOFPA:
@@ -73,6 +127,15 @@ class TOFPA:
         self.menu = self.tr(u'&TOFPA')
         self.first_start = True
         self.panel = None
+        # Survey obstacles projected per runway end, dropped when a layer is edited
+        self._obstacle_projections = ObstacleProjectionCache()
+        # Last batch run per obstacles layer: (ObstacleRunState, layers_info)
+        self._obstacle_runs: dict = {}
+        # Calculation running in the background (utils.task.TofpaTask)
+        self._task = None
+        # Worker processes for large obstacle sets, started on first use
+        self._obstacle_pool = ObstaclePool()
+        self.provider = None
 
     def tr(self, message):
         """Get the translation for a string using Qt translation API."""
@@ -110,7 +173,13 @@ class TOFPA:
         self.actions.append(action)
         return action
 
+    def initProcessing(self) -> None:
+        """Register the Processing provider; ``qgis_process`` calls this without a GUI."""
+        self.provider = TofpaProvider()
+        QgsApplication.processingRegistry().addProvider(self.provider)
+
     def initGui(self) -> None:
+        self.initProcessing()
         icon_path = os.path.join(self.plugin_dir, 'icon.png')
         self.add_action(
             icon_path,
@@ -123,10 +192,21 @@ class TOFPA:
         for action in self.actions:
             self.iface.removePluginMenu(self.tr(u'&TOFPA'), action)
             self.iface.removeToolBarIcon(action)
+        if self._task is not None:
+            # The worker uses the pool and caches released below
+            if not self._task.abandon():
+                logger.warning("TOFPA calculation still running at unload")
+            self._task = None
         # Remove the panel if it's open
         if self.panel:
             self.iface.removeDockWidget(self.panel)
             self.panel = None
+        self._obstacle_projections.clear()
+        self._obstacle_runs.clear()
+        self._obstacle_pool.close()
+        if self.provider is not None:
+            QgsApplication.processingRegistry().removeProvider(self.provider)
+            self.provider = None
 
     def show_panel(self) -> None:
         """Toggle the TOFPA dockwidget panel (show/hide)."""
@@ -135,6 +215,7 @@ class TOFPA:
             self.panel = TofpaDockWidget(self.iface)
             self.iface.addDockWidget(DOCK_RIGHT, self.panel)
             self.panel.calculateClicked.connect(self.on_calculate)
+            self.panel.cancelClicked.connect(self.on_cancel)
             self.panel.closeClicked.connect(self.on_close_panel)
             self.panel.show()
             self.panel.raise_()
@@ -193,15 +274,74 @@ class TOFPA:
         return False
 
     def on_calculate(self) -> None:
-        """Build parameter dataclasses from the UI and trigger surface calculation."""
+        """Build parameter dataclasses from the UI and start the surface calculation.
+
+        The calculation runs as a background task; the panel reports its
+        progress and its Calculate button cancels it meanwhile.
+        """
+        if self._task is not None:
+            return
         raw = self.panel.get_parameters()
         tofpa_params = TofpaParams.from_dict(raw)
-        obs_params = ObstacleParams.from_dict(raw)
-        success = self.create_tofpa_surface(tofpa_params, obs_params)
-        if success:
+        try:
+            obs_params = ObstacleParams.from_dict(raw)
+            terrain_params = TerrainParams.from_dict(raw)
+        except ValueError as e:
+            self.iface.messageBar().pushMessage("Error", str(e), level=Qgis.Critical)
+            return
+        if tofpa_params.aerodrome_batch:
+            self.create_aerodrome_surfaces(tofpa_params, obs_params, terrain_params)
+        else:
+            self.create_tofpa_surface(tofpa_params, obs_params, terrain_params)
+
+    def on_cancel(self) -> None:
+        """Cancel the running calculation; its layers are discarded."""
+        if self._task is not None:
+            self._task.cancel()
+
+    def _start_task(self, task: TofpaTask) -> None:
+        """Run *task* on the QGIS task manager, reporting progress in the panel."""
+        self._task = task
+        if self.panel:
+            self.panel.set_running(True)
+            task.progressChanged.connect(self.panel.set_progress)
+            task.stageChanged.connect(self.panel.set_stage)
+        QgsApplication.taskManager().addTask(task)
+
+    def _end_task(self, task: TofpaTask, ok: bool) -> bool:
+        """Release the panel once *task* ends; True when its results can be committed.
+
+        Cancelled and failed runs are reported here and leave the project
+        untouched.
+        """
+        self._task = None
+        if self.panel:
+            self.panel.set_running(False)
+        if task.canceled:
+            self.iface.messageBar().pushMessage(
+                "TOFPA:", "Calculation cancelled", level=Qgis.Info
+            )
+            return False
+        if not ok:
             self.iface.messageBar().pushMessage(
-                "TOFPA:", "TakeOff Climb Surface Calculation Finished", level=Qgis.Success
+                "Error", f"TOFPA calculation failed: {task.error}", level=Qgis.Critical
             )
+            return False
+        return True
+
+    def _report_finished(self) -> None:
+        self.iface.messageBar().pushMessage(
+            "TOFPA:", "TakeOff Climb Surface Calculation Finished", level=Qgis.Success
+        )
+
+    def _warn_failed(self, analysis: str, error: Exception) -> None:
+        """Report a failed optional *analysis*; the rest of the run goes on."""
+        logger.warning("%s failed: %s", analysis, error)
+        self.iface.messageBar().pushMessage(
+            "Warning",
+            f"{analysis} failed: {str(error)}",
+            level=Qgis.Warning
+        )
 
     def get_single_feature(self, layer, use_selected_feature, feature_type="feature"):
         """
@@ -267,8 +407,19 @@ class TOFPA:
             errors.append("No threshold layer selected")
         return errors
 
-    def create_tofpa_surface(self, params: TofpaParams, obs_params: ObstacleParams) -> bool:
-        """Create the TOFPA AOC Type A surface and add it to the QGIS map. Returns True on success."""
+    def create_tofpa_surface(
+        self,
+        params: TofpaParams,
+        obs_params: ObstacleParams,
+        terrain_params: Optional[TerrainParams] = None,
+    ) -> bool:
+        """Create the TOFPA AOC Type A surface and add it to the QGIS map.
+
+        Inputs are validated and read here; the surface, obstacle and
+        terrain stages then run in a background ``utils.task.TofpaTask`` and
+        their layers are added to the project when it finishes.  Returns
+        True once the task is started.
+        """
         # Validate before touching QGIS
         errors = self._validate_params(params)
         if errors:
@@ -364,73 +515,367 @@ class TOFPA:
         logger.debug("Parameters - Width: %s, Max Width: %s", width_tofpa, max_width_tofpa)
         logger.debug("CWY Length: %s, Z0: %s, ZE: %s", cwy_length, z0, ze)
         
-        list_pts = []
-        # Origin (from original script)
-        pt_0D = new_geom
-        
-        # Distance for surface start (from original script)
-        if cwy_length == 0:
-            dD = 0  # there is a condition to use the runway strip to analyze
-        else:
-            dD = cwy_length
-        logger.debug("dD (distance for surface start): %s", dD)
-        
-        # Calculate all points for the TOFPA surface using PROJECT method (ORIGINAL LOGIC)
-        # First project backward from threshold to get the start point (if CWY length > 0)
-        pt_01D = new_geom.project(dD, azimuth)  # Project from threshold by CWY length in the direction of the flight
-        pt_01D.setZ(ze)
+        # Surface, reference line and contour vertices (core.surface kernel)
+        geometry = surface_geometry(params, new_geom.x(), new_geom.y(), azimuth)
+        pt_01D = QgsPoint(*geometry.der)
+        ref_line_left, ref_line_right = qgs_points(geometry.reference_line)
         logger.debug("pt_01D (start point): %s, %s, %s", pt_01D.x(), pt_01D.y(), pt_01D.z())
-        pt_01DL = pt_01D.project(width_tofpa/2, azimuth+90)  # Use azimuth for perpendicular direction
-        pt_01DL.setZ(pt_01D.z())  # QgsPoint.project() returns 2D point; restore Z explicitly
-        pt_01DR = pt_01D.project(width_tofpa/2, azimuth-90)  # Use azimuth for perpendicular direction
-        pt_01DR.setZ(pt_01D.z())
-        
-        # Distance to reach maximum width (from original script - ALL use azimuth for forward projection)
-        pt_02D = pt_01D.project(((max_width_tofpa/2-width_tofpa/2)/TOFPA_DIVERGENCE_RATIO), azimuth)
-        pt_02D.setZ(ze+((max_width_tofpa/2-width_tofpa/2)/TOFPA_DIVERGENCE_RATIO)*TOFPA_CLIMB_GRADIENT)
-        pt_02DL = pt_02D.project(max_width_tofpa/2, azimuth+90)  # Use azimuth for perpendicular
-        pt_02DL.setZ(pt_02D.z())  # QgsPoint.project() returns 2D point; restore Z explicitly
-        pt_02DR = pt_02D.project(max_width_tofpa/2, azimuth-90)  # Use azimuth for perpendicular
-        pt_02DR.setZ(pt_02D.z())
-        
-        # Distance to end of TakeOff Climb Surface (from original script - ALL use azimuth for forward projection)
-        pt_03D = pt_01D.project(TOFPA_SURFACE_LENGTH, azimuth)
-        pt_03D.setZ(ze+TOFPA_SURFACE_LENGTH*TOFPA_CLIMB_GRADIENT)
-        pt_03DL = pt_03D.project(max_width_tofpa/2, azimuth+90)  # Use azimuth for perpendicular
-        pt_03DL.setZ(pt_03D.z())  # QgsPoint.project() returns 2D point; restore Z explicitly
-        pt_03DR = pt_03D.project(max_width_tofpa/2, azimuth-90)  # Use azimuth for perpendicular
-        pt_03DR.setZ(pt_03D.z())
-        
-        list_pts.extend((pt_0D, pt_01D, pt_01DL, pt_01DR, pt_02D, pt_02DL, pt_02DR, pt_03D, pt_03DL, pt_03DR))
-        
-        # Create reference line perpendicular to trajectory at start point (3000m each side)
-        # The start point depends on whether CWY exists or not
-        reference_start_point = pt_01D  # This is the calculated start point (considers CWY)
-        
-        # Create points 3000m on each side perpendicular to the azimuth
-        ref_line_left = reference_start_point.project(TOFPA_REF_LINE_HALF_WIDTH, azimuth+90)  # 3000m to the left
-        ref_line_right = reference_start_point.project(TOFPA_REF_LINE_HALF_WIDTH, azimuth-90)  # 3000m to the right
-        
-        # Set same elevation as start point
-        ref_line_left.setZ(reference_start_point.z())
-        ref_line_right.setZ(reference_start_point.z())
-        
         logger.debug("Reference line left point: %s, %s, %s", ref_line_left.x(), ref_line_left.y(), ref_line_left.z())
         logger.debug("Reference line right point: %s, %s, %s", ref_line_right.x(), ref_line_right.y(), ref_line_right.z())
         
+        # Layers, selections and caches are read here, on the main thread;
+        # the stages below only use what is captured now
+        obstacle_inputs = None
+        if include_obstacles and obstacles_layer_id:
+            try:
+                obstacle_inputs = self._obstacle_inputs(
+                    obs_params, use_selected_feature, geometry.frame
+                )
+            except Exception as e:
+                self._warn_failed("Obstacles analysis", e)
+        dtm_inputs = None
+        if terrain_params is not None and terrain_params.include_terrain and terrain_params.dtm_layer_id:
+            try:
+                dtm_inputs = self._dtm_inputs(terrain_params)
+            except Exception as e:
+                self._warn_failed("Terrain analysis", e)
+
+        results = {}
+
+        def _surface(task) -> None:
+            results["surface_layers"] = self._add_surface_layers(
+                task, map_srid, [geometry], params.contour_interval_m
+            )
+
+        def _obstacles(task) -> None:
+            try:
+                results["obstacles"] = self.process_survey_obstacles(
+                    obs_params,
+                    obstacle_inputs,
+                    results["surface_layers"][1],  # TOFPA surface for intersection analysis
+                    task,
+                    der_point=pt_01D,
+                    der_elevation=ze,
+                    takeoff_azimuth=azimuth,
+                    climb_gradient=TOFPA_CLIMB_GRADIENT,
+                    footprint=geometry.footprint,
+                )
+            except TaskCanceled:
+                raise
+            except Exception as e:
+                results["obstacles"] = e
+
+        # Terrain (DTM) penetration analysis — native TOFPA_analysis model
+        def _terrain(task) -> None:
+            try:
+                results["terrain"] = self.process_terrain(
+                    terrain_params,
+                    dtm_inputs,
+                    results["surface_layers"][1],
+                    task,
+                    der_point=pt_01D,
+                    der_elevation=ze,
+                    takeoff_azimuth=azimuth,
+                    footprint=geometry.footprint,
+                    climb_gradient=TOFPA_CLIMB_GRADIENT,
+                )
+            except TaskCanceled:
+                raise
+            except Exception as e:
+                results["terrain"] = e
+
+        stages = [("Building the surface", 1, _surface)]
+        if obstacle_inputs is not None:
+            stages.append(("Analysing obstacles", 4, _obstacles))
+        if dtm_inputs is not None:
+            stages.append(("Analysing terrain", 4, _terrain))
+
+        def _finished(task, ok) -> None:
+            if not self._end_task(task, ok):
+                return
+            ref_layer, v_layer = results["surface_layers"][:2]
+            QgsProject.instance().addMapLayers(results["surface_layers"])
+
+            obstacles_layers = []
+            obstacles_info = results.get("obstacles")
+            if obstacles_info is not None:
+                try:
+                    if isinstance(obstacles_info, Exception):
+                        raise obstacles_info
+                    self._commit_obstacles(obs_params, obstacle_inputs, obstacles_info)
+                    obstacles_layers = obstacles_info['layers']
+
+                    # Create result message including shadow analysis if performed
+                    message = f"Analyzed {obstacles_info['total_obstacles']} obstacles, {obstacles_info['critical_obstacles']} are critical"
+
+                    if enable_shadow_analysis:
+                        message += (f", {obstacles_info['shadowed_obstacles']} shadowed, "
+                                    f"{obstacles_info['visible_obstacles']} visible")
+                    if obstacles_info.get('updated_obstacles') is not None:
+                        message += (f" ({obstacles_info['updated_obstacles']} changed since "
+                                    f"the last run, layers updated in place)")
+
+                    if obstacles_info.get('controlling_obstacle'):
+                        fid, gradient = obstacles_info['controlling_obstacle']
+                        message += (
+                            f"; controlling obstacle ID {fid} needs "
+                            + (f"{gradient * 100:.2f}% climb" if gradient != float('inf')
+                               else "more than any climb gradient (at/behind DER)")
+                        )
+
+                    # Display obstacles analysis results
+                    self.iface.messageBar().pushMessage(
+                        "Obstacles Analysis:",
+                        message,
+                        level=Qgis.Info
+                    )
+                except Exception as e:
+                    self._warn_failed("Obstacles analysis", e)
+
+            terrain_info = results.get("terrain")
+            if isinstance(terrain_info, Exception):
+                self._warn_failed("Terrain analysis", terrain_info)
+            elif terrain_info is not None:
+                QgsProject.instance().addMapLayers(terrain_info["layers"])
+                self.iface.messageBar().pushMessage(
+                    "Terrain Analysis:",
+                    f"Analyzed {terrain_info['total_cells']} DTM cells, "
+                    f"{terrain_info['penetrating_cells']} penetrate "
+                    f"(max {terrain_info['max_penetration']:.2f} m)"
+                    + (f"; {terrain_info['skipped_cells']} cells skipped (cannot penetrate)"
+                       if terrain_info['skipped_cells'] else "")
+                    + (f"; {terrain_info['penetration_areas']} penetration areas"
+                       if terrain_params.penetration_areas else "")
+                    + (f"; {terrain_info['isolines']} clearance isolines"
+                       if terrain_params.isoline_levels else ""),
+                    level=Qgis.Info
+                )
+
+            # Prepare layers for export (include obstacles if they exist)
+            layers_to_export = [v_layer, ref_layer] + obstacles_layers
+
+            # Export to KMZ if requested
+            if export_kmz:
+                self.export_to_kmz(layers_to_export)
+
+            # Export to AIXM if requested
+            if export_aixm:
+                self.export_to_aixm(layers_to_export)
+
+            self._zoom_to_layer(v_layer)
+            self._report_finished()
+
+        self._start_task(TofpaTask("TOFPA surface", stages, _finished))
+        return True
+
+    def create_aerodrome_surfaces(
+        self,
+        params: TofpaParams,
+        obs_params: ObstacleParams,
+        terrain_params: Optional[TerrainParams] = None,
+    ) -> bool:
+        """Create the surface of every runway end in one run (aerodrome batch mode).
+
+        Every runway feature (the selected ones with ``use_selected_feature``)
+        gives one surface per direction whose departure end has a threshold
+        point (``core.aerodrome.runway_ends``); widths, clearway and contour
+        interval of *params* apply to all of them.  The DER elevation of an
+        end is the Z of its threshold point when the threshold layer has Z
+        values, ``params.ze`` otherwise.
+
+        All surfaces share one set of layers, labelled by runway end.  The
+        obstacle survey is read once and every obstacle tested against all
+        surfaces in that pass (``core.aerodrome.evaluate_runway_ends``); the
+        DTM is read once, each tile evaluated against every surface it
+        overlaps (``core.terrain.analyze_terrain_surfaces``).  As with
+        ``create_tofpa_surface`` these passes run in a background task and
+        True means it was started.
+        """
+        errors = self._validate_params(params)
+        if errors:
+            self.iface.messageBar().pushMessage(
+                "TOFPA Validation", "; ".join(errors), level=Qgis.Critical
+            )
+            return False
+
+        map_srid = self.iface.mapCanvas().mapSettings().destinationCrs().authid()
+        runway_layer = QgsProject.instance().mapLayer(params.runway_layer_id)
+        if not runway_layer:
+            self.iface.messageBar().pushMessage("Error", "Selected runway layer not found!", level=Qgis.Critical)
+            return False
+        threshold_layer = QgsProject.instance().mapLayer(params.threshold_layer_id)
+        if not threshold_layer:
+            self.iface.messageBar().pushMessage("Error", "Selected threshold layer not found!", level=Qgis.Critical)
+            return False
+
+        def _features(layer):
+            if params.use_selected_feature:
+                return layer.selectedFeatures()
+            return list(layer.getFeatures())
+
+        runways = [
+            (f.id(), [(p.x(), p.y()) for p in f.geometry().asPolyline()])
+            for f in _features(runway_layer) if f.hasGeometry()
+        ]
+        thresholds, elevations = [], {}
+        for feature in _features(threshold_layer):
+            if not feature.hasGeometry():
+                continue
+            vertex = feature.geometry().vertexAt(0)
+            thresholds.append((feature.id(), vertex.x(), vertex.y()))
+            if vertex.is3D() and not np.isnan(vertex.z()):
+                elevations[feature.id()] = vertex.z()
+        try:
+            ends = runway_ends(params, runways, thresholds, elevations)
+        except ValueError as e:
+            self.iface.messageBar().pushMessage("Error", str(e), level=Qgis.Critical)
+            return False
+        logger.debug("Aerodrome batch: %s", ", ".join(end.name for end in ends))
+
+        obstacle_inputs = None
+        if obs_params.include_obstacles and obs_params.obstacles_layer_id:
+            try:
+                obstacle_inputs = self._obstacle_inputs(
+                    obs_params, params.use_selected_feature, ends[0].geometry.frame
+                )
+            except Exception as e:
+                self._warn_failed("Obstacles analysis", e)
+        dtm_inputs = None
+        if terrain_params is not None and terrain_params.include_terrain and terrain_params.dtm_layer_id:
+            try:
+                dtm_inputs = self._dtm_inputs(terrain_params)
+            except Exception as e:
+                self._warn_failed("Terrain analysis", e)
+
+        results = {}
+
+        def _surfaces(task) -> None:
+            results["surface_layers"] = self._add_surface_layers(
+                task, map_srid, [end.geometry for end in ends], params.contour_interval_m,
+                [end.name for end in ends],
+            )
+
+        def _obstacles(task) -> None:
+            try:
+                results["obstacles"] = self._analyze_aerodrome_obstacles(
+                    ends, obs_params, obstacle_inputs, task
+                )
+            except TaskCanceled:
+                raise
+            except Exception as e:
+                results["obstacles"] = e
+
+        def _terrain(task) -> None:
+            try:
+                results["terrain"] = self._analyze_aerodrome_terrain(
+                    ends, terrain_params, dtm_inputs, task
+                )
+            except TaskCanceled:
+                raise
+            except Exception as e:
+                results["terrain"] = e
+
+        stages = [("Building the surfaces", 1, _surfaces)]
+        if obstacle_inputs is not None:
+            stages.append(("Analysing obstacles", 4, _obstacles))
+        if dtm_inputs is not None:
+            stages.append(("Analysing terrain", 4, _terrain))
+
+        def _finished(task, ok) -> None:
+            if not self._end_task(task, ok):
+                return
+            ref_layer, v_layer = results["surface_layers"][:2]
+            QgsProject.instance().addMapLayers(results["surface_layers"])
+            layers_to_export = [v_layer, ref_layer]
+
+            obstacles_info = results.get("obstacles")
+            if obstacles_info is not None:
+                try:
+                    if isinstance(obstacles_info, Exception):
+                        raise obstacles_info
+                    self._commit_obstacles(obs_params, obstacle_inputs, obstacles_info)
+                    layers_to_export += obstacles_info["layers"]
+                    per_end = []
+                    for name, counts in obstacles_info["runway_ends"]:
+                        text = f"{name}: {counts['critical_obstacles']} critical"
+                        if obs_params.enable_shadow_analysis:
+                            text += f" ({counts['shadowed_obstacles']} shadowed)"
+                        per_end.append(text)
+                    self.iface.messageBar().pushMessage(
+                        "Obstacles Analysis:",
+                        f"Analyzed {obstacles_info['total_obstacles']} obstacles against "
+                        f"{len(ends)} runway ends; " + "; ".join(per_end),
+                        level=Qgis.Info
+                    )
+                except Exception as e:
+                    self._warn_failed("Obstacles analysis", e)
+
+            terrain_info = results.get("terrain")
+            if isinstance(terrain_info, Exception):
+                self._warn_failed("Terrain analysis", terrain_info)
+            elif terrain_info is not None:
+                QgsProject.instance().addMapLayers(terrain_info["layers"])
+                self.iface.messageBar().pushMessage(
+                    "Terrain Analysis:",
+                    "; ".join(
+                        f"{end.name}: {summary.total_cells} DTM cells, "
+                        f"{summary.penetrating_cells} penetrate "
+                        f"(max {summary.max_penetration:.2f} m)"
+                        for end, summary in zip(ends, terrain_info["summaries"])
+                    )
+                    + (f"; {terrain_info['skipped_cells']} cells skipped (cannot penetrate)"
+                       if terrain_info['skipped_cells'] else ""),
+                    level=Qgis.Info
+                )
+
+            if params.export_kmz:
+                self.export_to_kmz(layers_to_export)
+            if params.export_aixm:
+                self.export_to_aixm(layers_to_export)
+
+            self._zoom_to_layer(v_layer)
+            self._report_finished()
+
+        self._start_task(TofpaTask("TOFPA aerodrome batch", stages, _finished))
+        return True
+
+    def _zoom_to_layer(self, v_layer) -> None:
+        """Zoom the canvas to the surface layer, at 1:20000 or smaller scale."""
+        # Zoom to layer (from original script)
+        v_layer.selectAll()
+        canvas = self.iface.mapCanvas()
+        canvas.zoomToSelected(v_layer)
+        v_layer.removeSelection()
+        
+        # Get canvas scale (from original script)
+        sc = canvas.scale()
+        if sc < 20000:
+            sc = 20000
+        canvas.zoomScale(sc)
+
+    def _add_surface_layers(self, task, map_srid: str, geometries, contour_interval_m: int,
+                            names=None) -> list:
+        """Build the reference line, surface and contour layers of *geometries*.
+
+        One feature per ``core.surface.SurfaceGeometry`` in each layer.
+        *names* labels the surfaces of an aerodrome batch run
+        (``core.aerodrome.RunwayEnd.name``); the contour layer then gets a
+        ``runway_end`` field.  Runs on the *task* thread: returns
+        ``[reference layer, surface layer]`` plus the contour layer when
+        there are contours, in the order they go into the project.
+        """
+        labels = names or [None] * len(geometries)
+
         # Create reference line memory layer
         ref_layer = QgsVectorLayer(f"LineStringZ?crs={map_srid}", "reference_line", "memory")
-        ref_id_field = QgsField('id', FIELD_INT)
-        ref_label_field = QgsField('txt-label', FIELD_STRING)
-        ref_layer.dataProvider().addAttributes([ref_id_field, ref_label_field])
+        ref_layer.dataProvider().addAttributes(reference_line_fields())
         ref_layer.updateFields()
         
-        # Create the reference line feature
-        ref_feature = QgsFeature()
-        ref_line_geom = QgsLineString([ref_line_left, ref_line_right])
-        ref_feature.setGeometry(QgsGeometry(ref_line_geom))
-        ref_feature.setAttributes([1, 'tofpa reference line'])
-        ref_layer.dataProvider().addFeatures([ref_feature])
+        # Create the reference line features
+        ref_layer.dataProvider().addFeatures([
+            reference_line_feature(geometry, i, label)
+            for i, (geometry, label) in enumerate(zip(geometries, labels), start=1)
+        ])
         
         # Style the reference line (red color, width 0.25)
         ref_symbol = QgsLineSymbol.createSimple({
@@ -439,29 +884,21 @@ class TOFPA:
         })
         ref_layer.renderer().setSymbol(ref_symbol)
         ref_layer.triggerRepaint()
-        
-        # Add reference line layer to map
-        QgsProject.instance().addMapLayers([ref_layer])
+        layers = [ref_layer]
         
         # Creation of the Take Off Climb Surfaces (from original script)
         # Create memory layer
         v_layer = QgsVectorLayer(f"PolygonZ?crs={map_srid}", "RWY_TOFPA_AOC_TypeA", "memory")
-        id_field = QgsField('ID', FIELD_STRING)
-        name_field = QgsField('SurfaceName', FIELD_STRING)
-        v_layer.dataProvider().addAttributes([id_field])
-        v_layer.dataProvider().addAttributes([name_field])
+        v_layer.dataProvider().addAttributes(surface_fields())
         v_layer.updateFields()
         
         # Take Off Climb Surface Creation (from original script)
-        surface_area = [pt_03DR, pt_03DL, pt_02DL, pt_01DL, pt_01DR, pt_02DR]
-        pr = v_layer.dataProvider()
-        seg = QgsFeature()
-        seg.setGeometry(QgsPolygon(QgsLineString(surface_area), rings=[]))
-        seg.setAttributes([13, 'TOFPA AOC Type A'])
-        pr.addFeatures([seg])
+        v_layer.dataProvider().addFeatures([
+            surface_feature(geometry, label) for geometry, label in zip(geometries, labels)
+        ])
         
-        # Load PolygonZ Layer to map canvas (from original script)
-        QgsProject.instance().addMapLayers([v_layer])
+        # PolygonZ Layer for the map canvas (from original script)
+        layers.append(v_layer)
         
         # Change style of layer (from original script but using modern syntax)
         symbol = QgsFillSymbol.createSimple({
@@ -473,169 +910,914 @@ class TOFPA:
         v_layer.triggerRepaint()
         
         # Contour layer generation (issue #27)
-        if params.contour_interval_m > 0:
-            _dist_to_max_w = (max_width_tofpa / 2 - width_tofpa / 2) / TOFPA_DIVERGENCE_RATIO
-            _z_surface_end = ze + TOFPA_SURFACE_LENGTH * TOFPA_CLIMB_GRADIENT
-            _elevs = contour_elevations(ze, _z_surface_end, params.contour_interval_m)
-            _all_specs = contour_specs_for_takeoff(
-                z_start=ze,
-                slope_ratio=TOFPA_CLIMB_GRADIENT,
-                distance_to_max_width=_dist_to_max_w,
-                surface_length=TOFPA_SURFACE_LENGTH,
-                near_half_width=width_tofpa / 2,
-                max_half_width=max_width_tofpa / 2,
-                divergence_ratio=TOFPA_DIVERGENCE_RATIO,
-                elevations=_elevs,
-            )
-            if _all_specs:
-                _clayer = QgsVectorLayer(
-                    f"LineStringZ?crs={map_srid}",
-                    "RWY_TOFPA_Contours",
-                    "memory",
-                )
-                _clayer.dataProvider().addAttributes([
-                    QgsField('ID', FIELD_INT),
-                    QgsField('surface_elevation', FIELD_DOUBLE),
-                ])
-                _clayer.updateFields()
-
-                _cfeats = []
-                for _i, _spec in enumerate(_all_specs):
-                    _ctr = pt_01D.project(_spec.distance_from_origin, azimuth)
-                    _l2d = _ctr.project(_spec.half_width, azimuth + 90)
-                    _r2d = _ctr.project(_spec.half_width, azimuth - 90)
-                    _lpt = QgsPoint(_l2d.x(), _l2d.y(), _spec.elevation)
-                    _rpt = QgsPoint(_r2d.x(), _r2d.y(), _spec.elevation)
-                    _feat = QgsFeature()
-                    _feat.setGeometry(QgsGeometry(QgsLineString([_lpt, _rpt])))
-                    _feat.setAttributes([_i + 1, _spec.elevation])
-                    _cfeats.append(_feat)
-                _clayer.dataProvider().addFeatures(_cfeats)
-
-                self._apply_contour_style(_clayer)
-
-                QgsProject.instance().addMapLayers([_clayer])
-                _clayer.triggerRepaint()
-                logger.debug(
-                    "Contour layer added — %d lines at %dm interval",
-                    len(_cfeats), params.contour_interval_m,
-                )
+        if any(len(geometry.contours) for geometry in geometries):
+            _clayer = QgsVectorLayer(
+                f"LineStringZ?crs={map_srid}",
+                "RWY_TOFPA_Contours",
+                "memory",
+            )
+            _clayer.dataProvider().addAttributes(contour_fields(
+                [QgsField('runway_end', FIELD_STRING)] if names else []
+            ))
+            _clayer.updateFields()
 
-        # Process survey obstacles if requested
-        obstacles_layers = []
-        if include_obstacles and obstacles_layer_id:
-            try:
-                obstacles_info = self.process_survey_obstacles(
-                    obs_params,
-                    v_layer,      # TOFPA surface for intersection analysis
-                    use_selected_feature,
-                    der_point=pt_01D,
-                    der_elevation=ze,
-                    takeoff_azimuth=azimuth,
-                    climb_gradient=TOFPA_CLIMB_GRADIENT,
-                )
-                if obstacles_info:
-                    obstacles_layers = obstacles_info['layers']
-                    
-                    # Create result message including shadow analysis if performed
-                    message = f"Analyzed {obstacles_info['total_obstacles']} obstacles, {obstacles_info['critical_obstacles']} are critical"
-                    
-                    if enable_shadow_analysis and 'shadow_results' in obstacles_info:
-                        shadow_results = obstacles_info['shadow_results']
-                        shadowed_count = len(shadow_results.get('shadowed_obstacles', []))
-                        visible_count = len([obs for obs in shadow_results.get('visible_obstacles', []) if obs.get('is_critical', False)])
-                        message += f", {shadowed_count} shadowed, {visible_count} visible"
-                    
-                    # Display obstacles analysis results
-                    self.iface.messageBar().pushMessage(
-                        "Obstacles Analysis:", 
-                        message, 
-                        level=Qgis.Info
-                    )
-            except Exception as e:
-                logger.warning("Obstacles analysis failed: %s", e)
-                self.iface.messageBar().pushMessage(
-                    "Warning", 
-                    f"Obstacles analysis failed: {str(e)}", 
-                    level=Qgis.Warning
+            _cfeats = []
+            for _geometry, _label in zip(geometries, labels):
+                _cfeats += contour_features(
+                    _geometry, len(_cfeats) + 1, [_label] if names else []
                 )
-        
-        # Prepare layers for export (include obstacles if they exist)
-        layers_to_export = [v_layer, ref_layer] + obstacles_layers
-        
-        # Export to KMZ if requested
-        if export_kmz:
-            self.export_to_kmz(layers_to_export)
-        
-        # Export to AIXM if requested
-        if export_aixm:
-            self.export_to_aixm(layers_to_export)
-        
-        # Zoom to layer (from original script)
-        v_layer.selectAll()
-        canvas = self.iface.mapCanvas()
-        canvas.zoomToSelected(v_layer)
-        v_layer.removeSelection()
-        
-        # Get canvas scale (from original script)
-        sc = canvas.scale()
-        if sc < 20000:
-            sc = 20000
-        canvas.zoomScale(sc)
-        
-        return True
+            _clayer.dataProvider().addFeatures(_cfeats)
+
+            self._apply_contour_style(_clayer)
+
+            layers.append(_clayer)
+            _clayer.triggerRepaint()
+            logger.debug(
+                "Contour layer built — %d lines at %dm interval",
+                len(_cfeats), contour_interval_m,
+            )
+        task.add_layers(layers)
+        return layers
 
     def process_survey_obstacles(
         self,
         obs_params: ObstacleParams,
+        inputs: dict,
         tofpa_surface_layer,
-        use_selected_feature: bool,
+        task: TofpaTask,
         der_point=None,
         der_elevation: float = 0.0,
         takeoff_azimuth: float = 0.0,
         climb_gradient: float = 0.012,
+        footprint: Optional[SurfaceFootprint] = None,
     ) -> dict:
         """
         Process survey obstacles and analyse their impact on the TOFPA surface.
 
         Delegates all geometry / shadow work to ``ObstacleAnalyzer``; this method
-        only handles QGIS layer look-up and feature retrieval.
+        only handles feature retrieval.  It runs on the *task* thread: the
+        obstacles layer is only reached through the *inputs* captured by
+        ``_obstacle_inputs``, and the result layers are built but not added
+        to the project — ``_commit_obstacles`` does that on the main thread.
+
+        With *der_point* and the surface *footprint*, obstacles come from the
+        plugin's ``ObstacleProjectionCache``: the layer is read and projected
+        into the runway-local frame once per runway end (and again only after
+        it is edited), and every run is an ``ObstacleAnalyzer.analyze_projection``
+        array comparison — other widths, buffers or gradients never re-read
+        the survey.  Obstacles whose base lies outside the surface extent
+        grown by the obstacle buffer are not reported.  When the previous run
+        on the same layer used the same parameters, only obstacles added,
+        changed or removed since are analysed and the previous result layers
+        are patched in place (see ``_analyze_projected_obstacles``).
+
+        Without them, features are streamed through a request limited to that
+        window, fetching only the height attribute, and checked one by one
+        with ``ObstacleAnalyzer.analyze_single`` (2-D when *der_point* is
+        omitted).
+
+        With ``heights_agl`` the height field holds heights above ground: the
+        ground DTM is sampled at every obstacle base in one bulk pass
+        (``core.dtm.sample_dtm``) and added before the penetration test.
+        Obstacles off the DTM are skipped with a warning.
+        """
+        # Fetch and prepare the surface once; reused by every obstacle check
+        surface_context = SurfaceContext(tofpa_surface_layer)
+
+        request = self._obstacles_window_request(
+            inputs, tofpa_surface_layer, surface_context.extent, obs_params
+        )
+        analyzer = ObstacleAnalyzer()
+
+        if der_point is not None and footprint is not None:
+            run = self._analyze_projected_obstacles(
+                analyzer, obs_params, inputs, request.filterRect(), footprint, der_point,
+                der_elevation, takeoff_azimuth, climb_gradient, tofpa_surface_layer, task,
+            )
+        else:
+            run = self._analyze_obstacle_features(
+                analyzer, obs_params, inputs, request, tofpa_surface_layer, surface_context,
+                der_point, der_elevation, takeoff_azimuth, climb_gradient, task,
+            )
+        layers_info, sweep = run["layers_info"], run["gradient_sweep"]
+
+        tables = []
+        controlling = None
+        if sweep is not None:
+            # A table, not a map layer: kept out of "layers" (KMZ export)
+            tables.append(self._create_gradient_sweep_layer(*sweep))
+            task.add_layers(tables)
+            sweep, ids = sweep
+            if sweep.controlling_index >= 0:
+                controlling = (int(ids[sweep.controlling_index]), sweep.controlling_gradient)
+
+        return {
+            "layers": [
+                layers_info["critical_layer"],
+                layers_info["safe_layer"],
+                layers_info["buffer_layer"],
+                layers_info.get("shadowed_layer"),
+                layers_info.get("visible_layer"),
+            ],
+            "layers_info": layers_info,
+            "tables": tables,
+            "total_obstacles": run["total_obstacles"],
+            "critical_obstacles": run["critical_obstacles"],
+            "shadowed_obstacles": run["shadowed_obstacles"],
+            "visible_obstacles": run["visible_obstacles"],
+            "records": run["records"],
+            "updated_obstacles": run["updated_obstacles"],
+            "gradient_sweep": sweep,
+            "controlling_obstacle": controlling,
+            "state": run.get("state"),
+            "deferred": run.get("deferred"),
+            "projection": run.get("projection"),
+            "reset_previous": run.get("reset_previous", False),
+        }
+
+    def _obstacle_inputs(self, obs_params: ObstacleParams, use_selected_feature: bool,
+                         frame: RunwayFrame) -> dict:
+        """Main-thread half of an obstacle pass: everything read from the project.
+
+        Checks the obstacles layer (``ValueError``) and captures what the
+        background pass needs so it never touches the layer: a feature
+        source, the selection, the cached projection into *frame* (``None``
+        on a miss), the ground DTM sampler and the previous run to patch.
+        """
+        obstacles_layer = self._obstacles_layer(obs_params, use_selected_feature)
+        height_field = obs_params.obstacle_height_field
+        projection = self._obstacle_projections.lookup(obstacles_layer, height_field, frame)
+        previous = self._obstacle_runs.get(obstacles_layer.id(), (None, None))
+        if previous[0] is not None and not self._obstacle_layers_alive(previous[1]):
+            previous = (None, None)
+        selected = None
+        if use_selected_feature:
+            selected = np.fromiter(obstacles_layer.selectedFeatureIds(), dtype=np.int64)
+        return {
+            "layer_id": obstacles_layer.id(),
+            "crs": obstacles_layer.crs(),
+            "fields": obstacles_layer.fields(),
+            "spatial_index": obstacles_layer.hasSpatialIndex(),
+            "feature_count": obstacles_layer.featureCount(),
+            "source": QgsVectorLayerFeatureSource(obstacles_layer),
+            "selected": selected,
+            "frame": frame,
+            "projection": projection,
+            "generation": self._obstacle_projections.generation,
+            "read_request": ObstacleProjectionCache.request(obstacles_layer, height_field),
+            "ground": (self._ground_sampler(obstacles_layer, obs_params)
+                       if obs_params.heights_agl else None),
+            "transform_context": QgsProject.instance().transformContext(),
+            "previous": previous,
+        }
+
+    @staticmethod
+    def _read_obstacles(obs_params: ObstacleParams, inputs: dict, frame: RunwayFrame,
+                        task: TofpaTask, end: float):
+        """``(projection, read)``: every obstacle projected into *frame*.
+
+        Cached projections are used as they are (*read* is ``None``);
+        otherwise the feature source is read, taking the stage progress to
+        *end*, and *read* is the new projection for ``_commit_obstacles``
+        to cache.
+        """
+        projection = inputs["projection"]
+        if projection is not None and projection.frame == frame:
+            return projection, None
+        projection = ObstacleProjection.from_features(
+            frame,
+            task.iterate(inputs["source"].getFeatures(inputs["read_request"]),
+                         inputs["feature_count"], 0.0, end),
+            obs_params.obstacle_height_field,
+            inputs["feature_count"],
+        )
+        return projection, projection
+
+    def _commit_obstacles(self, obs_params: ObstacleParams, inputs: dict, info: dict) -> None:
+        """Main-thread end of an obstacle pass: put the results of *info* on the map.
+
+        Caches a projection the pass read, applies the deferred edits of an
+        incremental run to the previous layers (``ValueError`` when they
+        were removed meanwhile), records the run for the next incremental
+        one, then adds the new layers and tables to the project.
+        """
+        if info["projection"] is not None:
+            self._obstacle_projections.put(
+                inputs["layer_id"], obs_params.obstacle_height_field, info["projection"].frame,
+                info["projection"], inputs["generation"],
+            )
+        analyzer = ObstacleAnalyzer()
+        layers_info = info["layers_info"]
+        if info["deferred"] is not None:
+            if not self._obstacle_layers_alive(layers_info):
+                self._obstacle_runs.pop(inputs["layer_id"], None)
+                raise ValueError(
+                    "Obstacle layers of the previous run were removed during the run; "
+                    "run it again"
+                )
+            removals, accumulator = info["deferred"]
+            for layers, ids in removals:
+                analyzer.remove_obstacle_features(layers, ids)
+            accumulator.flush()
+        if info["state"] is not None:
+            self._obstacle_runs[inputs["layer_id"]] = (info["state"], layers_info)
+        elif info.get("reset_previous"):
+            # Fresh layers: a later batch run must not patch the previous ones
+            self._obstacle_runs.pop(inputs["layer_id"], None)
+        analyzer.finalize_layers(layers_info)
+        for table in info["tables"]:
+            QgsProject.instance().addMapLayer(table)
+
+    def process_terrain(
+        self,
+        terrain_params: TerrainParams,
+        dtm_inputs: dict,
+        tofpa_surface_layer,
+        task: TofpaTask,
+        der_point,
+        der_elevation: float,
+        takeoff_azimuth: float,
+        footprint: SurfaceFootprint,
+        climb_gradient: float = 0.012,
+    ) -> dict:
+        """
+        Evaluate the DTM under the TOFPA surface (native ``TOFPA_analysis`` model).
+
+        Reads the raster window under the surface buffered by the DTM post
+        diagonal tile by tile (tiles aligned to the native GDAL block size)
+        and computes the model's per-cell fields with
+        ``core.terrain.analyze_terrain_tiled``; statistics are reduced
+        incrementally, so processing memory is fixed by the tile size and
+        independent of the DTM resolution.  Tiles are read and analysed on
+        ``terrain_params.workers`` threads; features are written here, on
+        the calling thread, in tile order.  The result is the model's
+        ``obstacles-terrain`` point layer — restricted to penetrating cells
+        when ``penetrating_only`` is set, which also bounds the output.
+
+        With ``penetrating_only`` the cached max pyramid of ``core.dtm`` first
+        rules out blocks that cannot reach the surface; those cells are never
+        read or evaluated (``skipped_cells``) and the penetrating cells are
+        the same as with a full scan.  ``total_cells`` then counts the
+        evaluated cells only.
 
-        *der_point*, *der_elevation*, *takeoff_azimuth*, *climb_gradient* are
-        forwarded to ``ObstacleAnalyzer.analyze_single`` for ICAO 3-D penetration
-        comparison (BUG-B fix).  If omitted the analyser falls back to 2-D.
+        With ``output_mode == "raster"`` the clearance of every cell goes to
+        a tiled, DEFLATE-compressed GeoTIFF with overviews instead (the
+        pyramid is not used, every cell gets a value); ``penetrating_only``
+        then adds the penetrating cells as an ``obstacles-terrain`` layer.
+
+        With ``penetration_areas`` the penetrating cells are also grouped
+        into contiguous areas (``core.penetration``) and written as the
+        ``terrain-penetration-areas`` polygon layer.  ``isoline_levels``
+        adds a second tiled pass tracing clearance isolines
+        (``core.isolines``) into ``terrain-clearance-isolines``.
+
+        With ``cache_mb`` set, the clipped window comes from the on-disk
+        ``core.dtm.DtmWindowCache`` (clipping the source DTM only on a miss)
+        and every pass above reads that instead of the source raster.
+
+        ``dtm_fallback_ids`` adds further DTMs, read through a virtual
+        mosaic (``core.dtm.open_dtm_mosaic``) where the DTM layer comes first
+        and each cell takes the first source holding data.  Mosaics bypass
+        the window cache, so no merged terrain is ever written to disk.
+
+        The DTMs must be GDAL rasters in the same projected CRS as the surface.
+
+        Runs on the *task* thread, with the DTM sources of *dtm_inputs*
+        (``_dtm_inputs``); progress follows the tiles, cancellation is
+        checked between them, and the layers are returned (``layers``)
+        for the caller to add to the project.
         """
+        dtm_sources, dtm_crs = dtm_inputs["sources"], dtm_inputs["crs"]
+
+        clip_buffer = dtm_clip_buffer(terrain_params.dtm_post_spacing)
+        extent = QgsRectangle(tofpa_surface_layer.extent())
+        extent.grow(clip_buffer)
+
+        dataset = open_dtm_mosaic(dtm_sources)
+        window = (extent.xMinimum(), extent.yMinimum(), extent.xMaximum(), extent.yMaximum())
+        frame = RunwayFrame(der_point.x(), der_point.y(), takeoff_azimuth)
+        # A clipped mosaic would be a merged copy of the sources on disk
+        if terrain_params.cache_mb > 0 and len(dtm_sources) == 1:
+            cache = DtmWindowCache(self._dtm_cache_dir(), terrain_params.cache_mb * 1024 * 1024)
+            dataset = open_dtm(cache.clipped_dtm(dataset, window, frame, footprint, clip_buffer))
+        raster_mode = terrain_params.output_mode == "raster"
+
+        raster_writer = None
+        if raster_mode:
+            raster_path = terrain_params.raster_path or QgsProcessingUtils.generateTempFilename(
+                "terrain_clearance.tif"
+            )
+            raster_writer = ClearanceRasterWriter(
+                raster_path, dataset, window, dtm_crs.toWkt()
+            )
+
+        terrain_layer = None
+        if not raster_mode or terrain_params.penetrating_only:
+            terrain_layer = self._create_terrain_layer(dtm_crs)
+        accumulator = FeatureAccumulator()
+        next_id = [1]
+        collector = None
+        if terrain_params.penetration_areas:
+            collector = PenetrationCollector(dataset.GetGeoTransform())
+
+        def _write_tile(result) -> None:
+            if raster_writer is not None:
+                raster_writer.write(result)
+            if collector is not None:
+                collector.add(result)
+            if terrain_layer is None:
+                return
+            if terrain_params.penetrating_only:
+                result = result.subset(result.penetrates)
+            next_id[0] = self._add_terrain_features(
+                terrain_layer, result, terrain_params.source, accumulator, next_id[0]
+            )
+
+        reader = TileReader(dataset.GetDescription())
+        skipped_cells = 0
+        if terrain_params.penetrating_only and not raster_mode:
+            pyramid = max_pyramid(dataset, window, workers=terrain_params.workers)
+            candidates = pyramid.candidates(
+                frame, footprint, der_elevation,
+                vertical_tolerance=terrain_params.vertical_tolerance_m,
+                clip_buffer=clip_buffer,
+                climb_gradient=climb_gradient,
+            )
+            col_off, row_off, cols, rows = window_offsets(
+                dataset.GetGeoTransform(), (dataset.RasterXSize, dataset.RasterYSize), window
+            )
+            skipped_cells = pyramid.skipped_cells(candidates, col_off, row_off, cols, rows)
+            reader = TileReader(dataset.GetDescription(), pyramid=pyramid, candidates=candidates)
+            task.check_canceled()
+
+        # The isoline pass re-reads the window: it gets the last 30 % of the stage
+        tiled_end = 0.7 if terrain_params.isoline_levels else 1.0
+        tiles = list(tile_offsets(dataset, window))
+        summary = analyze_terrain_parallel(
+            task.iterate(tiles, len(tiles), 0.0, tiled_end),
+            reader,
+            frame,
+            footprint,
+            der_elevation,
+            vertical_tolerance=terrain_params.vertical_tolerance_m,
+            clip_buffer=clip_buffer,
+            climb_gradient=climb_gradient,
+            workers=terrain_params.workers,
+            on_tile=_write_tile,
+        )
+        summary.skipped_cells = skipped_cells
+
+        isolines = []
+        if terrain_params.isoline_levels:
+            tiles = list(tile_offsets(dataset, window, overlap=1))
+            isolines = trace_clearance_isolines(
+                task.iterate(tiles, len(tiles), tiled_end, 1.0),
+                TileReader(dataset.GetDescription()),
+                frame,
+                footprint,
+                der_elevation,
+                terrain_params.isoline_levels,
+                dataset.GetGeoTransform(),
+                dataset.RasterXSize,
+                vertical_tolerance=terrain_params.vertical_tolerance_m,
+                clip_buffer=clip_buffer,
+                climb_gradient=climb_gradient,
+            )
+
+        layers = []
+        areas = []
+        if collector is not None:
+            areas = collector.areas()
+            areas_layer = self._create_penetration_areas_layer(
+                dtm_crs, areas, terrain_params.source, accumulator
+            )
+        accumulator.flush()
+
+        if raster_writer is not None:
+            raster_layer = QgsRasterLayer(raster_writer.close(), "terrain-clearance")
+            if not raster_layer.isValid():
+                raise ValueError(f"Cannot load clearance raster '{raster_writer.path}'")
+            self._apply_clearance_style(raster_layer)
+            layers.append(raster_layer)
+        if terrain_layer is not None:
+            self._apply_terrain_style(terrain_layer)
+            layers.append(terrain_layer)
+        if collector is not None:
+            layers.append(areas_layer)
+        if terrain_params.isoline_levels:
+            layers.append(self._create_isoline_layer(dtm_crs, isolines))
+        task.add_layers(layers)
+
+        return {
+            "layers": layers,
+            "total_cells": summary.total_cells,
+            "penetrating_cells": summary.penetrating_cells,
+            "max_penetration": summary.max_penetration,
+            "skipped_cells": summary.skipped_cells,
+            "penetration_areas": len(areas),
+            "isolines": len(isolines),
+            "summary": summary,
+        }
+
+    @classmethod
+    def _dtm_inputs(cls, terrain_params: TerrainParams) -> dict:
+        """Sources and CRS of the DTMs of *terrain_params*, read on the main thread."""
+        dtm_layers = cls._dtm_layers(terrain_params)
+        return {
+            "sources": [layer.source() for layer in dtm_layers],
+            "crs": dtm_layers[0].crs(),
+        }
+
+    @staticmethod
+    def _dtm_layers(terrain_params: TerrainParams) -> list:
+        """The DTM layer of *terrain_params* followed by its fallbacks."""
+        dtm_layers = []
+        for layer_id in (terrain_params.dtm_layer_id,) + terrain_params.dtm_fallback_ids:
+            layer = QgsProject.instance().mapLayer(layer_id)
+            if not layer:
+                raise ValueError("Selected DTM layer not found!")
+            if layer.providerType() != "gdal":
+                raise ValueError(f"DTM layer '{layer.name()}' is not a GDAL raster!")
+            if layer not in dtm_layers:
+                dtm_layers.append(layer)
+        return dtm_layers
+
+    def _dtm_cache_dir(self) -> str:
+        """Directory of the clipped DTM window cache, in the QGIS profile."""
+        return os.path.join(QgsApplication.qgisSettingsDirPath(), "cache", "tofpa", "dtm")
+
+    def _create_terrain_layer(self, crs, extra_fields=()) -> QgsVectorLayer:
+        """Create the empty, model-compatible ``obstacles-terrain`` point layer.
+
+        *extra_fields* are appended after the model fields.
+        """
+        layer = QgsVectorLayer(f"Point?crs={crs.authid()}", "obstacles-terrain", "memory")
+        layer.dataProvider().addAttributes(terrain_fields(extra_fields))
+        layer.updateFields()
+        return layer
+
+    def _create_penetration_areas_layer(self, crs, areas, source: str, accumulator) -> QgsVectorLayer:
+        """Build the ``terrain-penetration-areas`` polygon layer from *areas*."""
+        layer = QgsVectorLayer(f"Polygon?crs={crs.authid()}", "terrain-penetration-areas", "memory")
+        layer.dataProvider().addAttributes([
+            QgsField('id', FIELD_INT),
+            QgsField('cells', FIELD_INT),
+            QgsField('max_pen', FIELD_DOUBLE),
+            QgsField('mean_pen', FIELD_DOUBLE),
+            QgsField('worst_x', FIELD_DOUBLE),
+            QgsField('worst_y', FIELD_DOUBLE),
+            QgsField('source', FIELD_STRING),
+        ])
+        layer.updateFields()
+
+        # Largest penetration first, so id 1 is the worst area
+        areas = sorted(areas, key=lambda area: -area.max_penetration)
+        for fid, area in enumerate(areas, start=1):
+            exterior, *holes = area.rings
+            polygon = QgsPolygon(QgsLineString(exterior[:, 0].tolist(), exterior[:, 1].tolist()))
+            for hole in holes:
+                polygon.addInteriorRing(QgsLineString(hole[:, 0].tolist(), hole[:, 1].tolist()))
+            feat = QgsFeature()
+            feat.setGeometry(QgsGeometry(polygon))
+            feat.setAttributes([
+                fid, area.cell_count, round(area.max_penetration, 3),
+                round(area.mean_penetration, 3), area.worst_x, area.worst_y, source,
+            ])
+            accumulator.add(layer, feat)
+
+        symbol = QgsFillSymbol.createSimple({
+            'color': '227,26,28,102',  # Red with 40% opacity
+            'outline_color': '227,26,28,255',
+            'outline_width': '0.4'
+        })
+        layer.renderer().setSymbol(symbol)
+        return layer
+
+    def _create_isoline_layer(self, crs, isolines) -> QgsVectorLayer:
+        """Build the ``terrain-clearance-isolines`` LineStringZ layer.
+
+        Vertices carry the surface elevation as Z; ``surface_elevation`` is
+        its mean along the line so the contour style labels it.
+        """
+        layer = QgsVectorLayer(
+            f"LineStringZ?crs={crs.authid()}", "terrain-clearance-isolines", "memory"
+        )
+        layer.dataProvider().addAttributes([
+            QgsField('ID', FIELD_INT),
+            QgsField('surface_elevation', FIELD_DOUBLE),
+            QgsField('clearance_level', FIELD_DOUBLE),
+        ])
+        layer.updateFields()
+
+        feats = []
+        for fid, line in enumerate(isolines, start=1):
+            xs, ys, zs = (line.coords[:, k].tolist() for k in range(3))
+            feat = QgsFeature()
+            feat.setGeometry(QgsGeometry(QgsLineString(xs, ys, zs)))
+            feat.setAttributes([fid, round(float(line.coords[:, 2].mean()), 1), line.level])
+            feats.append(feat)
+        layer.dataProvider().addFeatures(feats)
+        self._apply_contour_style(layer)
+        return layer
+
+    def _add_terrain_features(self, layer, result, source: str, accumulator, first_id: int,
+                              extra_attributes=()) -> int:
+        """Queue one point per cell of *result*; return the next free ``id``."""
+        for feat in terrain_features(result, source, first_id, extra_attributes):
+            accumulator.add(layer, feat)
+        return first_id + len(result)
+
+    def _apply_clearance_style(self, layer) -> bool:
+        """Apply the bundled ``terrain_clearance.qml`` (red where clearance < 0)."""
+        qml_path = os.path.join(self.plugin_dir, 'styles', 'terrain_clearance.qml')
+        if not os.path.isfile(qml_path):
+            logger.debug("terrain_clearance.qml not found at '%s'", qml_path)
+            return False
+        msg, ok = layer.loadNamedStyle(qml_path)
+        if not ok:
+            logger.warning("QML style parse failed for clearance raster ('%s')", msg)
+        return ok
+
+    def _apply_terrain_style(self, layer) -> bool:
+        """Apply the bundled ``obstacle_penetrations.qml`` (categorised on ``penetrates``)."""
+        qml_path = os.path.join(self.plugin_dir, 'styles', 'obstacle_penetrations.qml')
+        if not os.path.isfile(qml_path):
+            logger.debug("obstacle_penetrations.qml not found at '%s'", qml_path)
+            return False
+        try:
+            msg, ok = layer.loadNamedStyle(qml_path)
+            if not ok:
+                logger.warning("QML style parse failed for terrain layer ('%s')", msg)
+                return False
+            # The style labels survey fields the terrain layer does not carry
+            layer.setLabelsEnabled(False)
+            return True
+        except Exception as exc:
+            logger.warning("QML style load error ('%s'): %s", qml_path, exc)
+            return False
+
+    def _analyze_aerodrome_obstacles(
+        self, ends, obs_params: ObstacleParams, inputs: dict, task: TofpaTask,
+    ) -> dict:
+        """Obstacle pass of an aerodrome batch run.
+
+        The survey comes from the ``ObstacleProjectionCache`` (one read of
+        the layer) and ``core.aerodrome.evaluate_runway_ends`` tests it
+        against every surface.  Results of all runway ends go to one set of
+        obstacle layers with a ``runway_end`` field: an obstacle near two
+        surfaces appears once for each.  Shadows are analysed per runway
+        end from its DER; the gradient sweep gives one table per end.
+        Batch runs do not take part in incremental re-analysis.  Runs on
+        the *task* thread like ``process_survey_obstacles``; the layers go
+        to the project through ``_commit_obstacles``.
+        """
+        projection, read = self._read_obstacles(
+            obs_params, inputs, ends[0].geometry.frame, task, 0.4
+        )
+        mask = np.zeros(len(projection), dtype=bool)
+        for end in ends:
+            mask |= projection.in_rectangle(*end.geometry.extent(obs_params.obstacle_buffer))
+        if inputs["selected"] is not None:
+            mask &= np.isin(projection.ids, inputs["selected"])
+        projection, ground = self._projection_ground(projection.subset(mask), inputs["ground"])
+        task.check_canceled()
+
+        found = evaluate_runway_ends(
+            ends, projection.x, projection.y, projection.height,
+            obs_params.obstacle_buffer, obs_params.min_obstacle_height, ground,
+        )
+        task.set_progress(0.5)
+
+        analyzer = ObstacleAnalyzer()
+        accumulator = FeatureAccumulator()
+        layers_info = analyzer.create_layers(
+            inputs["crs"], [QgsField("runway_end", FIELD_STRING)]
+        )
+        task.add_layers(layers_info.values())
+        runway_end_counts = []
+        tables = []
+        rows_total = max(1, sum(len(hits) for hits in found))
+        rows_done = 0
+        for end, hits in zip(ends, found):
+            records = analyzer.write_results(
+                projection.subset(hits.index), hits.results, obs_params.obstacle_buffer,
+                layers_info, accumulator, (end.name,),
+                on_progress=task.progress_callback(
+                    0.5 + 0.5 * rows_done / rows_total,
+                    0.5 + 0.5 * (rows_done + len(hits)) / rows_total,
+                ),
+            )
+            rows_done += len(hits)
+            if obs_params.enable_shadow_analysis:
+                records.set_shadows(*shadow_sectors(
+                    records, end.geometry.der, obs_params.shadow_tolerance
+                ))
+                analyzer.apply_shadow_results(
+                    layers_info, records, obs_params.obstacle_buffer, accumulator,
+                    extra_attributes=(end.name,),
+                )
+            if obs_params.gradient_sweep:
+                sweep = gradient_sweep(
+                    hits.results["along"], records.z, records.in_footprint,
+                    end.geometry.der_elevation, obs_params.gradient_sweep,
+                )
+                table = self._create_gradient_sweep_layer(sweep, records.ids)
+                table.setName(f"TOFPA_Gradient_Sweep {end.name}")
+                tables.append(table)
+            runway_end_counts.append(
+                (end.name, self._obstacle_run_summary(layers_info, records, None))
+            )
+
+        accumulator.flush()
+        task.add_layers(tables)
+        return {
+            "layers": [
+                layers_info["critical_layer"],
+                layers_info["safe_layer"],
+                layers_info["buffer_layer"],
+                layers_info.get("shadowed_layer"),
+                layers_info.get("visible_layer"),
+            ],
+            "layers_info": layers_info,
+            "tables": tables,
+            "total_obstacles": len(projection),
+            "runway_ends": runway_end_counts,
+            "state": None,
+            "deferred": None,
+            "projection": read,
+        }
+
+    def _analyze_aerodrome_terrain(self, ends, terrain_params: TerrainParams, dtm_inputs: dict,
+                                   task: TofpaTask) -> dict:
+        """Terrain pass of an aerodrome batch run.
+
+        The DTM window covering every surface is read tile by tile once;
+        ``core.terrain.analyze_terrain_surfaces`` evaluates each tile
+        against the surfaces it overlaps and skips tiles far from all of
+        them.  Cells go to one ``obstacles-terrain`` layer with a
+        ``runway_end`` field (a cell under two surfaces appears once for
+        each).  With ``penetrating_only`` only penetrating cells are written
+        and blocks no surface can reach are skipped (the union of the
+        per-surface ``core.pyramid`` candidates).  The clearance raster,
+        penetration areas, isolines and window cache are single-run outputs.
+        Runs on the *task* thread like ``process_terrain``.
+        """
+        if (terrain_params.output_mode == "raster" or terrain_params.penetration_areas
+                or terrain_params.isoline_levels):
+            logger.warning("Aerodrome batch: clearance raster, penetration areas and "
+                           "isolines are only produced for single runway runs")
+        clip_buffer = dtm_clip_buffer(terrain_params.dtm_post_spacing)
+        geometries = [end.geometry for end in ends]
+        extents = np.array([geometry.extent(clip_buffer) for geometry in geometries])
+        window = (extents[:, 0].min(), extents[:, 1].min(),
+                  extents[:, 2].max(), extents[:, 3].max())
+        dataset = open_dtm_mosaic(dtm_inputs["sources"])
+
+        terrain_layer = self._create_terrain_layer(
+            dtm_inputs["crs"], [QgsField('runway_end', FIELD_STRING)]
+        )
+        accumulator = FeatureAccumulator()
+        next_id = [1]
+
+        def _write_tile(k: int, result) -> None:
+            if terrain_params.penetrating_only:
+                result = result.subset(result.penetrates)
+            next_id[0] = self._add_terrain_features(
+                terrain_layer, result, terrain_params.source, accumulator, next_id[0],
+                (ends[k].name,),
+            )
+
+        reader = TileReader(dataset.GetDescription())
+        skipped_cells = 0
+        if terrain_params.penetrating_only:
+            reader, skipped_cells = surfaces_tile_reader(
+                dataset, window, geometries,
+                vertical_tolerance=terrain_params.vertical_tolerance_m,
+                clip_buffer=clip_buffer,
+                workers=terrain_params.workers,
+            )
+            task.check_canceled()
+
+        tiles = list(tile_offsets(dataset, window))
+        summaries = analyze_terrain_surfaces(
+            task.iterate(tiles, len(tiles)),
+            reader,
+            geometries,
+            vertical_tolerance=terrain_params.vertical_tolerance_m,
+            clip_buffer=clip_buffer,
+            workers=terrain_params.workers,
+            on_tile=_write_tile,
+            geotransform=dataset.GetGeoTransform(),
+        )
+        accumulator.flush()
+        self._apply_terrain_style(terrain_layer)
+        task.add_layers([terrain_layer])
+        return {
+            "layers": [terrain_layer],
+            "summaries": summaries,
+            "skipped_cells": skipped_cells,
+        }
+
+    @staticmethod
+    def _obstacles_layer(obs_params: ObstacleParams, use_selected_feature: bool):
+        """The obstacles layer of *obs_params*; ``ValueError`` if it cannot be analysed."""
         obstacles_layer = QgsProject.instance().mapLayer(obs_params.obstacles_layer_id)
         if not obstacles_layer:
             raise ValueError("Selected obstacles layer not found!")
-
         field_names = [f.name() for f in obstacles_layer.fields()]
         if obs_params.obstacle_height_field and obs_params.obstacle_height_field not in field_names:
             raise ValueError(
                 f"Height field '{obs_params.obstacle_height_field}' not found in obstacles layer!"
             )
-
         if use_selected_feature:
-            features = obstacles_layer.selectedFeatures()
-            if not features:
+            if obstacles_layer.selectedFeatureCount() == 0:
                 raise ValueError(
                     "No obstacles selected. Please select obstacles or uncheck "
                     "'Use selected features only'."
                 )
+        elif obstacles_layer.featureCount() == 0:
+            raise ValueError("No obstacles found in layer.")
+        return obstacles_layer
+
+    def _analyze_projected_obstacles(
+        self, analyzer, obs_params: ObstacleParams, inputs: dict, window, footprint, der_point,
+        der_elevation, takeoff_azimuth, climb_gradient, tofpa_surface_layer, task,
+    ) -> dict:
+        """Batch path: cached runway-frame projection plus array comparisons.
+
+        Results are kept per obstacles layer (``core.incremental``).  When
+        the previous run used the same parameters and its layers are still
+        in the project, only the obstacles added, changed or removed since
+        are analysed, their features are replaced in those layers and
+        shadows are re-evaluated in the angular sectors around them.  Large
+        sets are evaluated by the plugin's ``ObstaclePool`` when
+        ``obs_params.workers`` > 1.
+
+        Stage progress: reading the survey (on a cache miss) up to 40 %,
+        evaluation to 50 %, then the output features in chunks.  The
+        previous layers are in the project, so the edits of an incremental
+        run are returned (``deferred``: removals and a non-flushing
+        accumulator) for ``_commit_obstacles`` to apply on the main thread.
+        """
+        frame = RunwayFrame(der_point.x(), der_point.y(), takeoff_azimuth)
+        projection, read = self._read_obstacles(obs_params, inputs, frame, task, 0.4)
+        mask = projection.in_rectangle(
+            window.xMinimum(), window.yMinimum(), window.xMaximum(), window.yMaximum()
+        )
+        if inputs["selected"] is not None:
+            mask &= np.isin(projection.ids, inputs["selected"])
+        projection = projection.subset(mask)
+
+        projection, ground = self._projection_ground(projection, inputs["ground"])
+        task.check_canceled()
+
+        takeoff = None
+        if obs_params.enable_shadow_analysis:
+            point = analyzer.get_takeoff_reference_point(tofpa_surface_layer)
+            if point is not None:
+                takeoff = (point.x(), point.y(), point.z() if point.is3D() else 0.0)
+        key = (
+            obs_params.obstacle_height_field or "", frame, footprint, obs_params.obstacle_buffer,
+            obs_params.min_obstacle_height, der_elevation, climb_gradient, obs_params.heights_agl,
+            takeoff, obs_params.shadow_tolerance if takeoff else None,
+        )
+        signatures = obstacle_signatures(projection.x, projection.y, projection.height, ground)
+
+        previous, layers_info = inputs["previous"]
+        deferred = None
+        if previous is None or previous.key != key:
+            previous, layers_info = None, analyzer.create_layers(inputs["crs"])
+            task.add_layers(layers_info.values())
+            changes = ObstacleChanges.all_added(len(projection))
+            accumulator = FeatureAccumulator()
         else:
-            features = list(obstacles_layer.getFeatures())
+            changes = diff_obstacles(
+                previous.records.ids, previous.signatures, projection.ids, signatures
+            )
+            stale = np.concatenate((changes.changed_old, changes.removed))
+            accumulator = FeatureAccumulator(max_pending=None)
+            deferred = ([(layers_info, previous.records.ids[stale])], accumulator)
 
-        if not features:
-            raise ValueError("No obstacles found in layer.")
+        fresh = changes.fresh
+        subset = projection.subset(fresh)
+        self._obstacle_pool.workers = obs_params.workers
+        results = analyzer.analyze_projection(
+            subset, footprint, obs_params.obstacle_buffer, obs_params.min_obstacle_height,
+            der_elevation, climb_gradient,
+            ground_elevations=None if ground is None else ground[fresh],
+            pool=self._obstacle_pool,
+        )
+        task.set_progress(0.5)
+        fresh_records = analyzer.write_results(
+            subset, results, obs_params.obstacle_buffer, layers_info, accumulator,
+            on_progress=task.progress_callback(0.5, 0.95),
+        )
+        state = merge_state(key, previous, changes, signatures, fresh_records)
+        records = state.records
 
-        analyzer = ObstacleAnalyzer()
-        layers_info = analyzer.create_layers(obstacles_layer.crs())
+        if takeoff is not None:
+            task.check_canceled()
+            touched = None
+            if previous is not None:
+                touched = np.concatenate((
+                    bearings(projection.x[fresh], projection.y[fresh], *takeoff[:2]),
+                    bearings(previous.records.x[stale], previous.records.y[stale], *takeoff[:2]),
+                ))
+            targets, shadowing = shadow_sectors(
+                records, takeoff, obs_params.shadow_tolerance, touched
+            )
+            records.set_shadows(targets, shadowing)
+            if previous is not None:
+                deferred[0].append((
+                    {name: layers_info[name] for name in ("shadowed_layer", "visible_layer")},
+                    records.ids[targets],
+                ))
+            # BUG-02 fix: use actual buffer, not hardcoded 10.0
+            analyzer.apply_shadow_results(
+                layers_info, records, obs_params.obstacle_buffer, accumulator, indices=targets
+            )
+        if deferred is None:
+            accumulator.flush()
+
+        sweep = None
+        if obs_params.gradient_sweep:
+            along, _cross = frame.to_local(records.x, records.y)
+            sweep = gradient_sweep(
+                along, records.z, records.in_footprint, der_elevation, obs_params.gradient_sweep,
+            )
+            # Table rows refer to obstacles by feature id
+            sweep = (sweep, records.ids)
+
+        run = self._obstacle_run_summary(
+            layers_info, records, sweep, None if previous is None else len(changes)
+        )
+        run.update(state=state, deferred=deferred, projection=read)
+        return run
+
+    @staticmethod
+    def _obstacle_run_summary(layers_info: dict, records, sweep, updated=None) -> dict:
+        """Result of an obstacle pass; *updated* counts the obstacles an
+        incremental run re-analysed (``None`` for a full run)."""
+        critical = int(np.count_nonzero(records.critical))
+        shadowed = int(np.count_nonzero(records.shadowed))
+        return {
+            "layers_info": layers_info,
+            "records": records,
+            "total_obstacles": len(records),
+            "critical_obstacles": critical,
+            "shadowed_obstacles": shadowed,
+            "visible_obstacles": critical - shadowed,
+            "updated_obstacles": updated,
+            "gradient_sweep": sweep,
+        }
+
+    @staticmethod
+    def _obstacle_layers_alive(layers_info: dict) -> bool:
+        """Whether the result layers of a previous run can still be patched."""
+        project = QgsProject.instance()
+        for name, layer in layers_info.items():
+            try:
+                in_project = project.mapLayer(layer.id()) is not None
+                # Empty shadow layers are never added to the project
+                if not in_project and (name not in ("shadowed_layer", "visible_layer")
+                                       or layer.featureCount() > 0):
+                    return False
+            except RuntimeError:  # removed from the project, C++ layer deleted
+                return False
+        return True
+
+    def _analyze_obstacle_features(
+        self, analyzer, obs_params: ObstacleParams, inputs: dict, request, tofpa_surface_layer,
+        surface_context, der_point, der_elevation, takeoff_azimuth, climb_gradient, task,
+    ) -> dict:
+        """Per-feature path (``analyze_single``), used without runway-frame context.
+
+        Progress follows the features read, against the layer's feature
+        count.
+        """
+        layers_info = analyzer.create_layers(inputs["crs"])
+        task.add_layers(layers_info.values())
+        accumulator = FeatureAccumulator()
+
+        features = task.iterate(
+            inputs["source"].getFeatures(request), inputs["feature_count"], 0.0, 0.9
+        )
+        if inputs["selected"] is not None:
+            selected = set(inputs["selected"].tolist())
+            features = (f for f in features if f.id() in selected)
 
-        critical_obstacles = 0
-        total_obstacles = 0
-        obstacles_data: list[dict] = []
+        ground = None
+        if obs_params.heights_agl:
+            features = list(features)
+            bases = [
+                obstacle_base_point(f.geometry())
+                if f.hasGeometry() and not f.geometry().isEmpty() else QgsPointXY(np.nan, np.nan)
+                for f in features
+            ]
+            ground = inputs["ground"]([p.x() for p in bases], [p.y() for p in bases])
 
-        for feature in features:
+        rows = []
+        for index, feature in enumerate(features):
             try:
                 obstacle_info = analyzer.analyze_single(
                     feature,
@@ -648,43 +1830,127 @@ class TOFPA:
                     der_elevation=der_elevation,
                     takeoff_azimuth=takeoff_azimuth,
                     climb_gradient=climb_gradient,
+                    surface_context=surface_context,
+                    accumulator=accumulator,
+                    ground_elevation=None if ground is None else ground[index],
                 )
-                total_obstacles += 1
-                if obstacle_info["is_critical"]:
-                    critical_obstacles += 1
-                obstacles_data.append({
-                    "feature": feature,
-                    "obstacle_info": obstacle_info,
-                    "point": obstacle_info["obstacle_point"],
-                    "height": obstacle_info["height"],
-                    "is_critical": obstacle_info["is_critical"],
-                })
+                point = obstacle_info["obstacle_point"]
+                rows.append((
+                    feature.id(), point.x(), point.y(), obstacle_info["height"],
+                    obstacle_info["intersection_type"] != "None",
+                    obstacle_info["is_critical"],
+                    obstacle_info["penetration_m"],
+                    obstacle_info["required_gradient"],
+                ))
             except Exception as exc:
                 logger.warning("Failed to process obstacle feature %s: %s", feature.id(), exc)
+        records = ObstacleRecords.from_rows(rows)
 
-        shadow_results: dict = {"shadowed_obstacles": [], "visible_obstacles": obstacles_data}
         if obs_params.enable_shadow_analysis:
-            shadow_results = analyzer.perform_shadow_analysis(
-                obstacles_data, tofpa_surface_layer, obs_params.shadow_tolerance
+            analyzer.perform_shadow_analysis(
+                records, tofpa_surface_layer, obs_params.shadow_tolerance
             )
             # BUG-02 fix: use actual buffer, not hardcoded 10.0
-            analyzer.apply_shadow_results(layers_info, shadow_results, obs_params.obstacle_buffer)
+            analyzer.apply_shadow_results(
+                layers_info, records, obs_params.obstacle_buffer, accumulator
+            )
+        accumulator.flush()
+        run = self._obstacle_run_summary(layers_info, records, None)
+        run["reset_previous"] = True
+        return run
 
-        analyzer.finalize_layers(layers_info)
+    def _create_gradient_sweep_layer(self, sweep, ids) -> QgsVectorLayer:
+        """``TOFPA_Gradient_Sweep`` table: penetration statistics per climb gradient."""
+        layer = QgsVectorLayer("None", "TOFPA_Gradient_Sweep", "memory")
+        layer.dataProvider().addAttributes([
+            QgsField('gradient_pct', FIELD_DOUBLE),
+            QgsField('penetrating', FIELD_INT),
+            QgsField('max_penetration_m', FIELD_DOUBLE),
+            QgsField('worst_obstacle_id', FIELD_INT),
+        ])
+        layer.updateFields()
+        features = []
+        for i, gradient in enumerate(sweep.gradients):
+            worst = int(sweep.worst_index[i])
+            feature = QgsFeature(layer.fields())
+            feature.setAttributes([
+                round(float(gradient) * 100.0, 3),
+                int(sweep.penetrating[i]),
+                float(sweep.max_penetration[i]),
+                int(ids[worst]) if worst >= 0 else None,
+            ])
+            features.append(feature)
+        layer.dataProvider().addFeatures(features)
+        return layer
 
-        return {
-            "layers": [
-                layers_info["critical_layer"],
-                layers_info["safe_layer"],
-                layers_info["buffer_layer"],
-                layers_info.get("shadowed_layer"),
-                layers_info.get("visible_layer"),
-            ],
-            "total_obstacles": total_obstacles,
-            "critical_obstacles": critical_obstacles,
-            "shadow_results": shadow_results,
-        }
+    @staticmethod
+    def _projection_ground(projection, sample_ground):
+        """``(projection, ground)``: ground under the projected obstacles from
+        the ``_ground_sampler`` *sample_ground* (``None`` without
+        ``heights_agl``), obstacles off the DTM dropped."""
+        if sample_ground is None:
+            return projection, None
+        ground = sample_ground(projection.x, projection.y)
+        missing = np.isnan(ground)
+        for fid in projection.ids[missing]:
+            logger.warning("Failed to process obstacle feature %s: %s",
+                           fid, "No DTM elevation under the obstacle")
+        return projection.subset(~missing), ground[~missing]
+
+    def _ground_sampler(self, obstacles_layer, obs_params: ObstacleParams):
+        """``sample(xs, ys)``: ground DTM elevation under obstacle bases (layer CRS).
 
+        The DTM layer is resolved and checked here, on the main thread; as
+        in the Processing algorithms it must share the obstacle layer CRS.
+        The sampler opens the raster through GDAL on its first call, keeps
+        it for later calls and can run on a task thread.
+        """
+        dtm_layer = QgsProject.instance().mapLayer(obs_params.ground_dtm_layer_id)
+        if not dtm_layer:
+            raise ValueError("Selected ground DTM layer not found!")
+        if dtm_layer.providerType() != "gdal":
+            raise ValueError(f"DTM layer '{dtm_layer.name()}' is not a GDAL raster!")
+        if dtm_layer.crs() != obstacles_layer.crs():
+            raise ValueError(
+                f"Ground DTM must be in the CRS of the obstacle layer "
+                f"({obstacles_layer.crs().authid()})"
+            )
+        source = dtm_layer.source()
+        dataset = None
+
+        def sample(xs, ys):
+            nonlocal dataset
+            if dataset is None:
+                dataset = open_dtm(source)
+            return sample_dtm(dataset, xs, ys)
+        return sample
+
+    def _obstacles_window_request(
+        self,
+        inputs: dict,
+        tofpa_surface_layer,
+        surface_extent,
+        obs_params: ObstacleParams,
+    ) -> QgsFeatureRequest:
+        """Build the windowed, height-only request used to stream obstacles."""
+        window = QgsRectangle(surface_extent)
+        window.grow(obs_params.obstacle_buffer)
+        if tofpa_surface_layer.crs() != inputs["crs"]:
+            transform = QgsCoordinateTransform(
+                tofpa_surface_layer.crs(), inputs["crs"], inputs["transform_context"]
+            )
+            window = transform.transformBoundingBox(window)
+
+        request = QgsFeatureRequest().setFilterRect(window)
+        height_field = obs_params.obstacle_height_field
+        request.setSubsetOfAttributes(
+            [height_field] if height_field else [], inputs["fields"]
+        )
+        logger.debug(
+            "Streaming obstacles in window %s (provider spatial index: %s)",
+            window.toString(), inputs["spatial_index"],
+        )
+        return request
 
     def export_to_kmz(self, layers: list) -> bool:
         """Export layers to KMZ format for Google Earth with proper styling."""
@@ -6,11 +6,12 @@ import os
 
 from qgis.PyQt import uic
 from qgis.PyQt.QtCore import pyqtSignal
-from qgis.PyQt.QtWidgets import QDockWidget, QScrollArea
-from .utils.compat import (  # MIGA-01, MIGA-02
+from qgis.PyQt.QtWidgets import QDockWidget, QListWidgetItem, QScrollArea
+from .utils.compat import (  # MIGA-01, MIGA-02, MIGA-05
     FIELD_INT, FIELD_DOUBLE,
     WKB_LINE_GEOM, WKB_POINT_GEOM, WKB_POLYGON_GEOM,
-    LAYER_FILTER_VECTOR,
+    LAYER_FILTER_VECTOR, LAYER_FILTER_RASTER, FILE_WIDGET_SAVE,
+    ITEM_CHECKABLE, CHECKED, UNCHECKED, USER_ROLE,
 )
 
 FORM_CLASS, _ = uic.loadUiType(os.path.join(
@@ -45,6 +46,9 @@ QPushButton#calculateButton:disabled {
     background-color: #888888;
     color: #cccccc;
 }
+QPushButton#calculateButton[running="true"] {
+    background-color: #c0392b;
+}
 QPushButton#cancelButton {
     padding: 4px 12px;
 }
@@ -58,6 +62,7 @@ QDoubleSpinBox[invalid="true"] {
 class TofpaDockWidget(QDockWidget, FORM_CLASS):
     closingPlugin = pyqtSignal()
     calculateClicked = pyqtSignal()
+    cancelClicked = pyqtSignal()
     closeClicked = pyqtSignal()
 
     def __init__(self, iface, parent=None):
@@ -98,8 +103,17 @@ class TofpaDockWidget(QDockWidget, FORM_CLASS):
         self.obstaclesLayerCombo.setFilters(LAYER_FILTER_VECTOR)
         self.obstaclesLayerCombo.setExceptedLayerList([])
         
+        # DTM Layer: raster layers only
+        self.dtmLayerCombo.setFilters(LAYER_FILTER_RASTER)
+        self.obstacleGroundDtmCombo.setFilters(LAYER_FILTER_RASTER)
+
+        # Clearance raster output file (terrain raster mode)
+        self.terrainRasterFileWidget.setStorageMode(FILE_WIDGET_SAVE)
+        self.terrainRasterFileWidget.setFilter("GeoTIFF (*.tif *.tiff)")
+
         # Apply geometry-specific filters
         self._apply_geometry_filters()
+        self._populate_dtm_fallbacks()
         
         # Connect to layer changes to refresh filters and obstacle field combo
         try:
@@ -114,6 +128,12 @@ class TofpaDockWidget(QDockWidget, FORM_CLASS):
         
         # Connect checkbox to enable/disable obstacles group
         self.includeObstaclesCheckBox.toggled.connect(self._toggle_obstacles_group)
+
+        # Connect checkbox to enable/disable terrain group
+        self.includeTerrainCheckBox.toggled.connect(self._toggle_terrain_group)
+        self.obstacleHeightsAglCheckBox.toggled.connect(self._toggle_ground_dtm)
+        self.aerodromeBatchCheckBox.toggled.connect(self._toggle_aerodrome_batch)
+        self.terrainOutputCombo.currentIndexChanged.connect(self._toggle_terrain_output)
         
         # Set default values from original script
         self.initialWidthSpin.setValue(180.0)
@@ -125,11 +145,16 @@ class TofpaDockWidget(QDockWidget, FORM_CLASS):
         self.exportToAixmCheckBox.setChecked(False)
         self.useSelectedFeatureCheckBox.setChecked(True)
         self.directionCombo.setCurrentIndex(0)  # Default to "Start to End (0)"
+        self.aerodromeBatchCheckBox.setChecked(False)
         
         # Set default values for obstacles
         self.includeObstaclesCheckBox.setChecked(False)
         self.obstacleBufferSpin.setValue(10.0)
         self.minObstacleHeightSpin.setValue(5.0)
+        self.obstacleHeightsAglCheckBox.setChecked(False)
+        self._toggle_ground_dtm(False)
+        self.gradientSweepEdit.setText("")
+        self.obstacleWorkersSpin.setValue(os.cpu_count() or 1)
         
         # Set default values for shadow analysis
         self.enableShadowAnalysisCheckBox.setChecked(False)
@@ -138,9 +163,23 @@ class TofpaDockWidget(QDockWidget, FORM_CLASS):
         # Connect shadow analysis checkbox to enable/disable shadow tolerance control
         self.enableShadowAnalysisCheckBox.toggled.connect(self._toggle_shadow_controls)
         
+        # Set default values for terrain analysis (TOFPA_analysis model defaults)
+        self.includeTerrainCheckBox.setChecked(False)
+        self.dtmPostSpacingSpin.setValue(0.0)
+        self.verticalToleranceSpin.setValue(0.0)
+        self.terrainSourceEdit.setText("SRTM")
+        self.terrainPenetratingOnlyCheckBox.setChecked(False)
+        self.terrainWorkersSpin.setValue(os.cpu_count() or 1)
+        self.terrainOutputCombo.setCurrentIndex(0)  # Default to the model's point layer
+        self.terrainAreasCheckBox.setChecked(False)
+        self.terrainIsolinesEdit.setText("")
+        self.terrainCacheSpin.setValue(2048)
+
         # Initialize obstacles group as disabled
         self._toggle_obstacles_group(False)
         self._toggle_shadow_controls(False)
+        self._toggle_terrain_group(False)
+        self._toggle_terrain_output(0)
         
         # UI-08: Connect inline width validation
         self.initialWidthSpin.valueChanged.connect(self._validate_widths)
@@ -195,10 +234,49 @@ class TofpaDockWidget(QDockWidget, FORM_CLASS):
         self.thresholdLayerCombo.setExceptedLayerList(non_point_layers)
         self.obstaclesLayerCombo.setExceptedLayerList(non_obstacle_layers)
 
+    def _populate_dtm_fallbacks(self):
+        """Sync the fallback DTM list with the project's raster layers.
+
+        Keeps the order and check state of layers already listed; new raster
+        layers are appended unchecked.
+        """
+        from qgis.core import QgsProject, QgsRasterLayer
+
+        rasters = {
+            layer.id(): layer for layer in QgsProject.instance().mapLayers().values()
+            if isinstance(layer, QgsRasterLayer)
+        }
+        listed = []
+        for row in reversed(range(self.dtmFallbackList.count())):
+            item = self.dtmFallbackList.item(row)
+            layer_id = item.data(USER_ROLE)
+            if layer_id in rasters:
+                item.setText(rasters[layer_id].name())
+                listed.append(layer_id)
+            else:
+                self.dtmFallbackList.takeItem(row)
+        for layer_id, layer in rasters.items():
+            if layer_id in listed:
+                continue
+            item = QListWidgetItem(layer.name())
+            item.setData(USER_ROLE, layer_id)
+            item.setFlags(item.flags() | ITEM_CHECKABLE)
+            item.setCheckState(UNCHECKED)
+            self.dtmFallbackList.addItem(item)
+
+    def _dtm_fallback_ids(self):
+        """Checked fallback DTM layer ids, in list (priority) order."""
+        return [
+            self.dtmFallbackList.item(row).data(USER_ROLE)
+            for row in range(self.dtmFallbackList.count())
+            if self.dtmFallbackList.item(row).checkState() == CHECKED
+        ]
+
     def _on_layers_changed(self):
         """Refresh geometry filters when layers are added or removed"""
         try:
             self._apply_geometry_filters()
+            self._populate_dtm_fallbacks()
             # Also update obstacle fields if obstacles layer is selected
             self._update_obstacle_fields()
         except Exception:
@@ -256,7 +334,8 @@ class TofpaDockWidget(QDockWidget, FORM_CLASS):
                 spin.setProperty("invalid", invalid)
                 spin.style().unpolish(spin)
                 spin.style().polish(spin)
-            self.calculateButton.setEnabled(not invalid)
+            # A running calculation can always be cancelled
+            self.calculateButton.setEnabled(not invalid or bool(self.calculateButton.property("running")))
             self.maxWidthSpin.setToolTip(
                 "Maximum width must be \u2265 initial width" if invalid
                 else "Maximum width of the TOFPA surface at the end of the climb. Typical: 1800 m"
@@ -279,6 +358,35 @@ class TofpaDockWidget(QDockWidget, FORM_CLASS):
         except Exception:
             logger.debug("Toggle obstacles group failed", exc_info=True)
 
+    def _toggle_ground_dtm(self, enabled):
+        """Enable the ground DTM selector only for AGL obstacle heights"""
+        try:
+            self.obstacleGroundDtmLabel.setEnabled(enabled)
+            self.obstacleGroundDtmCombo.setEnabled(enabled)
+        except Exception:
+            logger.debug("Toggle ground DTM failed", exc_info=True)
+
+    def _toggle_aerodrome_batch(self, enabled):
+        """Batch runs cover both directions: the direction selector does not apply"""
+        try:
+            self.directionCombo.setEnabled(not enabled)
+        except Exception:
+            logger.debug("Toggle aerodrome batch failed", exc_info=True)
+
+    def _toggle_terrain_group(self, enabled):
+        """Enable or disable the terrain group based on checkbox state"""
+        try:
+            self.terrainGroup.setEnabled(enabled)
+        except Exception:
+            logger.debug("Toggle terrain group failed", exc_info=True)
+
+    def _toggle_terrain_output(self, index):
+        """Enable the raster file selector only in clearance raster mode"""
+        try:
+            self.terrainRasterFileWidget.setEnabled(index == 1)
+        except Exception:
+            logger.debug("Toggle terrain output failed", exc_info=True)
+
     def _toggle_shadow_controls(self, enabled):
         """Enable or disable shadow analysis controls based on checkbox state"""
         try:
@@ -299,8 +407,34 @@ class TofpaDockWidget(QDockWidget, FORM_CLASS):
             logger.debug("Toggle shadow controls failed", exc_info=True)
 
     def on_calculate_clicked(self):
-        """Emit signal when calculate button is clicked"""
-        self.calculateClicked.emit()
+        """Emit signal when calculate button is clicked (cancel while a run is in progress)"""
+        if self.calculateButton.property("running"):
+            self.cancelClicked.emit()
+        else:
+            self.calculateClicked.emit()
+
+    def set_running(self, running):
+        """Turn the Calculate button into Cancel while a calculation runs in the background"""
+        self.calculateButton.setProperty("running", running)
+        self.calculateButton.style().unpolish(self.calculateButton)
+        self.calculateButton.style().polish(self.calculateButton)
+        if running:
+            self.calculateButton.setText("Cancel")
+            self.calculateButton.setToolTip("Cancel the running TOFPA calculation")
+        else:
+            self.calculateButton.setText("Calculate")
+            self.calculateButton.setToolTip("Run the TOFPA surface calculation (Enter)")
+            self._validate_widths()
+
+    def set_progress(self, progress):
+        """Show the progress (0-100) of the running calculation on the Cancel button"""
+        if self.calculateButton.property("running"):
+            self.calculateButton.setText(f"Cancel ({progress:.0f}%)")
+
+    def set_stage(self, stage):
+        """Show the stage of the running calculation in the Cancel button tooltip"""
+        if self.calculateButton.property("running"):
+            self.calculateButton.setToolTip(f"{stage}... click to cancel the calculation")
     
     def on_close_clicked(self):
         """Emit signal when close button is clicked"""
@@ -321,6 +455,7 @@ class TofpaDockWidget(QDockWidget, FORM_CLASS):
             'runway_layer_id': self.runwayLayerCombo.currentLayer().id() if self.runwayLayerCombo.currentLayer() else None,
             'threshold_layer_id': self.thresholdLayerCombo.currentLayer().id() if self.thresholdLayerCombo.currentLayer() else None,
             'use_selected_feature': self.useSelectedFeatureCheckBox.isChecked(),
+            'aerodrome_batch': self.aerodromeBatchCheckBox.isChecked(),
             'export_kmz': self.exportToKmzCheckBox.isChecked(),
             'export_aixm': self.exportToAixmCheckBox.isChecked(),
             # New obstacles parameters
@@ -329,11 +464,29 @@ class TofpaDockWidget(QDockWidget, FORM_CLASS):
             'obstacle_height_field': self.obstacleHeightFieldCombo.currentText() if self.includeObstaclesCheckBox.isChecked() else None,
             'obstacle_buffer': self.obstacleBufferSpin.value(),
             'min_obstacle_height': self.minObstacleHeightSpin.value(),
+            'obstacle_heights_agl': self.obstacleHeightsAglCheckBox.isChecked(),
+            'obstacle_gradient_sweep': self.gradientSweepEdit.text(),
+            'obstacle_workers': self.obstacleWorkersSpin.value(),
+            'obstacle_ground_dtm_id': self.obstacleGroundDtmCombo.currentLayer().id() if self.obstacleGroundDtmCombo.currentLayer() and self.obstacleHeightsAglCheckBox.isChecked() else None,
             # New shadow analysis parameters
             'enable_shadow_analysis': self.enableShadowAnalysisCheckBox.isChecked() and self.includeObstaclesCheckBox.isChecked(),
             'shadow_tolerance': self.shadowToleranceSpin.value(),
             # Contour generation (issue #27)
             'contour_interval_m': int(round(self.contourIntervalSpin.value())),
+            # Terrain analysis parameters
+            'include_terrain': self.includeTerrainCheckBox.isChecked(),
+            'dtm_layer_id': self.dtmLayerCombo.currentLayer().id() if self.dtmLayerCombo.currentLayer() and self.includeTerrainCheckBox.isChecked() else None,
+            'dtm_fallback_ids': self._dtm_fallback_ids() if self.includeTerrainCheckBox.isChecked() else [],
+            'dtm_post_spacing': self.dtmPostSpacingSpin.value(),
+            'vertical_tolerance_m': self.verticalToleranceSpin.value(),
+            'terrain_source': self.terrainSourceEdit.text(),
+            'terrain_penetrating_only': self.terrainPenetratingOnlyCheckBox.isChecked(),
+            'terrain_workers': self.terrainWorkersSpin.value(),
+            'terrain_output_mode': 'raster' if self.terrainOutputCombo.currentIndex() == 1 else 'points',
+            'terrain_raster_path': self.terrainRasterFileWidget.filePath(),
+            'terrain_penetration_areas': self.terrainAreasCheckBox.isChecked(),
+            'terrain_isoline_levels': self.terrainIsolinesEdit.text(),
+            'terrain_cache_mb': self.terrainCacheSpin.value(),
         }
 
     def closeEvent(self, event):
@@ -13,7 +13,7 @@ Uso::
 
     from .utils.compat import FIELD_INT, FIELD_DOUBLE, FIELD_STRING
     from .utils.compat import WKB_POLYGON_GEOM, WKB_LINE_GEOM, WKB_POINT_GEOM
-    from .utils.compat import LAYER_FILTER_VECTOR
+    from .utils.compat import LAYER_FILTER_VECTOR, LAYER_FILTER_RASTER
 
 Referencias:
     - https://www.riverbankcomputing.com/static/Docs/PyQt6/pyqt5_differences.html
@@ -52,12 +52,14 @@ try:
     WKB_LINE_GEOM: int = QgsWkbTypes.GeometryType.LineGeometry        # type: ignore[attr-defined]
     WKB_POINT_GEOM: int = QgsWkbTypes.GeometryType.PointGeometry      # type: ignore[attr-defined]
     LAYER_FILTER_VECTOR: int = QgsMapLayerProxyModel.Filter.VectorLayer  # type: ignore[attr-defined]
+    LAYER_FILTER_RASTER: int = QgsMapLayerProxyModel.Filter.RasterLayer  # type: ignore[attr-defined]
 except AttributeError:
     # QGIS 3.x / PyQt5: acceso sin scope
     WKB_POLYGON_GEOM: int = QgsWkbTypes.PolygonGeometry         # type: ignore[assignment, attr-defined]
     WKB_LINE_GEOM: int = QgsWkbTypes.LineGeometry               # type: ignore[assignment, attr-defined]
     WKB_POINT_GEOM: int = QgsWkbTypes.PointGeometry             # type: ignore[assignment, attr-defined]
     LAYER_FILTER_VECTOR: int = QgsMapLayerProxyModel.VectorLayer  # type: ignore[assignment, attr-defined]
+    LAYER_FILTER_RASTER: int = QgsMapLayerProxyModel.RasterLayer  # type: ignore[assignment, attr-defined]
 
 # ---------------------------------------------------------------------------
 # MIGA-05: Constantes de flags de Qt
@@ -70,6 +72,59 @@ except AttributeError:
     # QGIS 3.x / PyQt5: acceso sin scope
     DOCK_RIGHT = Qt.RightDockWidgetArea  # type: ignore[attr-defined]
 
+try:
+    # QGIS 4.0 / PyQt6: flags, estado de check y roles de elementos con scope
+    ITEM_CHECKABLE = Qt.ItemFlag.ItemIsUserCheckable  # type: ignore[attr-defined]
+    CHECKED = Qt.CheckState.Checked                   # type: ignore[attr-defined]
+    UNCHECKED = Qt.CheckState.Unchecked               # type: ignore[attr-defined]
+    USER_ROLE = Qt.ItemDataRole.UserRole              # type: ignore[attr-defined]
+except AttributeError:
+    # QGIS 3.x / PyQt5: acceso sin scope
+    ITEM_CHECKABLE = Qt.ItemIsUserCheckable  # type: ignore[attr-defined]
+    CHECKED = Qt.Checked                     # type: ignore[attr-defined]
+    UNCHECKED = Qt.Unchecked                 # type: ignore[attr-defined]
+    USER_ROLE = Qt.UserRole                  # type: ignore[attr-defined]
+
+# ---------------------------------------------------------------------------
+# MIGA-02: Modo de QgsFileWidget (sin scope en PyQt5 → con scope en PyQt6)
+# ---------------------------------------------------------------------------
+from qgis.gui import QgsFileWidget  # noqa: E402
+
+try:
+    # QGIS 4.0 / PyQt6: acceso con scope completo de StorageMode
+    FILE_WIDGET_SAVE = QgsFileWidget.StorageMode.SaveFile  # type: ignore[attr-defined]
+except AttributeError:
+    # QGIS 3.x / PyQt5: acceso sin scope
+    FILE_WIDGET_SAVE = QgsFileWidget.SaveFile  # type: ignore[attr-defined]
+
+# ---------------------------------------------------------------------------
+# MIGA-07: Enums de Processing
+#           (QgsProcessing.TypeVector* y enums de clase en QGIS < 3.36 →
+#            Qgis.ProcessingSourceType / Qgis.Processing*Type con scope)
+# ---------------------------------------------------------------------------
+from qgis.core import Qgis  # noqa: E402
+
+try:
+    # QGIS >= 3.36 y QGIS 4.0: enums con scope en Qgis
+    SOURCE_VECTOR_POINT = Qgis.ProcessingSourceType.VectorPoint      # type: ignore[attr-defined]
+    SOURCE_VECTOR_LINE = Qgis.ProcessingSourceType.VectorLine        # type: ignore[attr-defined]
+    SOURCE_VECTOR_POLYGON = Qgis.ProcessingSourceType.VectorPolygon  # type: ignore[attr-defined]
+    NUMBER_DOUBLE = Qgis.ProcessingNumberParameterType.Double        # type: ignore[attr-defined]
+    NUMBER_INTEGER = Qgis.ProcessingNumberParameterType.Integer      # type: ignore[attr-defined]
+    FIELD_TYPE_NUMERIC = Qgis.ProcessingFieldParameterDataType.Numeric  # type: ignore[attr-defined]
+except AttributeError:
+    # QGIS 3.30 – 3.34: constantes de QgsProcessing y de cada parámetro
+    from qgis.core import (  # noqa: E402
+        QgsProcessing, QgsProcessingParameterField, QgsProcessingParameterNumber,
+    )
+
+    SOURCE_VECTOR_POINT = QgsProcessing.TypeVectorPoint          # type: ignore[attr-defined]
+    SOURCE_VECTOR_LINE = QgsProcessing.TypeVectorLine            # type: ignore[attr-defined]
+    SOURCE_VECTOR_POLYGON = QgsProcessing.TypeVectorPolygon      # type: ignore[attr-defined]
+    NUMBER_DOUBLE = QgsProcessingParameterNumber.Double          # type: ignore[attr-defined]
+    NUMBER_INTEGER = QgsProcessingParameterNumber.Integer        # type: ignore[attr-defined]
+    FIELD_TYPE_NUMERIC = QgsProcessingParameterField.Numeric     # type: ignore[attr-defined]
+
 # ---------------------------------------------------------------------------
 # MIGA-03: exec_() → exec()  (PyQt6 eliminó el alias con guión bajo)
 # Este cambio se aplica directamente en el código de cada diálogo/loop,
@@ -89,6 +144,20 @@ __all__ = [
     "WKB_POINT_GEOM",
     # Filtro de capa
     "LAYER_FILTER_VECTOR",
+    "LAYER_FILTER_RASTER",
     # Flags de Qt
     "DOCK_RIGHT",
+    "ITEM_CHECKABLE",
+    "CHECKED",
+    "UNCHECKED",
+    "USER_ROLE",
+    # Modo de QgsFileWidget
+    "FILE_WIDGET_SAVE",
+    # Enums de Processing
+    "SOURCE_VECTOR_POINT",
+    "SOURCE_VECTOR_LINE",
+    "SOURCE_VECTOR_POLYGON",
+    "NUMBER_DOUBLE",
+    "NUMBER_INTEGER",
+    "FIELD_TYPE_NUMERIC",
 ]
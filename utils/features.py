@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+TOFPA output features: surfaces, reference lines, contours and terrain points.
+
+Field lists and ``QgsFeature`` builders shared by the panel (memory layers)
+and the Processing algorithms (feature sinks), so both write the same
+schema.  Obstacle outputs are built by ``core.obstacles.ObstacleAnalyzer``.
+
+    layer.dataProvider().addAttributes(surface_fields())
+    layer.dataProvider().addFeatures([surface_feature(geometry)])
+"""
+
+from __future__ import annotations
+
+from typing import Iterator, Optional
+
+from qgis.core import (
+    QgsFeature, QgsField, QgsFields, QgsGeometry, QgsLineString, QgsPoint, QgsPointXY,
+    QgsPolygon,
+)
+
+from .compat import FIELD_DOUBLE, FIELD_INT, FIELD_STRING
+
+
+def qgs_points(vertices) -> list:
+    """``QgsPoint`` per ``(x, y, z)`` row of a ``core.surface`` vertex array."""
+    return [QgsPoint(float(x), float(y), float(z)) for x, y, z in vertices]
+
+
+def as_fields(fields) -> QgsFields:
+    """``QgsFields`` holding the ``QgsField`` list *fields* (sink definitions)."""
+    out = QgsFields()
+    for field in fields:
+        out.append(field)
+    return out
+
+
+def _suffix(name: Optional[str]) -> str:
+    return f" {name}" if name else ""
+
+
+# ---------------------------------------------------------------------------
+# TOFPA surface, reference line and contours
+# ---------------------------------------------------------------------------
+
+def surface_fields(extra_fields=()) -> list:
+    """Fields of the ``RWY_TOFPA_AOC_TypeA`` polygon layer."""
+    return [
+        QgsField('ID', FIELD_STRING),
+        QgsField('SurfaceName', FIELD_STRING),
+    ] + list(extra_fields)
+
+
+def surface_feature(geometry, name: Optional[str] = None, extra_attributes=()) -> QgsFeature:
+    """Surface polygon of a ``core.surface.SurfaceGeometry``; *name* labels a runway end."""
+    # Ring order pt_03DR, pt_03DL, pt_02DL, pt_01DL, pt_01DR, pt_02DR
+    feature = QgsFeature()
+    feature.setGeometry(QgsPolygon(QgsLineString(qgs_points(geometry.outline)), rings=[]))
+    feature.setAttributes([13, f'TOFPA AOC Type A{_suffix(name)}', *extra_attributes])
+    return feature
+
+
+def reference_line_fields(extra_fields=()) -> list:
+    """Fields of the ``reference_line`` layer."""
+    return [
+        QgsField('id', FIELD_INT),
+        QgsField('txt-label', FIELD_STRING),
+    ] + list(extra_fields)
+
+
+def reference_line_feature(geometry, fid: int, name: Optional[str] = None,
+                           extra_attributes=()) -> QgsFeature:
+    """Reference line of a ``core.surface.SurfaceGeometry``."""
+    feature = QgsFeature()
+    feature.setGeometry(QgsGeometry(QgsLineString(qgs_points(geometry.reference_line))))
+    feature.setAttributes([fid, f'tofpa reference line{_suffix(name)}', *extra_attributes])
+    return feature
+
+
+def contour_fields(extra_fields=()) -> list:
+    """Fields of the ``RWY_TOFPA_Contours`` layer."""
+    return [
+        QgsField('ID', FIELD_INT),
+        QgsField('surface_elevation', FIELD_DOUBLE),
+    ] + list(extra_fields)
+
+
+def contour_features(geometry, first_id: int, extra_attributes=()) -> list:
+    """Contour lines of a ``core.surface.SurfaceGeometry``, numbered from *first_id*."""
+    features = []
+    for fid, line in enumerate(geometry.contours, start=first_id):
+        feature = QgsFeature()
+        feature.setGeometry(QgsGeometry(QgsLineString(qgs_points(line))))
+        feature.setAttributes([fid, float(line[0, 2]), *extra_attributes])
+        features.append(feature)
+    return features
+
+
+# ---------------------------------------------------------------------------
+# Terrain (DTM) analysis — model/TOFPA_analysis.model3 point layer
+# ---------------------------------------------------------------------------
+
+def terrain_fields(extra_fields=()) -> list:
+    """Fields of the model-compatible ``obstacles-terrain`` point layer."""
+    return [
+        QgsField('VALUE', FIELD_DOUBLE),
+        QgsField('id', FIELD_INT),
+        QgsField('type', FIELD_STRING),
+        QgsField('tolerances', FIELD_DOUBLE),
+        QgsField('elev', FIELD_DOUBLE),
+        QgsField('source', FIELD_STRING),
+        QgsField('x_dist', FIELD_DOUBLE),
+        QgsField('surface_z', FIELD_DOUBLE),
+        QgsField('clearance', FIELD_DOUBLE),
+        QgsField('penetrates', FIELD_STRING),
+    ] + list(extra_fields)
+
+
+def terrain_features(result, source: str, first_id: int,
+                     extra_attributes=()) -> Iterator[QgsFeature]:
+    """One point per cell of a ``core.terrain.TerrainResult``, ``id`` from *first_id*."""
+    rows = zip(
+        result.x.tolist(), result.y.tolist(), result.value.tolist(),
+        result.tolerances.tolist(), result.elev.tolist(), result.x_dist.tolist(),
+        result.surface_z.tolist(), result.clearance.tolist(), result.penetrates.tolist(),
+    )
+    for fid, (x, y, value, tol, elev, x_dist, surface_z, clearance, penetrates) in enumerate(
+            rows, start=first_id):
+        feature = QgsFeature()
+        feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+        feature.setAttributes([
+            value, fid, 'terrain', tol, elev, source, x_dist, surface_z, clearance,
+            'penetrates' if penetrates else 'clear', *extra_attributes,
+        ])
+        yield feature
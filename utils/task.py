@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Background execution of TOFPA runs.
+
+``TofpaTask`` runs the compute stages of a panel run on a QGIS task
+manager thread so the interface stays responsive and the run can be
+cancelled.  A run is a list of weighted stages; each stage reports its own
+progress (``set_progress`` / ``iterate``) and checks for cancellation, which
+raises ``TaskCanceled`` out of the stage.  Layers built on the worker
+thread are handed back with ``add_layers`` and moved to the main thread
+when the run ends; adding them to the project, styling map layers already
+there and exports are left to the *on_finished* callback, which Qt calls
+on the main thread.
+
+    task = TofpaTask("TOFPA surface", [
+        ("Building the surface", 1, build_surface),
+        ("Analysing obstacles", 6, analyse_obstacles),
+    ], on_finished)
+    QgsApplication.taskManager().addTask(task)
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Callable, Iterable, Optional, Sequence, Tuple
+
+from qgis.PyQt.QtCore import pyqtSignal
+from qgis.core import QgsApplication, QgsTask
+
+logger = logging.getLogger("TOFPA.task")
+
+
+class TaskCanceled(Exception):
+    """Raised inside a stage once the task has been cancelled."""
+
+
+class TofpaTask(QgsTask):
+    """A TOFPA run as a sequence of ``(label, weight, function)`` stages.
+
+    ``function(task)`` runs on the worker thread; its share of the overall
+    progress is proportional to *weight*.  *on_finished(task, ok)* runs on
+    the main thread; *ok* is False when the task was cancelled
+    (``task.canceled``) or a stage raised (``task.error``).
+    """
+
+    stageChanged = pyqtSignal(str)
+
+    def __init__(
+        self,
+        description: str,
+        stages: Sequence[Tuple[str, float, Callable[["TofpaTask"], None]]],
+        on_finished: Callable[["TofpaTask", bool], None],
+    ):
+        super().__init__(description)
+        self.stages = list(stages)
+        self.on_finished = on_finished
+        self.error: Optional[Exception] = None
+        self.canceled = False
+        self._layers: list = []
+        self._span = (0.0, 100.0)
+
+    # ------------------------------------------------------------------
+    # Worker thread
+    # ------------------------------------------------------------------
+
+    def run(self) -> bool:
+        total = float(sum(weight for _label, weight, _function in self.stages)) or 1.0
+        done = 0.0
+        try:
+            for label, weight, function in self.stages:
+                self.check_canceled()
+                start = 100.0 * done / total
+                done += weight
+                self._span = (start, 100.0 * done / total)
+                logger.debug("%s: %s", self.description(), label)
+                self.stageChanged.emit(label)
+                self.setProgress(start)
+                function(self)
+            self.setProgress(100.0)
+            return True
+        except TaskCanceled:
+            self.canceled = True
+            return False
+        except Exception as exc:
+            logger.exception("%s failed", self.description())
+            self.error = exc
+            return False
+        finally:
+            # QObjects created here belong to this thread until moved
+            main_thread = QgsApplication.instance().thread()
+            for layer in self._layers:
+                layer.moveToThread(main_thread)
+
+    def add_layers(self, layers: Iterable) -> None:
+        """Hand *layers* built on the worker thread over to the main thread."""
+        self._layers.extend(layer for layer in layers if layer is not None)
+
+    def check_canceled(self) -> None:
+        """Raise ``TaskCanceled`` once the task has been cancelled."""
+        if self.isCanceled():
+            raise TaskCanceled()
+
+    def set_progress(self, fraction: float) -> None:
+        """Report *fraction* (0–1) of the current stage done."""
+        start, end = self._span
+        self.setProgress(start + (end - start) * min(max(fraction, 0.0), 1.0))
+
+    def progress_callback(self, start: float, end: float) -> Callable[[float], None]:
+        """Callable mapping a fraction of some work to *start*–*end* of the stage.
+
+        It checks for cancellation first, e.g. as
+        ``ObstacleAnalyzer.write_results(..., on_progress=...)``.
+        """
+        def report(fraction: float) -> None:
+            self.check_canceled()
+            self.set_progress(start + (end - start) * fraction)
+        return report
+
+    def iterate(self, items: Iterable, total: int, start: float = 0.0, end: float = 1.0):
+        """Yield *items*, taking the stage progress from *start* to *end* over *total* of them.
+
+        Progress is reported, and cancellation checked, about a hundred
+        times along the way.
+        """
+        step = max(1, total // 100) if total > 0 else 1000
+        for i, item in enumerate(items):
+            if i % step == 0:
+                self.check_canceled()
+                if total > 0:
+                    self.set_progress(start + (end - start) * i / total)
+            yield item
+        self.set_progress(end)
+
+    # ------------------------------------------------------------------
+    # Main thread
+    # ------------------------------------------------------------------
+
+    def abandon(self, timeout_ms: int = 30000) -> bool:
+        """Cancel and wait for the worker thread, without calling *on_finished*.
+
+        For plugin unload: the caller tears down what *on_finished* and the
+        stages use, so nothing may run against it afterwards.  False when
+        the worker did not stop within *timeout_ms*.
+        """
+        self.on_finished = lambda task, ok: None
+        self.cancel()
+        return self.waitForFinished(timeout_ms)
+
+    def finished(self, result: bool) -> None:
+        self.canceled = self.canceled or (not result and self.error is None)
+        self.on_finished(self, result)